@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import sys
+import time
+
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain import settings
+from blockchain.aio import AsyncBlockchainAPIClient
+from stub_server import StubHandler, start_server
+
+DATA_URLS = {'charts': 'charts', 'stats': 'stats', 'pools': 'pools'}
+
+
+class SlowStubHandler(StubHandler):
+    """
+    Simulate upstream latency.
+    """
+    delay = 0.05
+
+
+def run(base_url, concurrency):
+    """
+    Fetch every configured chart from stub server.
+
+    :param str base_url: stub server url.
+    :param int concurrency: max number of requests in flight.
+    :return float: batch wall time in seconds.
+    """
+    specs = [('charts', {'chart': chart, 'timespan': 'all'}) for chart in settings.CHARTS]
+    client = AsyncBlockchainAPIClient(base_url, DATA_URLS, concurrency=concurrency)
+    started = time.perf_counter()
+    client.run(specs)
+    return time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    server, base_url = start_server(handler=SlowStubHandler)
+    try:
+        for concurrency in (1, 4, 8, 24):
+            print('concurrency {:>2}: {:.3f} s'.format(concurrency, run(base_url, concurrency)))
+    finally:
+        server.shutdown()
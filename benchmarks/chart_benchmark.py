@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain.resources.charts import BlockchainAPIChart
+from stub_server import chart_payload
+
+
+def measure(build):
+    """
+    Measure memory allocated by builder.
+
+    :param callable build: object builder.
+    :return tuple: built object and allocated megabytes.
+    """
+    tracemalloc.start()
+    result = build()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, allocated / 1024 / 1024
+
+
+def timed(function, rounds=20):
+    """
+    Measure mean function wall time.
+
+    :param callable function: measured function.
+    :param int rounds: number of calls.
+    :return float: mean milliseconds per call.
+    """
+    started = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - started) * 1000 / rounds
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Chart values representation benchmark')
+    arg_parser.add_argument('--points', type=int, default=100000)
+    args = arg_parser.parse_args()
+
+    payload = chart_payload('market-price', args.points)
+    values, list_mb = measure(lambda: [dict(value) for value in payload['values']])
+    chart, columns_mb = measure(lambda: BlockchainAPIChart.start(payload, False, True))
+    columns = chart.columns
+    start, end = values[len(values) // 4]['x'], values[3 * len(values) // 4]['x']
+
+    def dict_stats():
+        selected = [value['y'] for value in values if start <= value['x'] <= end]
+        return min(selected), max(selected), selected[-1]
+
+    def dict_rolling(window=7):
+        return [sum(value['y'] for value in values[index - window:index]) / window
+                for index in range(window, len(values) + 1)]
+
+    print('memory:  dict list {:.1f} MB, columns {:.1f} MB'.format(list_mb, columns_mb))
+    print('range:   dict list {:.3f} ms, columns {:.3f} ms'.format(
+        timed(dict_stats), timed(lambda: columns.range_stats(start, end))))
+    print('rolling: dict list {:.3f} ms, columns {:.3f} ms'.format(
+        timed(dict_rolling, 3), timed(lambda: columns.rolling_mean(7), 3)))
+    print('resample weekly: columns {:.3f} ms'.format(
+        timed(lambda: columns.resample(7 * 86400, 'mean'))))
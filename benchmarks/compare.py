@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import json
+import sys
+
+# Metric name suffixes where higher values are better, checked first
+HIGHER_IS_BETTER = ('_per_s',)
+
+# Metric name suffixes where lower values are better
+LOWER_IS_BETTER = ('_ms', '_us', '_s', '_mb')
+
+
+def flatten(results, prefix=''):
+    """
+    Flatten nested results into dotted metric names.
+
+    :param dict results: benchmark results.
+    :param str prefix: parent metric name.
+    :return dict: numeric values by metric name.
+    """
+    metrics = {}
+    for key, value in results.items():
+        name = '{}.{}'.format(prefix, key) if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def direction(name):
+    """
+    Get whether metric improves going up or down.
+
+    :param str name: metric name.
+    :return int: 1 if higher is better, -1 if lower is better, 0 otherwise.
+    """
+    if name.endswith(HIGHER_IS_BETTER):
+        return 1
+    if name.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(base, new, threshold):
+    """
+    Compare metrics of two benchmark reports.
+
+    :param dict base: baseline benchmark report.
+    :param dict new: new benchmark report.
+    :param float threshold: relative change in percent flagged as regression.
+    :return tuple: (metric, base, new, change percent, status) rows and
+        number of regressions.
+    """
+    base_metrics = flatten(base['results'])
+    new_metrics = flatten(new['results'])
+    rows, regressions = [], 0
+    for name in sorted(set(base_metrics) & set(new_metrics)):
+        before, after = base_metrics[name], new_metrics[name]
+        change = 100.0 * (after - before) / before if before else 0.0
+        better = direction(name)
+        status = ''
+        if better and abs(change) >= threshold:
+            if change * better > 0:
+                status = 'improved'
+            else:
+                status = 'REGRESSED'
+                regressions += 1
+        rows.append((name, before, after, change, status))
+    return rows, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('base', help='baseline results file')
+    parser.add_argument('new', help='new results file')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='relative change in percent flagged')
+    parser.add_argument('--all', action='store_true', help='show per path latencies')
+    args = parser.parse_args()
+
+    with open(args.base) as base_file, open(args.new) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+
+    if base['meta'].get('fixtures') != new['meta'].get('fixtures'):
+        print('warning: runs used different fixtures', file=sys.stderr)
+
+    rows, regressions = compare(base, new, args.threshold)
+    print('{:<48} {:>14} {:>14} {:>9}'.format('metric', 'base', 'new', 'change'))
+    for name, before, after, change, status in rows:
+        if '.paths.' in name and not (args.all or status):
+            continue
+        print('{:<48} {:>14.3f} {:>14.3f} {:>+8.1f}% {}'.format(
+            name, before, after, change, status))
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain import decoders
+from stub_server import chart_payload
+
+
+def measure(decode, rounds=5):
+    """
+    Measure mean decode wall time and peak memory.
+
+    :param callable decode: payload decoder.
+    :param int rounds: number of decodes.
+    :return tuple: mean milliseconds per decode and peak megabytes.
+    """
+    tracemalloc.start()
+    decode()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        decode()
+    return (time.perf_counter() - started) * 1000 / rounds, peak / 1024 / 1024
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Chart payload decoding benchmark')
+    arg_parser.add_argument('--points', type=int, default=200000)
+    arg_parser.add_argument('--chunk-size', type=int, default=65536)
+    args = arg_parser.parse_args()
+
+    body = json.dumps(chart_payload('market-price', args.points)).encode('utf-8')
+    chunks = [body[index:index + args.chunk_size]
+              for index in range(0, len(body), args.chunk_size)]
+
+    results = [
+        ('stdlib text json', lambda: json.loads(body.decode('utf-8'))),
+        ('{} bytes'.format(decoders.DECODER), lambda: decoders.loads(body)),
+        ('streamed columns', lambda: decoders.decode_chart(iter(chunks))),
+    ]
+    print('payload {:.1f} MB, {} points'.format(len(body) / 1024 / 1024, args.points))
+    for name, decode in results:
+        elapsed, peak = measure(decode)
+        print('{:<18} {:8.2f} ms, peak {:6.1f} MB'.format(name, elapsed, peak))
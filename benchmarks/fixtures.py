@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import configparser
+import hashlib
+import json
+import os
+import random
+import zlib
+
+from urllib.parse import urlparse
+
+from blockchain import settings
+from blockchain.api import BlockchainAPIClient
+from blockchain.replay import ReplayArchive
+from blockchain.session import BlockchainAPISession
+
+# Seed making synthetic fixtures, used when none are recorded, identical
+# between runs
+SEED = 20180301
+
+# First chart value timestamp, 2009-01-03
+START = 1230940800
+
+
+def chart_fixture(chart, points=3650):
+    """
+    Build deterministic Blockchain API alike chart payload as a random walk.
+
+    :param str chart: chart name.
+    :param int points: number of daily chart values.
+    :return dict: chart payload.
+    """
+    rng = random.Random(SEED + zlib.crc32(chart.encode('utf-8')))
+    y = rng.uniform(1, 1000)
+    values = []
+    for i in range(points):
+        y = max(y * (1 + rng.gauss(0.001, 0.03)), 0.0)
+        values.append({'x': START + i * 86400, 'y': round(y, 6)})
+    return {
+        'status': 'ok',
+        'name': chart.replace('-', ' ').title(),
+        'unit': 'USD',
+        'period': 'day',
+        'description': 'Synthetic {} chart fixture.'.format(chart),
+        'values': values,
+    }
+
+
+def stats_fixture():
+    """
+    Build deterministic Blockchain API alike stats payload.
+
+    :return dict: stats payload.
+    """
+    return {
+        'market_price_usd': 6512.37,
+        'hash_rate': 41273582419.62,
+        'total_fees_btc': 2187563810,
+        'n_btc_mined': 187500000000,
+        'n_tx': 231947,
+        'n_blocks_mined': 150,
+        'minutes_between_blocks': 9.47,
+        'totalbc': 1711087500000000,
+        'n_blocks_total': 531540,
+        'estimated_transaction_volume_usd': 1004537283.21,
+        'blocks_size': 131857320,
+        'miners_revenue_usd': 12353247.43,
+        'nextretarget': 532223,
+        'difficulty': 5077499034879,
+        'estimated_btc_sent': 15425381957712,
+        'miners_revenue_btc': 1896,
+        'total_btc_sent': 114207845107356,
+        'trade_volume_btc': 53728.63,
+        'trade_volume_usd': 349893112.57,
+        'timestamp': 1530000000000,
+    }
+
+
+def pools_fixture():
+    """
+    Build deterministic Blockchain API alike pools payload.
+
+    :return dict: blocks mined by pool.
+    """
+    return {
+        'BTC.com': 168, 'AntPool': 127, 'ViaBTC': 88, 'BTC.TOP': 86, 'F2Pool': 84,
+        'SlushPool': 75, 'Poolin': 24, 'BitClub Network': 19, 'Bitcoin.com': 17,
+        'DPOOL': 15, 'Huobi.pool': 14, 'BitFury': 13, 'Bixin': 11, 'WAYI.CN': 6,
+        'KanoPool': 4, 'BitcoinRussia': 2, 'Unknown': 23,
+    }
+
+
+def build(points=3650):
+    """
+    Build fixture bodies for every configured chart, stats and pools.
+
+    :param int points: number of daily values per chart.
+    :return dict: json body bytes by request path.
+    """
+    fixtures = {'charts/{}'.format(chart): chart_fixture(chart, points)
+                for chart in settings.CHARTS}
+    fixtures.update({'stats': stats_fixture(), 'pools': pools_fixture()})
+    return {path: json.dumps(payload).encode('utf-8') for path, payload in fixtures.items()}
+
+
+def specs():
+    """
+    Get request specs recorded for every configured chart, stats and pools.
+
+    :return list: (data, params) tuples.
+    """
+    result = [('charts', {'chart': chart, 'timespan': 'all'}) for chart in settings.CHARTS]
+    result.extend([('stats', {}), ('pools', {})])
+    return result
+
+
+def record(path, filename='blockchain.cfg', base_url=None):
+    """
+    Record Blockchain API responses for every configured chart, stats and
+    pools into a replay archive. Api key is left out of the archive.
+
+    :param str path: replay archive path.
+    :param str filename: Blockchain API Client configuration filename.
+    :param str base_url: Blockchain API url, configured one by default.
+    :return int: number of recorded responses.
+    """
+    parser = configparser.ConfigParser()
+    parser.read(filename)
+    base_url = base_url or parser.get('api', 'base_url')
+    archive = ReplayArchive(path, 'record')
+    session = archive.wrap(BlockchainAPISession.config(filename))
+    try:
+        for data, params in specs():
+            client = BlockchainAPIClient(data, base_url + parser.get('api', data),
+                                         os.getenv('API_KEY'), session)
+            client.call(**params)
+    finally:
+        session.close()
+    return len(specs())
+
+
+def load(path):
+    """
+    Read fixture bodies from responses recorded to a replay archive.
+
+    :param str path: replay archive path.
+    :return dict: json body bytes by request path.
+    """
+    paths = {'{}/{}'.format(data, params['chart']) if 'chart' in params else data
+             for data, params in specs()}
+    fixtures = {}
+    for entry in ReplayArchive(path, 'replay').responses():
+        request_path = urlparse(entry['url']).path.strip('/')
+        if request_path in paths and entry['status'] == 200:
+            body = entry['body']
+            fixtures[request_path] = bytes.fromhex(body) if entry.get('binary') \
+                else body.encode('utf-8')
+    return fixtures
+
+
+def checksum(fixtures):
+    """
+    Get digest identifying fixture set, so only runs over the same payloads
+    are compared.
+
+    :param dict fixtures: json body bytes by request path.
+    :return str: sha256 hex digest.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(fixtures):
+        digest.update(path.encode('utf-8'))
+        digest.update(fixtures[path])
+    return digest.hexdigest()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from os.path import abspath, dirname, getsize, join
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain import settings
+from blockchain.api import BlockchainAPIHttpResponse
+from blockchain.pipelines import JSONFileWriterPipeline
+from stub_server import chart_payload
+
+
+def documents(points):
+    """
+    Build normalized chart documents for every configured chart.
+
+    :param int points: number of values per chart.
+    :return list: json chart documents.
+    """
+    result = []
+    for chart in settings.CHARTS:
+        url = 'http://localhost/charts/{}'.format(chart)
+        response = BlockchainAPIHttpResponse('charts', url, chart_payload(chart, points))
+        result.append(response.response)
+    return result
+
+
+def run(filepath, fmt, docs, size_mb):
+    """
+    Append history until file reaches size, then stream it back.
+
+    :param str filepath: history file path.
+    :param str fmt: file format (json, ndjson).
+    :param list docs: json chart documents written per run.
+    :param int size_mb: target file size in megabytes.
+    :return dict: write, read and latest lookup timings, records and peak
+        read memory.
+    """
+    pipeline = JSONFileWriterPipeline(filepath, fmt)
+    started = time.perf_counter()
+    while not os.path.exists(filepath) or getsize(filepath) < size_mb * 1024 * 1024:
+        pipeline.write_many(docs)
+    write_time = time.perf_counter() - started
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    records = sum(1 for _ in pipeline.iter_records())
+    read_time = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for data in docs:
+        pipeline.latest(data['_slug'])
+    lookup_time = (time.perf_counter() - started) / len(docs)
+    return {
+        'size_mb': getsize(filepath) / 1024 / 1024,
+        'records': records,
+        'write_s': write_time,
+        'read_s': read_time,
+        'peak_read_mb': peak / 1024 / 1024,
+        'lookup_ms': lookup_time * 1000,
+    }
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='JSON history file benchmark')
+    arg_parser.add_argument('--size-mb', type=int, default=200)
+    arg_parser.add_argument('--points', type=int, default=3000)
+    args = arg_parser.parse_args()
+
+    docs = documents(args.points)
+    directory = tempfile.mkdtemp()
+    for fmt in JSONFileWriterPipeline.FORMATS:
+        filepath = join(directory, 'history.{}'.format(fmt))
+        result = run(filepath, fmt, docs, args.size_mb)
+        os.remove(filepath)
+        print('{:<7} {size_mb:.0f} MB, {records} records: write {write_s:.2f} s, '
+              'read {read_s:.2f} s, peak read memory {peak_read_mb:.1f} MB, '
+              'latest lookup {lookup_ms:.3f} ms'.format(fmt, **result))
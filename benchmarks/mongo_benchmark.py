@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import os
+import sys
+import time
+
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain import settings
+from blockchain.api import BlockchainAPIHttpResponse
+from blockchain.pipelines import MongoDBPipeline
+from stub_server import chart_payload
+
+
+def documents(points):
+    """
+    Build normalized chart documents for every configured chart.
+
+    :param int points: number of values per chart.
+    :return list: json chart documents.
+    """
+    result = []
+    for chart in settings.CHARTS:
+        url = 'http://localhost/charts/{}'.format(chart)
+        response = BlockchainAPIHttpResponse('charts', url, chart_payload(chart, points))
+        result.append(response.response)
+    return result
+
+
+def pipeline(use_mongomock):
+    """
+    Get MongoDBPipeline bound to a local mongod or to mongomock.
+
+    :param bool use_mongomock: flag to signal mongomock use.
+    :return obj: MongoDBPipeline instance with open connection.
+    """
+    url = os.getenv('MONGO_URL', 'mongodb://localhost:27017/')
+    mongo = MongoDBPipeline(url, 'blockchain_benchmark', 'charts')
+    if use_mongomock:
+        import mongomock
+        mongo.client = mongomock.MongoClient()
+        mongo.db = mongo.client[mongo.configuration['database']]
+        mongo.collection = mongo.db[mongo.configuration['collection']]
+        mongo.ensure_indexes()
+    else:
+        mongo.open_connection()
+    mongo.collection.delete_many({})
+    return mongo
+
+
+def run(mongo, docs, bulk):
+    """
+    Persist documents twice, first inserting then updating them.
+
+    :param obj mongo: MongoDBPipeline instance.
+    :param list docs: json chart documents.
+    :param bool bulk: flag to signal bulk persistence.
+    :return float: wall time in seconds.
+    """
+    started = time.perf_counter()
+    for _ in range(2):
+        batch = [dict(doc) for doc in docs]
+        if bulk:
+            mongo.persist_many(batch)
+        else:
+            for doc in batch:
+                mongo.persist_data(doc)
+    return time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='MongoDB persist benchmark')
+    arg_parser.add_argument('--mongomock', action='store_true')
+    arg_parser.add_argument('--points', type=int, default=3000)
+    args = arg_parser.parse_args()
+
+    docs = documents(args.points)
+    mongo = pipeline(args.mongomock)
+    try:
+        per_document = run(mongo, docs, bulk=False)
+        mongo.collection.delete_many({})
+        bulk = run(mongo, docs, bulk=True)
+    finally:
+        mongo.collection.delete_many({})
+        mongo.close_connection()
+
+    print('per document: {:.3f} s'.format(per_document))
+    print('bulk upsert:  {:.3f} s'.format(bulk))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import os
+import sys
+import time
+
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain import settings
+from blockchain.api import BlockchainAPIHttpResponse
+from blockchain.pipelines import PostgreSQLPipeline
+from stub_server import chart_payload
+
+
+def documents(points):
+    """
+    Build normalized chart documents for every configured chart.
+
+    :param int points: number of values per chart.
+    :return list: json chart documents.
+    """
+    result = []
+    for chart in settings.CHARTS:
+        url = 'http://localhost/charts/{}'.format(chart)
+        response = BlockchainAPIHttpResponse('charts', url, chart_payload(chart, points))
+        result.append(response.response)
+    return result
+
+
+def truncate(postgres):
+    """
+    Empty benchmark tables.
+
+    :param obj postgres: PostgreSQLPipeline instance.
+    """
+    with postgres.transaction() as cursor:
+        cursor.execute(postgres._sql('TRUNCATE {table}, {points}'))
+
+
+def run_copy(postgres, docs):
+    """
+    Persist documents through COPY based bulk loading.
+
+    :param obj postgres: PostgreSQLPipeline instance.
+    :param list docs: json chart documents.
+    :return float: wall time in seconds.
+    """
+    started = time.perf_counter()
+    postgres.persist_many(docs)
+    return time.perf_counter() - started
+
+
+def run_rows(postgres, docs):
+    """
+    Persist documents inserting chart values one row at a time.
+
+    :param obj postgres: PostgreSQLPipeline instance.
+    :param list docs: json chart documents.
+    :return float: wall time in seconds.
+    """
+    started = time.perf_counter()
+    with postgres.transaction() as cursor:
+        query = postgres._sql(
+            'INSERT INTO {points} (slug, ts, value) VALUES (%s, %s, %s) '
+            'ON CONFLICT (slug, ts) DO UPDATE SET value = EXCLUDED.value'
+        )
+        for data in docs:
+            postgres._upsert_resource(cursor, data, data['values'])
+            for value in data['values']:
+                cursor.execute(query, (data['_slug'], value['x'], value['y']))
+    return time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='PostgreSQL persist benchmark')
+    arg_parser.add_argument('--points', type=int, default=3000)
+    args = arg_parser.parse_args()
+
+    docs = documents(args.points)
+    rows = sum(len(data['values']) for data in docs)
+    url = os.getenv('POSTGRES_URL', 'dbname=blockchain_benchmark')
+    postgres = PostgreSQLPipeline(url, 'blockchain_benchmark')
+    postgres.open_connection()
+    try:
+        truncate(postgres)
+        row_by_row = run_rows(postgres, docs)
+        truncate(postgres)
+        copy = run_copy(postgres, docs)
+        truncate(postgres)
+    finally:
+        postgres.close_connection()
+
+    print('row by row INSERT: {:.3f} s, {:.0f} rows/s'.format(row_by_row, rows / row_by_row))
+    print('COPY FROM STDIN:   {:.3f} s, {:.0f} rows/s'.format(copy, rows / copy))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from os.path import abspath, dirname, getsize, join
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain import settings
+from blockchain.api import BlockchainAPIClient
+from blockchain.replay import ReplayArchive
+from blockchain.session import BlockchainAPISession
+from stub_server import StubHandler, start_server
+
+
+def run(base_url, archive, rounds=1):
+    """
+    Fetch every configured chart, stats and pools through archive wrapped
+    session.
+
+    :param str base_url: stub server url.
+    :param obj archive: ReplayArchive instance.
+    :param int rounds: times every request is made.
+    :return tuple: wall time in seconds and decoded chart bodies.
+    """
+    session = archive.wrap(BlockchainAPISession())
+    clients = {data: BlockchainAPIClient(data, base_url + data, session=session)
+               for data in settings.RESOURCES}
+    responses = {}
+    started = time.perf_counter()
+    try:
+        for _ in range(rounds):
+            for chart in settings.CHARTS:
+                response = clients['charts'].call(chart=chart, timespan='all')
+                responses[chart] = response.response
+            responses['stats'] = clients['stats'].call().response
+            responses['pools'] = clients['pools'].call(timespan='5days').response
+    finally:
+        session.close()
+    return time.perf_counter() - started, responses
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Record and replay benchmark.')
+    parser.add_argument('--points', type=int, default=3650)
+    parser.add_argument('--delay', type=float, default=0.05, help='stub server delay')
+    parser.add_argument('--rounds', type=int, default=5, help='full speed replay rounds')
+    args = parser.parse_args()
+
+    StubHandler.points = args.points
+    StubHandler.delay = args.delay
+    server, base_url = start_server()
+    directory = tempfile.mkdtemp()
+    path = join(directory, 'replay.ndjson.gz')
+    try:
+        live, recorded = run(base_url, ReplayArchive(path, 'record'))
+    finally:
+        server.shutdown()
+
+    try:
+        # Server is down, every replayed response comes from the archive
+        paced, replayed = run(base_url, ReplayArchive(path, 'replay', latency=True))
+        fast, _ = run(base_url, ReplayArchive(path, 'replay'), args.rounds)
+        size = getsize(path)
+    finally:
+        os.remove(path)
+        os.rmdir(directory)
+
+    requests = len(recorded)
+    print('{} requests, archive {:.1f} kB, identical replay: {}'.format(
+        requests, size / 1024, replayed == recorded))
+    for mode, elapsed, count in (('record', live, requests),
+                                 ('replay latency', paced, requests),
+                                 ('replay full speed', fast, requests * args.rounds)):
+        print('{:<18} {:>8.3f} s {:>10.1f} req/s'.format(mode, elapsed, count / elapsed))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import json
+import sys
+import time
+
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain import settings
+from blockchain.api import BlockchainAPIHttpResponse
+from stub_server import chart_payload, pools_payload, stats_payload
+
+
+def recorded_responses(count, points=365):
+    """
+    Build recorded responses cycling through every type of data.
+
+    :param int count: number of responses.
+    :param int points: number of values per chart.
+    :return list: (data, url, json response) tuples.
+    """
+    payloads = [('charts', 'https://api.blockchain.info/charts/{}'.format(chart),
+                 json.dumps(chart_payload(chart, points))) for chart in settings.CHARTS]
+    payloads.append(('stats', 'https://api.blockchain.info/stats', json.dumps(stats_payload())))
+    payloads.append(('pools', 'https://api.blockchain.info/pools', json.dumps(pools_payload())))
+    # Every response gets its own decoded json as it would from the wire
+    return [(data, url, json.loads(body))
+            for data, url, body in (payloads[i % len(payloads)] for i in range(count))]
+
+
+class EagerBlockchainAPIHttpResponse(BlockchainAPIHttpResponse):
+    """
+    Previous response parsing resolving and building resource eagerly.
+    """
+
+    def __init__(self, data=None, url=None, response=None, columns=None):
+        """
+        Initialize response importing and building resource object.
+        """
+        super().__init__(data, url, response, columns)
+        _temp = __import__('blockchain.resources', globals(), locals(), [data], 0)
+        _resource = getattr(_temp, data, None)
+        classname = getattr(_resource, settings.RESOURCES.get(data), None)
+        setattr(self, data, classname.start(response, False))
+
+
+def run(response_class, responses):
+    """
+    Parse recorded responses into homogeneous documents.
+
+    :param cls response_class: response parsing class.
+    :param list responses: recorded responses.
+    :return float: mean microseconds per response.
+    """
+    started = time.perf_counter()
+    for data, url, json_response in responses:
+        response_class(data, url, json_response).response
+    return (time.perf_counter() - started) * 1e6 / len(responses)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Response parsing overhead benchmark.')
+    parser.add_argument('--responses', type=int, default=10000)
+    parser.add_argument('--points', type=int, default=365)
+    args = parser.parse_args()
+
+    responses = recorded_responses(args.responses, args.points)
+    eager = run(EagerBlockchainAPIHttpResponse, responses)
+    lazy = run(BlockchainAPIHttpResponse, responses)
+
+    print('responses:        {}'.format(args.responses))
+    print('eager resources:  {:.2f} us/response'.format(eager))
+    print('lazy resources:   {:.2f} us/response'.format(lazy))
+    print('overhead drop:    {:.1f}%'.format(100 * (eager - lazy) / eager))
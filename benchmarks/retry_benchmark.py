@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import sys
+import time
+
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain.api import BlockchainAPIHttpRequest
+from blockchain.exceptions import BlockchainAPIHttpRequestError
+from blockchain.retry import CircuitBreaker, RetryPolicy
+from blockchain.session import BlockchainAPISession
+from stub_server import FaultInjectingHandler, start_server
+
+
+def fetch(url, session):
+    """
+    Fetch chart reporting outcome and elapsed time.
+
+    :param str url: chart url.
+    :param obj session: resilient http session.
+    :return tuple: outcome and elapsed milliseconds.
+    """
+    started = time.perf_counter()
+    try:
+        BlockchainAPIHttpRequest(url, {'timespan': 'all'}, session).fetch_json_response()
+        outcome = 'ok'
+    except BlockchainAPIHttpRequestError as error:
+        outcome = '{} ({})'.format(error.__class__.__name__, error.code)
+    return outcome, (time.perf_counter() - started) * 1000
+
+
+if __name__ == '__main__':
+    server, base_url = start_server(handler=FaultInjectingHandler)
+    url = '{}charts/market-price'.format(base_url)
+    retry = RetryPolicy(retries=3, backoff_factor=0.05, max_backoff=2.0)
+    breaker = CircuitBreaker(failure_threshold=4, recovery_timeout=0.5)
+    session = BlockchainAPISession(read_timeout=0.5, retry=retry, breaker=breaker)
+
+    scenarios = [
+        ('two 503 then ok', (503, 503), None),
+        ('429 with Retry-After 1', (429,), '1'),
+        ('hung socket then ok', ('hang',), None),
+        ('connection reset then ok', ('reset',), None),
+        ('404 not retried', (404,), None),
+        ('upstream down', (500,) * 8, None),
+        ('while circuit open', (), None),
+    ]
+    try:
+        for name, faults, retry_after in scenarios:
+            FaultInjectingHandler.inject(*faults, retry_after=retry_after)
+            outcome, elapsed = fetch(url, session)
+            print('{:<26} {:<42} {:>8.1f} ms'.format(name, outcome, elapsed))
+
+        time.sleep(0.5)
+        FaultInjectingHandler.inject()
+        outcome, elapsed = fetch(url, session)
+        print('{:<26} {:<42} {:>8.1f} ms'.format('after recovery timeout', outcome, elapsed))
+    finally:
+        session.close()
+        server.shutdown()
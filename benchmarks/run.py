@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timezone
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import fixtures
+import jsonfile_benchmark
+import mongo_benchmark
+import response_benchmark
+
+from blockchain import settings
+from blockchain.api import BlockchainAPIClient, BlockchainAPIHttpResponse
+from blockchain.pipelines import JSONFileWriterPipeline
+from blockchain.session import BlockchainAPISession
+from blockchain.stages import StagedPipeline
+from stub_server import StubHandler, start_server
+
+SUITES = ('latency', 'job', 'response', 'jsonfile', 'mongo')
+
+
+def percentile(samples, fraction):
+    """
+    Get nearest rank percentile of samples.
+
+    :param list samples: measured values.
+    :param float fraction: percentile between 0 and 1.
+    :return float: percentile value.
+    """
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summary(samples):
+    """
+    Summarize latency samples in milliseconds.
+
+    :param list samples: latencies in seconds.
+    :return dict: mean, p50 and p95 latencies in milliseconds.
+    """
+    return {
+        'mean_ms': statistics.mean(samples) * 1000,
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'p95_ms': percentile(samples, 0.95) * 1000,
+    }
+
+
+def specs(bodies):
+    """
+    Get request specs for every fixture.
+
+    :param dict bodies: json body bytes by request path.
+    :return list: (data, params) tuples.
+    """
+    result = []
+    for path in sorted(bodies):
+        data, _, chart = path.partition('/')
+        result.append((data, {'chart': chart, 'timespan': 'all'} if chart else {}))
+    return result
+
+
+def documents(bodies):
+    """
+    Get normalized documents for every fixture.
+
+    :param dict bodies: json body bytes by request path.
+    :return list: json documents.
+    """
+    result = []
+    for path in sorted(bodies):
+        data = path.partition('/')[0]
+        url = 'http://localhost/{}'.format(path)
+        result.append(BlockchainAPIHttpResponse(data, url, json.loads(bodies[path])).response)
+    return result
+
+
+def latency_suite(base_url, bodies, rounds):
+    """
+    Measure per request latency through the pooled client for every fixture
+    after a warm up round.
+
+    :param str base_url: stub server url.
+    :param dict bodies: json body bytes by request path.
+    :param int rounds: times every fixture is requested.
+    :return dict: latency summary overall and per request path.
+    """
+    session = BlockchainAPISession()
+    clients = {data: BlockchainAPIClient(data, base_url + data, session=session)
+               for data in settings.RESOURCES}
+    samples = {}
+    try:
+        # Warm up connections and stub server before measuring
+        for data, params in specs(bodies):
+            clients[data].call(**params)
+        for _ in range(rounds):
+            for data, params in specs(bodies):
+                started = time.perf_counter()
+                clients[data].call(**params).response
+                path = '/'.join(filter(None, (data, params.get('chart'))))
+                samples.setdefault(path, []).append(time.perf_counter() - started)
+    finally:
+        session.close()
+
+    result = summary([sample for values in samples.values() for sample in values])
+    result.update({'requests': sum(len(values) for values in samples.values())})
+    result.update({'paths': {path: summary(values) for path, values in samples.items()}})
+    return result
+
+
+def job_suite(base_url, bodies, fetchers):
+    """
+    Measure nightly job wall time fetching every fixture and persisting it
+    to a JSON file through the staged pipeline.
+
+    :param str base_url: stub server url.
+    :param dict bodies: json body bytes by request path.
+    :param int fetchers: number of concurrent fetchers.
+    :return dict: wall time and stage counters.
+    """
+    session = BlockchainAPISession()
+    directory = tempfile.mkdtemp()
+    sink = JSONFileWriterPipeline(join(directory, 'job.ndjson'), 'ndjson')
+
+    def fetcher(data, **params):
+        return BlockchainAPIClient(data, base_url + data, session=session).call(**params)
+
+    try:
+        counters = StagedPipeline(sink, fetcher, fetchers=fetchers, flush_interval=0.5) \
+            .run(specs(bodies))
+    finally:
+        session.close()
+        for filename in os.listdir(directory):
+            os.remove(join(directory, filename))
+        os.rmdir(directory)
+
+    counters.update({'wall_s': counters.pop('elapsed')})
+    return counters
+
+
+def response_suite(count):
+    """
+    Measure response parsing overhead.
+
+    :param int count: number of recorded responses parsed.
+    :return dict: microseconds per response.
+    """
+    responses = response_benchmark.recorded_responses(count)
+    return {
+        'responses': count,
+        'parse_us': response_benchmark.run(BlockchainAPIHttpResponse, responses),
+    }
+
+
+def jsonfile_suite(bodies, size_mb):
+    """
+    Measure JSON file write, read and lookup throughput for every format.
+
+    :param dict bodies: json body bytes by request path.
+    :param int size_mb: history file size in megabytes.
+    :return dict: throughput by file format.
+    """
+    docs = documents(bodies)
+    directory = tempfile.mkdtemp()
+    result = {}
+    try:
+        for fmt in JSONFileWriterPipeline.FORMATS:
+            filepath = join(directory, 'history.{}'.format(fmt))
+            timings = jsonfile_benchmark.run(filepath, fmt, docs, size_mb)
+            for suffix in ('', '.idx'):
+                os.remove(filepath + suffix)
+            timings.update({
+                'write_mb_per_s': timings['size_mb'] / timings['write_s'],
+                'read_mb_per_s': timings['size_mb'] / timings['read_s'],
+            })
+            result[fmt] = timings
+    finally:
+        os.rmdir(directory)
+    return result
+
+
+def mongo_suite(bodies, use_mongomock):
+    """
+    Measure MongoDB persist throughput, single and bulk, against the local
+    mongod from MONGO_URL. Skipped when unavailable.
+
+    :param dict bodies: json body bytes by request path.
+    :param bool use_mongomock: flag to signal mongomock use.
+    :return dict: documents per second by persist mode.
+    """
+    docs = documents(bodies)
+    try:
+        mongo = mongo_benchmark.pipeline(use_mongomock)
+    except Exception as msg:
+        return {'skipped': str(msg)}
+
+    result = {'documents': 2 * len(docs)}
+    try:
+        for mode, bulk in (('single', False), ('bulk', True)):
+            mongo.collection.delete_many({})
+            elapsed = mongo_benchmark.run(mongo, docs, bulk)
+            result[mode] = {'wall_s': elapsed, 'docs_per_s': 2 * len(docs) / elapsed}
+        mongo.collection.drop()
+    finally:
+        mongo.close_connection()
+    return result
+
+
+def git_commit():
+    """
+    Get benchmarked git commit.
+
+    :return str: commit hash or None outside a git checkout.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=dirname(abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Blockchain API client benchmark suite.')
+    parser.add_argument('--suites', default=','.join(SUITES),
+                        help='comma separated suites: {}'.format(', '.join(SUITES)))
+    parser.add_argument('--points', type=int, default=3650,
+                        help='values per synthetic chart fixture')
+    parser.add_argument('--fixtures', help='replay archive with recorded fixtures to use')
+    parser.add_argument('--record-fixtures',
+                        help='replay archive to record Blockchain API responses to')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--fetchers', type=int, default=4)
+    parser.add_argument('--responses', type=int, default=10000)
+    parser.add_argument('--size-mb', type=int, default=50)
+    parser.add_argument('--mongomock', action='store_true')
+    parser.add_argument('--compress', action='store_true', help='gzip stub server responses')
+    parser.add_argument('--output', help='results file, defaults to results/<timestamp>.json')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    suites = [suite.strip() for suite in args.suites.split(',') if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error('unknown suites: {}'.format(', '.join(sorted(unknown))))
+
+    if args.record_fixtures:
+        fixtures.record(args.record_fixtures)
+    archive = args.record_fixtures or args.fixtures
+    bodies = fixtures.load(archive) if archive else fixtures.build(args.points)
+
+    StubHandler.fixtures = bodies
+    StubHandler.compress = args.compress
+    server, base_url = start_server()
+    results = {}
+    try:
+        for suite in suites:
+            started = time.perf_counter()
+            if suite == 'latency':
+                results[suite] = latency_suite(base_url, bodies, args.rounds)
+            elif suite == 'job':
+                results[suite] = job_suite(base_url, bodies, args.fetchers)
+            elif suite == 'response':
+                results[suite] = response_suite(args.responses)
+            elif suite == 'jsonfile':
+                results[suite] = jsonfile_suite(bodies, args.size_mb)
+            elif suite == 'mongo':
+                results[suite] = mongo_suite(bodies, args.mongomock)
+            print('{:<10} done in {:.1f} s'.format(suite, time.perf_counter() - started),
+                  file=sys.stderr)
+    finally:
+        server.shutdown()
+
+    now = datetime.now(timezone.utc)
+    report = {
+        'meta': {
+            'timestamp': now.isoformat().replace('+00:00', 'Z'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'fixtures': fixtures.checksum(bodies),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    output = args.output or join(dirname(abspath(__file__)), 'results',
+                                 '{}.json'.format(now.strftime('%Y%m%dT%H%M%S')))
+    os.makedirs(dirname(abspath(output)), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2, sort_keys=True)
+    print(output)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import sys
+import time
+
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain import settings
+from blockchain.api import BlockchainAPIHttpRequest
+from blockchain.session import BlockchainAPISession
+from stub_server import start_server
+
+
+def run(base_url, session=None, rounds=5):
+    """
+    Fetch every configured chart from stub server.
+
+    :param str base_url: stub server url.
+    :param obj session: pooled http session or None for a connection per call.
+    :param int rounds: times every chart is requested.
+    :return float: mean latency per request in milliseconds.
+    """
+    started = time.perf_counter()
+    requests_count = 0
+    for _ in range(rounds):
+        for chart in settings.CHARTS:
+            url = '{}charts/{}'.format(base_url, chart)
+            request = BlockchainAPIHttpRequest(url, {'timespan': 'all'}, session)
+            request.fetch_json_response()
+            requests_count += 1
+    return (time.perf_counter() - started) * 1000 / requests_count
+
+
+if __name__ == '__main__':
+    server, base_url = start_server()
+    try:
+        unpooled = run(base_url)
+        session = BlockchainAPISession(pool_maxsize=len(settings.CHARTS))
+        pooled = run(base_url, session)
+        session.close()
+    finally:
+        server.shutdown()
+
+    print('connection per call: {:.3f} ms/request'.format(unpooled))
+    print('pooled keep-alive:   {:.3f} ms/request'.format(pooled))
+    print('latency drop:        {:.1f}%'.format(100 * (unpooled - pooled) / unpooled))
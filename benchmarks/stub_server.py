@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import gzip
+import json
+import socket
+import threading
+import time
+import zlib
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def chart_payload(chart, points=365):
+    """
+    Build Blockchain API alike chart payload.
+
+    :param str chart: chart name.
+    :param int points: number of chart values.
+    :return dict: chart payload.
+    """
+    start = 1230940800
+    return {
+        'status': 'ok',
+        'name': chart.replace('-', ' ').title(),
+        'unit': 'USD',
+        'period': 'day',
+        'description': 'Stub {} chart.'.format(chart),
+        'values': [{'x': start + i * 86400, 'y': float(i)} for i in range(points)],
+    }
+
+
+def stats_payload():
+    """
+    Build Blockchain API alike stats payload.
+
+    :return dict: stats payload.
+    """
+    return {
+        'market_price_usd': 6500.0,
+        'hash_rate': 40000000000.0,
+        'n_tx': 250000,
+        'timestamp': 1530000000000,
+    }
+
+
+def pools_payload():
+    """
+    Build Blockchain API alike pools payload.
+
+    :return dict: pools payload.
+    """
+    return {'BTC.com': 150, 'AntPool': 120, 'F2Pool': 90, 'Unknown': 30}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serve Blockchain API alike json responses over keep-alive connections.
+    Recorded fixture bodies, keyed by request path, are served when set.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes, avoid delayed ack stalls
+    disable_nagle_algorithm = True
+    delay = 0.0
+    points = 365
+    compress = False
+    fixtures = None
+    _compressed = {}
+
+    def do_GET(self):
+        """
+        Answer charts, stats and pools requests.
+        """
+        if self.delay:
+            time.sleep(self.delay)
+        path = urlparse(self.path).path.strip('/').split('/')
+        if self.fixtures is not None:
+            body = self.fixtures.get('/'.join(path))
+        elif path[0] == 'charts' and len(path) > 1:
+            body = json.dumps(chart_payload(path[1], self.points)).encode('utf-8')
+        elif path[0] == 'stats':
+            body = json.dumps(stats_payload()).encode('utf-8')
+        elif path[0] == 'pools':
+            body = json.dumps(pools_payload()).encode('utf-8')
+        else:
+            body = None
+        if body is None:
+            self.send_error(404)
+            return
+
+        encoding = self._negotiate_encoding()
+        if encoding is not None:
+            body = self._compress(body, encoding)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _compress(self, body, encoding):
+        """
+        Compress body, once per fixture so server cost stays off latencies.
+
+        :param bytes body: response body.
+        :param str encoding: gzip or deflate.
+        :return bytes: compressed body.
+        """
+        key = (id(body), encoding) if self.fixtures is not None else None
+        compressed = self._compressed.get(key)
+        if compressed is None:
+            compressed = gzip.compress(body) if encoding == 'gzip' else zlib.compress(body)
+            if key is not None:
+                self._compressed[key] = compressed
+        return compressed
+
+    def _negotiate_encoding(self):
+        """
+        Pick response content encoding from Accept-Encoding header.
+
+        :return str: gzip, deflate or None for identity.
+        """
+        if not self.compress:
+            return None
+        accepted = [value.split(';')[0].strip()
+                    for value in self.headers.get('Accept-Encoding', '').split(',')]
+        for encoding in ('gzip', 'deflate'):
+            if encoding in accepted:
+                return encoding
+        return None
+
+    def log_message(self, format, *args):
+        """
+        Silence per request logging.
+        """
+        pass
+
+
+class FaultInjectingHandler(StubHandler):
+    """
+    Serve stub responses after injecting scripted faults.
+
+    Faults are consumed in order, one per request: an http status code is
+    answered with an error body, 'hang' stalls longer than any read timeout,
+    'reset' drops the connection and 'truncate' drops it halfway through the
+    body. Requests get normal responses once faults run out.
+    """
+
+    faults = []
+    retry_after = None
+    hang = 60.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def inject(cls, *faults, retry_after=None):
+        """
+        Script faults for the next requests.
+
+        :param list faults: status codes, 'hang', 'reset' or 'truncate' per
+        request.
+        :param str retry_after: Retry-After header sent with error statuses.
+        """
+        with cls._lock:
+            cls.faults = list(faults)
+            cls.retry_after = retry_after
+
+    @classmethod
+    def _next_fault(cls):
+        """
+        Pop next scripted fault.
+
+        :return obj: fault or None if no faults left.
+        """
+        with cls._lock:
+            return cls.faults.pop(0) if cls.faults else None
+
+    def do_GET(self):
+        """
+        Answer request with next scripted fault or stub response.
+        """
+        fault = self._next_fault()
+        if fault is None:
+            return super().do_GET()
+        if fault == 'hang':
+            time.sleep(self.hang)
+            return
+        if fault == 'reset':
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        if fault == 'truncate':
+            body = json.dumps(chart_payload('truncated', self.points)).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+
+        body = json.dumps({'error': 'Injected fault {}'.format(fault)}).encode('utf-8')
+        self.send_response(fault)
+        if self.retry_after is not None:
+            self.send_header('Retry-After', self.retry_after)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Threading HTTP server accepting bursts of concurrent connections, so
+    benchmarks measure clients rather than the listen backlog.
+    """
+    request_queue_size = 128
+
+
+def start_server(host='127.0.0.1', port=0, handler=StubHandler):
+    """
+    Start stub server in a background thread.
+
+    :param str host: listening host.
+    :param int port: listening port, 0 picks a free one.
+    :param cls handler: request handler class.
+    :return tuple: server instance and base url.
+    """
+    server = StubServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = 'http://{}:{}/'.format(*server.server_address)
+    return server, base_url
+
+
+if __name__ == '__main__':
+    server, base_url = start_server(port=8000)
+    print('Serving Blockchain API stub at {}'.format(base_url))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
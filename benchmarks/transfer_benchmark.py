@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import sys
+
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from blockchain import settings
+from blockchain.api import BlockchainAPIClient
+from blockchain.session import BlockchainAPISession
+from stub_server import StubHandler, start_server
+
+
+def run(base_url, compress):
+    """
+    Fetch every configured chart reporting its transfer stats.
+
+    :param str base_url: stub server url.
+    :param bool compress: flag to signal server side compression.
+    :return list: (chart, transfer stats) tuples.
+    """
+    StubHandler.compress = compress
+    session = BlockchainAPISession()
+    client = BlockchainAPIClient('charts', base_url + 'charts', session=session)
+    try:
+        return [(chart, response.transfer)
+                for chart, response in client.call_many(settings.CHARTS, timespan='all')]
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Chart transfer cost benchmark.')
+    parser.add_argument('--points', type=int, default=3650)
+    args = parser.parse_args()
+
+    StubHandler.points = args.points
+    server, base_url = start_server()
+    try:
+        identity = dict(run(base_url, False))
+        compressed = run(base_url, True)
+    finally:
+        server.shutdown()
+
+    print('{:<34} {:>12} {:>12} {:>12} {:>7}'.format(
+        'chart', 'identity', 'wire', 'decoded', 'ratio'))
+    totals = [0, 0, 0]
+    for chart, transfer in sorted(compressed):
+        sizes = [identity[chart]['compressed'], transfer['compressed'], transfer['decompressed']]
+        totals = [total + size for total, size in zip(totals, sizes)]
+        print('{:<34} {:>12} {:>12} {:>12} {:>6.1f}x'.format(chart, *sizes, transfer['ratio']))
+    print('{:<34} {:>12} {:>12} {:>12} {:>6.1f}x'.format(
+        'total', *totals, totals[2] / totals[1]))
@@ -8,7 +8,19 @@ __date__ = 'March 2018'
 
 __all__ = [
     'BlockchainAPIClient', 'BlockchainAPIHttpRequest',
-    'BlockchainAPIHttpResponse', 'BaseError', 'BlockchainAPIClientError',
-    'BlockchainAPIHttpRequestError', 'JSONFileWriterPipelineError',
-    'MongoDBPipelineError', 'JSONFileWriterPipeline', 'MongoDBPipeline'
+    'BlockchainAPIHttpResponse', 'AsyncBlockchainAPIClient',
+    'AsyncBlockchainAPIHttpRequest', 'BlockchainAPISession', 'RateLimiter',
+    'TokenBucket', 'ResponseCache', 'MemoryCacheBackend', 'FileCacheBackend',
+    'BaseError', 'BlockchainAPIClientError', 'BlockchainAPIHttpRequestError',
+    'BlockchainAPISessionError', 'BlockchainAPIRateLimitError',
+    'BlockchainAPICacheError', 'JSONFileWriterPipelineError',
+    'MongoDBPipelineError', 'PostgreSQLPipelineError', 'PipelineRegistryError',
+    'JSONFileWriterPipeline', 'MongoDBPipeline', 'MongoDBTimeSeriesPipeline',
+    'PostgreSQLPipeline', 'PipelineRegistry', 'StagedPipeline',
+    'StagedPipelineError', 'RetryPolicy', 'CircuitBreaker',
+    'BlockchainAPIRetryError', 'BlockchainAPICircuitOpenError',
+    'BlockchainAPIStreamError',
+    'SingleFlight', 'AsyncSingleFlight', 'MetricsRegistry',
+    'PrometheusExporter', 'StatsDExporter', 'MetricsError', 'ReplayArchive',
+    'ReplaySession', 'BlockchainAPIReplayError'
 ]
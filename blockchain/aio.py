@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+Asynchronous Blockchain API client.
+
+Configured clients share the rate limiter, the circuit breaker and the
+response cache with synchronous clients, so mixed use is throttled, short
+circuited and cached alike. Requests are not exported as metrics and are
+neither recorded nor replayed by the replay archive, which only wraps the
+synchronous session.
+"""
+
+import aiohttp
+import asyncio
+import configparser
+import logging
+import os
+
+from logging.config import fileConfig
+from os.path import dirname, join
+
+from .api import BlockchainAPIHttpResponse
+from .cache import ResponseCache
+from .coalesce import AsyncSingleFlight, canonical_url, public_params
+from .decoders import ACCEPT_ENCODING, ContentDecoder, loads
+from .exceptions import BlockchainAPIClientError, BlockchainAPIHttpRequestError
+from .ratelimit import RateLimiter
+from .retry import CircuitBreaker, RetryAttempts, RetryPolicy
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+
+class AsyncBlockchainAPIClient(object):
+    """
+    Enable concurrent Blockchain API use with asyncio.
+    """
+
+    def __init__(self, base_url, data_urls, api_key=None, concurrency=4,
+                 pool_maxsize=10, limiter=None, connect_timeout=5.0, read_timeout=30.0,
+                 retry=None, breaker=None, cache=None):
+        """
+        Initialize asynchronous Blockchain API Client. If no API key provided
+        there is a limit on the number of calls.
+
+        :param str base_url: Blockchain API base url.
+        :param dict data_urls: url path for every type of data.
+        :param str api_key: Key for unlimited calls to the API.
+        :param int concurrency: max number of requests in flight.
+        :param int pool_maxsize: max number of connections kept per host.
+        :param obj limiter: rate limiter shared with synchronous clients.
+        :param float connect_timeout: seconds to wait for connection.
+        :param float read_timeout: seconds to wait between response bytes.
+        :param obj retry: retry policy for failed requests.
+        :param obj breaker: circuit breaker shared with synchronous clients.
+        :param obj cache: response cache shared with synchronous clients.
+        """
+        self._base_url = base_url
+        self._data_urls = data_urls
+        self._api_key = api_key
+        self._concurrency = concurrency
+        self._pool_maxsize = pool_maxsize
+        self._limiter = limiter
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._retry = retry
+        self._breaker = breaker
+        self._cache = cache
+        self._flight = AsyncSingleFlight()
+        self._semaphore = None
+        self._session = None
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'url': self._base_url,
+            'concurrency': self._concurrency,
+        }
+        return str(params)
+
+    async def __aenter__(self):
+        """
+        Open pooled client session.
+
+        :return obj: AsyncBlockchainAPIClient instance.
+        """
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """
+        Close pooled client session.
+        """
+        await self.close()
+
+    @classmethod
+    def config(cls, filename='blockchain.cfg', section='api', aio_section='aio'):
+        """
+        Get AsyncBlockchainAPIClient class instance.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section with api urls.
+        :param str aio_section: filename section with concurrency settings.
+        :return cls: AsyncBlockchainAPIClient class instance.
+        """
+        parser = configparser.ConfigParser()
+        parser.read(filename)
+        if parser.has_section(section):
+            base_url = parser.get(section, 'base_url')
+            data_urls = {data: parser.get(section, data)
+                         for data in ('charts', 'stats', 'pools')}
+            concurrency = parser.getint(aio_section, 'concurrency', fallback=4)
+            pool_maxsize = parser.getint('session', 'pool_maxsize', fallback=10)
+            connect_timeout = parser.getfloat('session', 'connect_timeout', fallback=5.0)
+            read_timeout = parser.getfloat('session', 'read_timeout', fallback=30.0)
+            api_key = os.getenv('API_KEY')
+            limiter = RateLimiter.shared(filename)
+            retry = RetryPolicy.config(filename)
+            breaker = CircuitBreaker.shared(filename)
+            cache = ResponseCache.shared(filename)
+            return cls(base_url, data_urls, api_key, concurrency, pool_maxsize, limiter,
+                       connect_timeout, read_timeout, retry, breaker, cache)
+        else:
+            msg = 'Section {} not found in {} file'.format(section, filename)
+            raise BlockchainAPIClientError(msg)
+
+    async def open(self):
+        """
+        Create pooled client session bound to the running event loop.
+        """
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit_per_host=self._pool_maxsize)
+            timeout = aiohttp.ClientTimeout(sock_connect=self._connect_timeout,
+                                            sock_read=self._read_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                                  auto_decompress=False)
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+
+    async def close(self):
+        """
+        Close pooled client session.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _build_request(self, data, params):
+        """
+        Build request for given data type and parameters.
+
+        :param str data: type of data to fetch (charts, stats, pools).
+        :param dict params: request parameters.
+        :return obj: AsyncBlockchainAPIHttpRequest instance.
+        """
+        if data not in self._data_urls:
+            msg = 'Unknown Blockchain API data: {}'.format(data)
+            raise BlockchainAPIClientError(msg)
+
+        params = dict(params or {})
+        api_url = self._base_url + self._data_urls[data]
+        if data == 'charts' and 'chart' in params:
+            api_url += '/{}'.format(params.pop('chart'))
+
+        request_params = {key: value for key, value in params.items() if value is not None}
+        if self._api_key is not None:
+            request_params.update({'api_code': self._api_key})
+        return AsyncBlockchainAPIHttpRequest(api_url, request_params, self._session,
+                                             self._retry, self._breaker, self._cache, data)
+
+    async def call(self, data, **kwargs):
+        """
+        Make request of data behind Blockchain API.
+
+        :param str data: type of data to fetch (charts, stats, pools).
+        :param dict kwargs: request parameters, see BlockchainAPIClient.call.
+        :return obj: BlockchainAPIHttpResponse instance.
+        """
+        await self.open()
+        request = self._build_request(data, kwargs)
+        return await self._flight.do(request.canonical_url, self._fetch, data, request)
+
+    async def _fetch(self, data, request):
+        """
+        Fetch request and parse its response.
+
+        :param str data: type of data to fetch (charts, stats, pools).
+        :param obj request: AsyncBlockchainAPIHttpRequest instance.
+        :return obj: BlockchainAPIHttpResponse instance.
+        """
+        async with self._semaphore:
+            if self._limiter is not None and not request.cached:
+                await self._limiter.acquire_async(self._api_key, data)
+            request_url, json_response = await request.fetch_json_response()
+        return BlockchainAPIHttpResponse(data, request_url, json_response,
+                                         transfer=request.transfer)
+
+    @property
+    def coalesced(self):
+        """
+        Get coalescing counters of concurrent identical calls.
+
+        :return dict: calls, executed and coalesced counters.
+        """
+        return self._flight.stats
+
+    async def fetch_many(self, specs, return_exceptions=False):
+        """
+        Fetch a batch of requests concurrently.
+
+        :param list specs: list of (data, params) tuples.
+        :param bool return_exceptions: return errors instead of raising them.
+        :return list: BlockchainAPIHttpResponse instances in specs order.
+        """
+        calls = [self.call(data, **(params or {})) for data, params in specs]
+        return await asyncio.gather(*calls, return_exceptions=return_exceptions)
+
+    def run(self, specs, return_exceptions=False):
+        """
+        Fetch a batch of requests concurrently from synchronous code.
+
+        :param list specs: list of (data, params) tuples.
+        :param bool return_exceptions: return errors instead of raising them.
+        :return list: BlockchainAPIHttpResponse instances in specs order.
+        """
+        async def _run():
+            async with self:
+                return await self.fetch_many(specs, return_exceptions)
+
+        return asyncio.run(_run())
+
+
+class AsyncBlockchainAPIHttpRequest(object):
+    """
+    Enable asynchronous Blockchain API data request.
+    """
+
+    def __init__(self, api_url=None, params=None, session=None, retry=None, breaker=None,
+                 cache=None, resource=None):
+        """
+        Initialize asynchronous request to Blockchain API.
+
+        :param str api_url: blockchain api requested url.
+        :param dict params: blockchain api url needed params.
+        :param obj session: aiohttp client session.
+        :param obj retry: retry policy for failed requests.
+        :param obj breaker: circuit breaker for failing upstream.
+        :param obj cache: response cache keyed on request url.
+        :param str resource: type of requested data (charts, stats, pools).
+        """
+        self._api_url = api_url
+        self._params = params
+        self._session = session
+        self._retry = retry
+        self._breaker = breaker
+        self._cache = cache
+        self._resource = resource
+        self._entry = None
+        self._looked_up = False
+        self.transfer = None
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        request = {
+            'classname': self.__class__.__name__,
+            'url': self._api_url,
+            'params': self._params,
+        }
+        return '<{classname}:\nurl: {url}\nparams: {params}>'.format(**request)
+
+    @property
+    def canonical_url(self):
+        """
+        Get request url with sorted parameters identifying identical requests.
+
+        :return str: canonical request url.
+        """
+        return canonical_url(self._api_url, self._params)
+
+    @property
+    def cache_key(self):
+        """
+        Get cache key identifying request, secret parameters left out.
+
+        :return str: canonical request url without secrets.
+        """
+        return canonical_url(self._api_url, public_params(self._params))
+
+    @property
+    def cached(self):
+        """
+        Check whether request can be served from cache without network.
+
+        :return bool: fresh cached response available.
+        """
+        if self._cache is None:
+            return False
+        return self._cache.is_fresh(self._lookup())
+
+    def _lookup(self):
+        """
+        Get cache entry for request, reading the backend once per request.
+
+        :return dict: cache entry or None.
+        """
+        if not self._looked_up:
+            self._entry = self._cache.lookup(self.cache_key)
+            self._looked_up = True
+        return self._entry
+
+    async def fetch_json_response(self):
+        """
+        Retrieve json object from API url.
+
+        :return tuple: requested url and json response.
+        """
+        if self._api_url is not None and self._params is not None:
+            if self._cache is not None:
+                return await self._fetch_cached_json_response()
+            _, request_url, json_response, _ = await self._http_request()
+            return request_url, json_response
+        else:
+            msg = 'Error: API URL and parameters must be provided.'
+            raise BlockchainAPIHttpRequestError(msg)
+
+    async def _fetch_cached_json_response(self):
+        """
+        Retrieve json object from cache, revalidating stale entries.
+
+        :return tuple: requested url and json response.
+        """
+        key = self.cache_key
+        entry = self._lookup()
+        cached_response = self._cache.serve(entry)
+        if cached_response is not None:
+            return cached_response
+
+        headers = self._cache.conditional_headers(entry)
+        status, request_url, json_response, response_headers = \
+            await self._http_request(headers)
+        if status == 304:
+            return self._cache.revalidate(key, self._resource, entry, response_headers)
+
+        self._cache.set(key, self._resource, request_url, json_response, response_headers)
+        return request_url, json_response
+
+    async def _http_request(self, headers=None):
+        """
+        Make http request to Blockchain API, retrying failed attempts. Not
+        modified responses are only accepted for conditional requests.
+
+        :param dict headers: http conditional request headers.
+        :return tuple: status code, requested url, json response and http
+        response headers.
+        """
+        conditional = bool(headers)
+        attempts = RetryAttempts(self._api_url, self._retry, self._breaker)
+        while True:
+            with attempts:
+                try:
+                    status, request_url, json_response, response_headers = \
+                        await self._attempt(headers)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as error:
+                    attempts.record(False)
+                    if not attempts.retryable():
+                        msg = 'Error: url {}, params {}, {!r}'.format(self._api_url,
+                                                                       self._params, error)
+                        raise BlockchainAPIHttpRequestError(msg)
+                    delay = attempts.backoff()
+                else:
+                    attempts.record(status < 500)
+                    if status == 200 or (conditional and status == 304):
+                        return status, request_url, json_response, response_headers
+                    if not attempts.retryable(status):
+                        msg = 'Error: url {}, params {}'.format(self._api_url, self._params)
+                        raise BlockchainAPIHttpRequestError(msg, status)
+                    delay = attempts.backoff(response_headers.get('Retry-After'))
+
+            logger.warning('Request to %s failed, retry in %.2fs.', self._api_url, delay)
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, headers=None, chunk_size=65536):
+        """
+        Make single http request attempt to Blockchain API negotiating
+        compression and decompressing the body as it arrives. Decompressed
+        body is buffered whole before a single decode.
+
+        :param dict headers: http conditional request headers.
+        :param int chunk_size: streamed body chunk size in bytes.
+        :return tuple: status code, requested url, json response and http
+        response headers.
+        """
+        encoded_params = {key: str(value) for key, value in self._params.items()}
+        headers = dict(headers or {}, **{'Accept-Encoding': ACCEPT_ENCODING})
+        async with self._session.get(self._api_url, params=encoded_params,
+                                     headers=headers) as http_response:
+            status = http_response.status
+            if status == 200:
+                decoder = ContentDecoder(http_response.headers.get('Content-Encoding'))
+                body = bytearray()
+                async for chunk in http_response.content.iter_chunked(chunk_size):
+                    body += decoder.decode(chunk)
+                body += decoder.flush()
+                self.transfer = decoder.stats
+                logger.debug('Transfer %s: %s bytes over the wire, %s bytes decoded (%s, %.1fx)',
+                            self._api_url, decoder.compressed, decoder.decompressed,
+                            decoder.encoding, self.transfer['ratio'])
+                return status, str(http_response.url), loads(bytes(body)), http_response.headers
+            return status, str(http_response.url), None, http_response.headers
@@ -2,18 +2,34 @@
 # encoding: utf-8
 
 import configparser
+import importlib
 import logging
+import math
 import os
 import requests
+import time
+import urllib3
 
 from slugify import slugify
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from logging.config import fileConfig
 from os.path import dirname, join
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 from . import settings
+from .cache import ResponseCache
+from .coalesce import SingleFlight, canonical_url, public_params
+from .decoders import ACCEPT_ENCODING, ContentDecoder, decode_chart, loads
 from .exceptions import (BlockchainAPIClientError,
-                         BlockchainAPIHttpRequestError)
+                         BlockchainAPIHttpRequestError,
+                         BlockchainAPIStreamError)
+from .metrics import MetricsRegistry
+from .ratelimit import RateLimiter
+from .replay import ReplayArchive
+from .retry import RetryAttempts
+from .session import BlockchainAPISession
 
 # Custom logger
 fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
@@ -23,24 +39,56 @@ logger = logging.getLogger(__name__)
 dotenv_path = join(dirname(dirname(__file__)), '.env')
 load_dotenv(dotenv_path)
 
+# Connect and read timeouts for requests without pooled session
+TIMEOUT = (5.0, 30.0)
+
+
+def _resolve_resource_classes():
+    """
+    Resolve resource class for every type of data in settings once.
+
+    :return dict: resource class by type of data.
+    """
+    classes = {}
+    for data, classname in settings.RESOURCES.items():
+        try:
+            module = importlib.import_module('.resources.{}'.format(data), __package__)
+            classes[data] = getattr(module, classname)
+        except (ImportError, AttributeError) as msg:
+            logger.error('Error importing response class for %s data: %s', data, msg)
+    return classes
+
+
+# Resource class by type of data
+RESOURCE_CLASSES = _resolve_resource_classes()
+
 
 class BlockchainAPIClient(object):
     """
     Enable Blockchain API use.
     """
 
-    def __init__(self, data, api_url, api_key=None):
+    def __init__(self, data, api_url, api_key=None, session=None, limiter=None,
+                 cache=None, flight=None):
         """
         Initialize Blockchain API Client. If no API key provided there is a
         limit on the number of calls.
 
         :param str data: type of data to fetch (charts, stats, pools).
+        :param str api_url: Blockchain API data url.
         :param str api_key: Key for unlimited calls to the API.
+        :param obj session: pooled http session shared between requests.
+        :param obj limiter: rate limiter shared between requests.
+        :param obj cache: response cache shared between requests.
+        :param obj flight: in-flight registry coalescing identical calls.
         """
         self._api_data = data
         self._api_url = api_url
         self._api_key = api_key
-        self._request_params = {}
+        self._session = session
+        self._limiter = limiter
+        self._cache = cache
+        self._flight = flight
 
     def __str__(self):
         """
@@ -50,10 +98,9 @@ class BlockchainAPIClient(object):
         """
         params = {
             'classname': self.__class__.__name__,
-            'data': self._api_data
+            'data': self._api_data,
+            'url': self._api_url,
         }
-        for key, value in self._request_params.items():
-            params.update({'{}'.format(key): value})
         return str(params)
 
     @classmethod
@@ -72,24 +119,43 @@ class BlockchainAPIClient(object):
             base_url = parser.get(section, 'base_url')
             data_url = parser.get(section, data)
             api_key = os.getenv('API_KEY')
-            return cls(data, base_url + data_url, api_key)
+            archive = ReplayArchive.shared(filename)
+            session = archive.wrap(BlockchainAPISession.shared(filename))
+            # Replayed responses need no rate limiting
+            limiter = None if archive.replaying else RateLimiter.shared(filename)
+            # Recorded and replayed responses never go through the cache
+            cache = None if archive.enabled else ResponseCache.shared(filename)
+            flight = SingleFlight.shared()
+            return cls(data, base_url + data_url, api_key, session, limiter, cache, flight)
         else:
             msg = 'Section {} not found in {} file'.format(section, filename)
             raise BlockchainAPIClientError(msg)
 
-    def _set_request_params(self, *args, **kwargs):
+    def _get_request_params(self, **kwargs):
         """
-        Set request parameters for api url.
+        Get request parameters for api url.
 
-        :param list args: list of arguments.
         :param dict kwargs: dict of keyword arguments.
+        :return dict: request parameters.
         """
-        for key, value in kwargs.items():
-            if value is not None:
-                self._request_params.update({key: value})
-
+        request_params = {key: value for key, value in kwargs.items() if value is not None}
         if self._api_key is not None:
-            self._request_params.update({'api_code': self._api_key})
+            request_params.update({'api_code': self._api_key})
+        return request_params
+
+    def _build_request(self, **kwargs):
+        """
+        Build request for given parameters leaving client untouched, so one
+        client can fetch several charts.
+
+        :param dict kwargs: request parameters, chart included for charts.
+        :return obj: BlockchainAPIHttpRequest instance.
+        """
+        api_url = self._api_url
+        if self._api_data == 'charts' and 'chart' in kwargs:
+            api_url += '/{}'.format(kwargs.pop('chart'))
+        return BlockchainAPIHttpRequest(api_url, self._get_request_params(**kwargs),
+                                        self._session, self._cache, self._api_data)
 
     def call(self, *args, **kwargs):
         """
@@ -111,14 +177,137 @@ class BlockchainAPIClient(object):
         :param str timespan: duration over which data is computed.
         :return json: request result.
         """
-        if self._api_data == 'charts' and 'chart' in kwargs:
-            self._api_url += '/{}'.format(kwargs.pop('chart'))
+        request = self._build_request(**kwargs)
+        if self._flight is None:
+            return self._fetch(request)
+        return self._flight.do(request.canonical_url, self._fetch, request)
+
+    def _fetch(self, request):
+        """
+        Fetch request and parse its response.
 
-        self._set_request_params(*args, **kwargs)
-        request = BlockchainAPIHttpRequest(self._api_url, self._request_params)
+        :param obj request: BlockchainAPIHttpRequest instance.
+        :return obj: BlockchainAPIHttpResponse instance.
+        """
+        if self._limiter is not None and not request.cached:
+            self._limiter.acquire(self._api_key, self._api_data)
         request_url, json_response = request.fetch_json_response()
-        request_result = BlockchainAPIHttpResponse(self._api_data, request_url, json_response)
-        return request_result
+        return BlockchainAPIHttpResponse(self._api_data, request_url, json_response,
+                                         transfer=request.transfer)
+
+    def call_many(self, charts, workers=4, return_exceptions=False, **kwargs):
+        """
+        Make concurrent requests of several charts sharing parameters over
+        the pooled session, yielding results as soon as they complete.
+
+        :param list charts: requested chart names.
+        :param int workers: max number of requests in flight.
+        :param bool return_exceptions: yield errors instead of raising them.
+        :param dict kwargs: request parameters common to every chart.
+        :return iterator: (chart, BlockchainAPIHttpResponse) tuples in
+        completion order.
+        """
+        if self._api_data != 'charts':
+            msg = 'Multi-chart requests only available for charts data'
+            raise BlockchainAPIClientError(msg)
+        return self._call_many(charts, workers, return_exceptions, **kwargs)
+
+    def _call_many(self, charts, workers=4, return_exceptions=False, **kwargs):
+        """
+        Yield concurrent chart requests results as soon as they complete.
+
+        :param list charts: requested chart names.
+        :param int workers: max number of requests in flight.
+        :param bool return_exceptions: yield errors instead of raising them.
+        :param dict kwargs: request parameters common to every chart.
+        :return iterator: (chart, BlockchainAPIHttpResponse) tuples in
+        completion order.
+        """
+        executor = ThreadPoolExecutor(max_workers=max(min(workers, len(charts)), 1))
+        futures = {executor.submit(self.call, chart=chart, **kwargs): chart for chart in charts}
+        try:
+            for future in as_completed(futures):
+                chart = futures[future]
+                try:
+                    yield chart, future.result()
+                except Exception as error:
+                    if not return_exceptions:
+                        raise
+                    logger.error('Error fetching %s chart: %s', chart, error)
+                    yield chart, error
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @property
+    def coalesced(self):
+        """
+        Get coalescing counters of concurrent identical calls.
+
+        :return dict: calls, executed and coalesced counters or None.
+        """
+        if self._flight is None:
+            return None
+        return self._flight.stats
+
+    def call_columnar(self, chart, **kwargs):
+        """
+        Make request of chart data streaming its values into columns without
+        building the intermediate list of x, y dicts. Responses are not cached.
+
+        :param str chart: requested chart name.
+        :param dict kwargs: additional chart request parameters.
+        :return obj: BlockchainAPIHttpResponse instance with columnar chart.
+        """
+        if self._api_data != 'charts':
+            msg = 'Columnar requests only available for charts data'
+            raise BlockchainAPIClientError(msg)
+
+        api_url = '{}/{}'.format(self._api_url, chart)
+        request = BlockchainAPIHttpRequest(api_url, self._get_request_params(**kwargs),
+                                           self._session, resource=self._api_data)
+        if self._limiter is not None:
+            self._limiter.acquire(self._api_key, self._api_data)
+        request_url, header, columns = request.fetch_columnar_response()
+        return BlockchainAPIHttpResponse(self._api_data, request_url, header, columns,
+                                         request.transfer)
+
+    def call_incremental(self, chart, since=None, **kwargs):
+        """
+        Make request of chart data newer than given timestamp. Without
+        timestamp the whole chart history is requested.
+
+        :param str chart: requested chart name.
+        :param int since: unix timestamp of last stored chart value.
+        :param dict kwargs: additional chart request parameters.
+        :return obj: BlockchainAPIHttpResponse instance.
+        """
+        if self._api_data != 'charts':
+            msg = 'Incremental requests only available for charts data'
+            raise BlockchainAPIClientError(msg)
+
+        if since is not None:
+            kwargs.update(self._incremental_window(since))
+        else:
+            kwargs.setdefault('timespan', 'all')
+        return self.call(chart=chart, **kwargs)
+
+    @staticmethod
+    def _incremental_window(since):
+        """
+        Get start and timespan parameters covering values after timestamp.
+        The window starts on the day of the timestamp so it is never missed.
+
+        :param int since: unix timestamp of last stored chart value.
+        :return dict: start and timespan request parameters.
+        """
+        start = datetime.fromtimestamp(since, tz=timezone.utc)
+        days = math.ceil((time.time() - since) / 86400) + 1
+        return {
+            'start': start.strftime('%Y-%m-%d'),
+            'timespan': '{}days'.format(max(days, 1)),
+        }
 
 
 class BlockchainAPIHttpRequest(object):
@@ -126,15 +315,26 @@ class BlockchainAPIHttpRequest(object):
     Enable Blockchain API data request.
     """
 
-    def __init__(self, api_url=None, params=None):
+    def __init__(self, api_url=None, params=None, session=None, cache=None,
+                 resource=None):
         """
-        Initialize request to Blockchain API.
+        Initialize request to Blockchain API. Without session every request
+        opens its own connection.
 
         :param str api_url: blockchain api requested url.
         :param dict params: blockchain api url needed params.
+        :param obj session: pooled http session shared between requests.
+        :param obj cache: response cache keyed on request url.
+        :param str resource: type of requested data (charts, stats, pools).
         """
         self._api_url = api_url
         self._params = params
+        self._session = session
+        self._cache = cache
+        self._resource = resource
+        self._entry = None
+        self._looked_up = False
+        self.transfer = None
 
     def __str__(self):
         """
@@ -149,46 +349,235 @@ class BlockchainAPIHttpRequest(object):
         }
         return '<{classname}:\nurl: {url}\nparams: {params}>'.format(**request)
 
-    def fetch_json_response(self):
+    def fetch_json_response(self, chunk_size=65536):
         """
-        Retrieve json object from API url.
+        Retrieve json object from API url. Body is decompressed as it
+        streams in but buffered whole before a single decode, only
+        fetch_columnar_response decodes while streaming.
 
+        :param int chunk_size: streamed body chunk size in bytes.
         :return tuple: requested url and json response.
         """
         if self._api_url is not None and self._params is not None:
-            http_response = self._http_request()
-            request_url = http_response.url
-            json_response = http_response.json()
-            return request_url, json_response
+            if self._cache is not None:
+                return self._fetch_cached_json_response(chunk_size)
+            http_response, body = self._read(b''.join, chunk_size=chunk_size)
+            return http_response.url, self._decode(body)
+        else:
+            msg = 'Error: API URL and parameters must be provided.'
+            raise BlockchainAPIHttpRequestError(msg)
+
+    def fetch_columnar_response(self, chunk_size=65536):
+        """
+        Retrieve chart from API url decoding values incrementally from the
+        streamed body.
+
+        :param int chunk_size: streamed body chunk size in bytes.
+        :return tuple: requested url, chart json header and chart columns.
+        """
+        if self._api_url is not None and self._params is not None:
+            def decode(chunks):
+                metrics = MetricsRegistry.shared()
+                labels = self.labels if metrics.enabled else {}
+                with metrics.timer('decode_seconds', **labels):
+                    return decode_chart(chunks)
+
+            try:
+                http_response, (header, columns) = self._read(decode, chunk_size=chunk_size)
+            except ValueError as error:
+                msg = 'Error: undecodable chart from url {}: {}'.format(self._api_url, error)
+                raise BlockchainAPIHttpRequestError(msg)
+            return http_response.url, header, columns
         else:
             msg = 'Error: API URL and parameters must be provided.'
             raise BlockchainAPIHttpRequestError(msg)
 
+    def _fetch_cached_json_response(self, chunk_size=65536):
+        """
+        Retrieve json object from cache, revalidating stale entries. Fetched
+        body is buffered whole before decoding, as stored entries need it.
+
+        :param int chunk_size: streamed body chunk size in bytes.
+        :return tuple: requested url and json response.
+        """
+        key = self.cache_key
+        entry = self._lookup()
+        cached_response = self._cache.serve(entry)
+        if cached_response is not None:
+            return cached_response
+
+        headers = self._cache.conditional_headers(entry)
+        http_response, body = self._read(b''.join, headers, chunk_size)
+        if http_response.status_code == requests.codes.not_modified:
+            return self._cache.revalidate(key, self._resource, entry, http_response.headers)
+
+        request_url = http_response.url
+        json_response = self._decode(body)
+        self._cache.set(key, self._resource, request_url, json_response, http_response.headers)
+        return request_url, json_response
+
     def fetch_csv_response(self):
         """
         Retrieve csv object from api url.
         """
         pass
 
-    def _http_request(self):
+    def _decode(self, body):
         """
-        Make http request to Blockchain API.
+        Decode json response body.
 
+        :param bytes body: json response body.
+        :return json: decoded json response.
+        """
+        metrics = MetricsRegistry.shared()
+        labels = self.labels if metrics.enabled else {}
+        with metrics.timer('decode_seconds', **labels):
+            return loads(body)
+
+    def _read(self, consume, headers=None, chunk_size=65536):
+        """
+        Make http request and consume its streamed body. Requests whose body
+        stream broke off, also while a replay session records it, are made
+        again following session retry policy.
+
+        :param callable consume: function consuming decoded body chunks.
+        :param dict headers: http conditional request headers.
+        :param int chunk_size: streamed body chunk size in bytes.
+        :return tuple: http object response and consumed body, None for not
+        modified responses.
+        """
+        attempts = RetryAttempts(self._api_url, getattr(self._session, 'retry', None))
+        while True:
+            try:
+                http_response = self._http_request(headers)
+                if http_response.status_code == requests.codes.not_modified:
+                    http_response.close()
+                    return http_response, None
+                return http_response, consume(self._iter_body(http_response, chunk_size))
+            except BlockchainAPIStreamError as error:
+                if not attempts.retryable():
+                    raise
+                delay = attempts.backoff()
+                logger.warning('Body from %s broke off (%s), retry in %.2fs.',
+                               self._api_url, error, delay)
+                time.sleep(delay)
+
+    def _iter_body(self, http_response, chunk_size=65536):
+        """
+        Stream response body decompressing chunks as they arrive. Transfer
+        stats are recorded once the body is consumed.
+
+        :param obj http_response: streamed http object response.
+        :param int chunk_size: streamed body chunk size in bytes.
+        :return iterator: decoded body chunks.
+        """
+        try:
+            decoder = ContentDecoder(http_response.headers.get('Content-Encoding'))
+            chunks = http_response.raw.stream(chunk_size, decode_content=False)
+            yield from decoder.iter_decoded(chunks)
+        except ValueError as error:
+            msg = 'Error: undecodable body from url {}: {}'.format(self._api_url, error)
+            raise BlockchainAPIHttpRequestError(msg)
+        except (urllib3.exceptions.HTTPError, requests.RequestException, OSError) as error:
+            msg = 'Error: body from url {} broke off: {}'.format(self._api_url, error)
+            raise BlockchainAPIStreamError(msg)
+        finally:
+            http_response.close()
+
+        self.transfer = decoder.stats
+        metrics = MetricsRegistry.shared()
+        if metrics.enabled:
+            metrics.inc('http_wire_bytes_total', decoder.compressed, **self.labels)
+            metrics.inc('http_decoded_bytes_total', decoder.decompressed, **self.labels)
+        logger.debug('Transfer %s: %s bytes over the wire, %s bytes decoded (%s, %.1fx)',
+                    self._api_url, decoder.compressed, decoder.decompressed,
+                    decoder.encoding, self.transfer['ratio'])
+
+    def _http_request(self, headers=None):
+        """
+        Make http request to Blockchain API negotiating compression. Body is
+        streamed, not downloaded. Not modified responses are only accepted
+        for conditional requests.
+
+        :param dict headers: http conditional request headers.
         :return obj: http object response.
         """
+        conditional = bool(headers)
+        headers = dict(headers or {}, **{'Accept-Encoding': ACCEPT_ENCODING})
         encoded_params = {}
         for key, value in self._params.items():
             value = str(value).encode(encoding='utf-8')
             encoded_params.update({key: value})
 
-        http_response = requests.get(self._api_url, params=encoded_params)
+        metrics = MetricsRegistry.shared()
+        labels = self.labels if metrics.enabled else {}
+        try:
+            with metrics.timer('http_request_seconds', **labels):
+                if self._session is not None:
+                    http_response = self._session.get(self._api_url, params=encoded_params,
+                                                      headers=headers, stream=True)
+                else:
+                    http_response = requests.get(self._api_url, params=encoded_params,
+                                                 headers=headers, stream=True, timeout=TIMEOUT)
+        except BlockchainAPIHttpRequestError as error:
+            metrics.inc('http_errors_total', code=getattr(error, 'code', 'connection'), **labels)
+            raise
+
+        metrics.inc('http_requests_total', status=http_response.status_code, **labels)
         if http_response.status_code == requests.codes.ok:
             return http_response
+        elif conditional and http_response.status_code == requests.codes.not_modified:
+            return http_response
         else:
+            http_response.close()
+            metrics.inc('http_errors_total', code=http_response.status_code, **labels)
             msg = 'Error: url {}, params {}'.format(self._api_url, self._params)
             code = http_response.status_code
             raise BlockchainAPIHttpRequestError(msg, code)
 
+    @property
+    def labels(self):
+        """
+        Get metric labels identifying requested resource and chart.
+
+        :return dict: resource and chart labels.
+        """
+        resource = self._resource or 'unknown'
+        if resource == 'charts':
+            return {'resource': resource, 'chart': self._api_url.rstrip('/').rsplit('/', 1)[-1]}
+        return {'resource': resource, 'chart': resource}
+
+    @property
+    def cached(self):
+        """
+        Check whether request can be served from cache without network.
+
+        :return bool: fresh cached response available.
+        """
+        if self._cache is None:
+            return False
+        return self._cache.is_fresh(self._lookup())
+
+    def _lookup(self):
+        """
+        Get cache entry for request, reading the backend once per request.
+
+        :return dict: cache entry or None.
+        """
+        if not self._looked_up:
+            self._entry = self._cache.lookup(self.cache_key)
+            self._looked_up = True
+        return self._entry
+
+    @property
+    def cache_key(self):
+        """
+        Get cache key identifying request, secret parameters left out.
+
+        :return str: canonical request url without secrets.
+        """
+        return canonical_url(self._api_url, public_params(self._params))
+
     @property
     def request_url(self):
         """
@@ -201,36 +590,62 @@ class BlockchainAPIHttpRequest(object):
             url += '{key}={value}&'.format(key=key, value=value)
         return url[:-1]
 
+    @property
+    def canonical_url(self):
+        """
+        Get request url with sorted parameters identifying identical requests.
+
+        :return str: canonical request url.
+        """
+        return canonical_url(self._api_url, self._params)
+
 
 class BlockchainAPIHttpResponse(object):
     """
     Enable Blockchain API response data parsing.
     """
 
-    def __init__(self, data=None, url=None, response=None):
+    def __init__(self, data=None, url=None, response=None, columns=None, transfer=None):
         """
-        Initialize Blockchain API response parsing.
+        Initialize Blockchain API response parsing. Resource object named
+        after the type of data is built on first access.
 
         :param str data: type of fetched data (charts, stats, pools).
         :param str url: requested Blockchain API url.
         :param dict response: http json response.
+        :param obj columns: chart values decoded into columns.
+        :param dict transfer: transferred and decoded bytes, None if cached.
         """
         self._data = data
         self._url = url
         self._response = response
+        self._columns = columns
+        self.transfer = transfer
 
-        try:
-            _temp = __import__('blockchain.resources', globals(), locals(), [self._data], 0)
-        except ImportError as msg:
-            logger.error('Error importing response class for %s data: %s', (data, msg))
-
-        _resource = getattr(_temp, self._data, None)
-        classname = getattr(_resource, settings.RESOURCES.get(self._data), None)
-        if callable(classname):
-            setattr(self, '{}'.format(self._data), classname.start(self._response, False))
-        else:
+        if data not in RESOURCE_CLASSES:
             logger.error('Error initializing response class for %s data.', data)
 
+    def __getattr__(self, name):
+        """
+        Build resource object on first access and keep it as attribute.
+
+        :param str name: attribute name.
+        :return obj: resource object for the type of data.
+        """
+        data = self.__dict__.get('_data')
+        classname = RESOURCE_CLASSES.get(data)
+        if name != data or classname is None:
+            raise AttributeError("'{}' object has no attribute '{}'".format(
+                self.__class__.__name__, name))
+
+        with MetricsRegistry.shared().timer('response_seconds', resource=data, stage='resource'):
+            if self._columns is not None:
+                resource = classname.from_columns(self._response, self._columns)
+            else:
+                resource = classname.start(self._response, False)
+        setattr(self, name, resource)
+        return resource
+
     def __str__(self):
         """
         Represent class via params string.
@@ -258,18 +673,35 @@ class BlockchainAPIHttpResponse(object):
     @property
     def response(self):
         """
-        Get homogeneous response from Blockchain API.
+        Get homogeneous response from Blockchain API. Parsed response is
+        left untouched so coalesced callers can share it.
 
         :return json: Blockchain API response with slug field.
         """
-        if self._data != 'charts':
-            response = {
-                '_name': self._data.capitalize(),
-                '_values': self._response,
-            }
-        else:
-            response = self._response
-            response.pop('status', None)
-
-        response = self._generate_slug(response)
+        with MetricsRegistry.shared().timer('response_seconds', resource=self._data,
+                                            stage='document'):
+            if self._data != 'charts':
+                response = {
+                    '_name': self._data.capitalize(),
+                    '_values': self._response,
+                }
+            else:
+                response = dict(self._response)
+                response.pop('status', None)
+                response.update({'_chart': self.chart})
+                if self._columns is not None:
+                    response.update({'values': self._columns.to_values()})
+
+            response = self._generate_slug(response)
         return response
+
+    @property
+    def chart(self):
+        """
+        Get requested chart name from response url.
+
+        :return str: chart name or None for other data.
+        """
+        if self._data != 'charts' or self._url is None:
+            return None
+        return urlparse(self._url).path.rstrip('/').split('/')[-1]
@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import configparser
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from logging.config import fileConfig
+from os.path import dirname, join
+
+from .coalesce import redact_url
+from .exceptions import BlockchainAPICacheError
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend(object):
+    """
+    Enable in memory least recently used cache storage.
+    """
+
+    def __init__(self, maxsize=128):
+        """
+        Initialize in memory cache storage.
+
+        :param int maxsize: max number of cached entries.
+        """
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'maxsize': self._maxsize,
+            'size': len(self._entries),
+        }
+        return str(params)
+
+    def get(self, key):
+        """
+        Get cache entry marking it as recently used.
+
+        :param str key: cache key.
+        :return dict: cache entry or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        """
+        Store cache entry evicting least recently used ones.
+
+        :param str key: cache key.
+        :param dict entry: cache entry.
+        """
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove cache entry.
+
+        :param str key: cache key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove every cache entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+class FileCacheBackend(object):
+    """
+    Enable on disk cache storage, one json file per entry.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize on disk cache storage.
+
+        :param str path: cache directory path.
+        """
+        self._path = path
+        os.makedirs(self._path, exist_ok=True)
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'path': self._path,
+        }
+        return str(params)
+
+    def _filepath(self, key):
+        """
+        Get cache entry file path.
+
+        :param str key: cache key.
+        :return str: entry file path.
+        """
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return join(self._path, '{}.json'.format(digest))
+
+    def get(self, key):
+        """
+        Get cache entry.
+
+        :param str key: cache key.
+        :return dict: cache entry or None.
+        """
+        try:
+            with open(self._filepath(key), 'r') as entry_file:
+                return json.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as msg:
+            logger.error('Unreadable cache entry for %s: %s', key, msg)
+            return None
+
+    def set(self, key, entry):
+        """
+        Store cache entry atomically. Write failures are logged, never
+        failing the fetch whose response is being cached.
+
+        :param str key: cache key.
+        :param dict entry: cache entry.
+        """
+        filepath = self._filepath(key)
+        temp_filepath = '{}.{}.tmp'.format(filepath, threading.get_ident())
+        try:
+            with open(temp_filepath, 'w') as entry_file:
+                json.dump(entry, entry_file)
+            os.replace(temp_filepath, filepath)
+        except OSError as msg:
+            logger.error('Cache entry for %s not stored: %s', key, msg)
+            try:
+                os.remove(temp_filepath)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        """
+        Remove cache entry.
+
+        :param str key: cache key.
+        """
+        try:
+            os.remove(self._filepath(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """
+        Remove every cache entry.
+        """
+        for filename in os.listdir(self._path):
+            if filename.endswith('.json'):
+                os.remove(join(self._path, filename))
+
+
+class ResponseCache(object):
+    """
+    Enable Blockchain API response caching with per resource TTL.
+    """
+
+    _shared = None
+    _lock = threading.Lock()
+
+    def __init__(self, backend, ttls=None, default_ttl=0):
+        """
+        Initialize response cache.
+
+        :param obj backend: cache storage backend.
+        :param dict ttls: seconds a response stays fresh for every resource.
+        :param int default_ttl: seconds a response stays fresh otherwise.
+        """
+        self._backend = backend
+        self._ttls = ttls or {}
+        self._default_ttl = default_ttl
+        self._counters = {'hits': 0, 'misses': 0, 'revalidations': 0, 'stores': 0}
+        self._counters_lock = threading.Lock()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'backend': str(self._backend),
+            'ttls': self._ttls,
+        }
+        return str(params)
+
+    @classmethod
+    def config(cls, filename='blockchain.cfg', section='cache'):
+        """
+        Get ResponseCache class instance.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: ResponseCache class instance or None if disabled.
+        """
+        parser = configparser.ConfigParser()
+        parser.read(filename)
+        if not parser.has_section(section):
+            msg = 'Section {} not found in {} file'.format(section, filename)
+            raise BlockchainAPICacheError(msg)
+
+        try:
+            if not parser.getboolean(section, 'enabled'):
+                return None
+            backend_name = parser.get(section, 'backend')
+            if backend_name == 'file':
+                backend = FileCacheBackend(parser.get(section, 'path'))
+            elif backend_name == 'memory':
+                backend = MemoryCacheBackend(parser.getint(section, 'maxsize'))
+            else:
+                msg = 'Unknown cache backend: {}'.format(backend_name)
+                raise BlockchainAPICacheError(msg)
+            ttls = {resource: parser.getint(section, '{}_ttl'.format(resource))
+                    for resource in ('charts', 'stats', 'pools')}
+            return cls(backend, ttls)
+        except (configparser.Error, ValueError) as msg:
+            msg = 'Incorrect cache configuration in {}: {}'.format(filename, msg)
+            raise BlockchainAPICacheError(msg)
+
+    @classmethod
+    def shared(cls, filename='blockchain.cfg', section='cache'):
+        """
+        Get process wide ResponseCache instance, creating it once.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: shared ResponseCache class instance or None if disabled.
+        """
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None:
+                    cls._shared = cls.config(filename, section) or False
+                    logger.info('Shared response cache created: %s', cls._shared)
+        return cls._shared or None
+
+    def _count(self, counter):
+        """
+        Increase cache counter.
+
+        :param str counter: counter name.
+        """
+        with self._counters_lock:
+            self._counters[counter] += 1
+
+    def ttl(self, resource):
+        """
+        Get seconds a resource response stays fresh.
+
+        :param str resource: type of data (charts, stats, pools).
+        :return int: time to live in seconds.
+        """
+        return self._ttls.get(resource, self._default_ttl)
+
+    def lookup(self, key):
+        """
+        Get cache entry for key.
+
+        :param str key: request url.
+        :return dict: cache entry or None.
+        """
+        return self._backend.get(key)
+
+    def is_fresh(self, entry):
+        """
+        Check whether cache entry can be served without network.
+
+        :param dict entry: cache entry.
+        :return bool: entry freshness.
+        """
+        return entry is not None and entry.get('expires_at', 0) > time.time()
+
+    def serve(self, entry):
+        """
+        Get response from cache entry if fresh, counting hits and misses.
+
+        :param dict entry: cache entry or None.
+        :return tuple: requested url and json response or None.
+        """
+        if self.is_fresh(entry):
+            self._count('hits')
+            return entry['url'], json.loads(entry['body'])
+
+        self._count('misses')
+        return None
+
+    def get(self, key):
+        """
+        Get fresh cached response counting hits and misses.
+
+        :param str key: request url.
+        :return tuple: requested url and json response or None.
+        """
+        return self.serve(self._backend.get(key))
+
+    def conditional_headers(self, entry):
+        """
+        Get revalidation headers for stale cache entry.
+
+        :param dict entry: cache entry.
+        :return dict: http conditional request headers.
+        """
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers.update({'If-None-Match': entry['etag']})
+            if entry.get('last_modified'):
+                headers.update({'If-Modified-Since': entry['last_modified']})
+        return headers
+
+    def set(self, key, resource, url, response, headers=None):
+        """
+        Store json response. Secret parameters are left out of the stored
+        url so the api key never reaches the backend.
+
+        :param str key: request url without secret parameters.
+        :param str resource: type of data (charts, stats, pools).
+        :param str url: requested url.
+        :param dict response: json response.
+        :param dict headers: http response headers.
+        """
+        headers = headers or {}
+        entry = {
+            'url': redact_url(url),
+            'body': json.dumps(response),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'expires_at': time.time() + self.ttl(resource),
+        }
+        self._backend.set(key, entry)
+        self._count('stores')
+
+    def revalidate(self, key, resource, entry, headers=None):
+        """
+        Extend stale cache entry confirmed unchanged by the server.
+
+        :param str key: request url.
+        :param str resource: type of data (charts, stats, pools).
+        :param dict entry: cache entry.
+        :param dict headers: http not modified response headers.
+        :return tuple: requested url and json response.
+        """
+        headers = headers or {}
+        entry = dict(entry)
+        entry['etag'] = headers.get('ETag') or entry.get('etag')
+        entry['last_modified'] = headers.get('Last-Modified') or entry.get('last_modified')
+        entry['expires_at'] = time.time() + self.ttl(resource)
+        self._backend.set(key, entry)
+        self._count('revalidations')
+        return entry['url'], json.loads(entry['body'])
+
+    def clear(self):
+        """
+        Remove every cached response.
+        """
+        self._backend.clear()
+
+    @property
+    def stats(self):
+        """
+        Get cache hit and miss counters.
+
+        :return dict: cache counters.
+        """
+        with self._counters_lock:
+            return dict(self._counters)
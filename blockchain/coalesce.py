@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import asyncio
+import logging
+import threading
+
+from concurrent.futures import Future
+from logging.config import fileConfig
+from os.path import dirname, join
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .settings import SECRET_PARAMS
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+
+def canonical_url(api_url, params=None):
+    """
+    Get request url with sorted query parameters so identical requests
+    share the same key regardless of parameters order.
+
+    :param str api_url: requested url.
+    :param dict params: request parameters.
+    :return str: canonical request url.
+    """
+    if not params:
+        return api_url
+    query = urlencode(sorted((key, str(value)) for key, value in params.items()))
+    return '{}?{}'.format(api_url, query)
+
+
+def public_params(params=None):
+    """
+    Get request parameters with secrets, as the api key, left out.
+
+    :param dict params: request parameters.
+    :return dict: request parameters safe to persist.
+    """
+    return {key: value for key, value in (params or {}).items() if key not in SECRET_PARAMS}
+
+
+def redact_url(url):
+    """
+    Get url with secret query parameters left out.
+
+    :param str url: requested url.
+    :return str: url safe to persist.
+    """
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class SingleFlight(object):
+    """
+    Enable de-duplication of concurrent identical calls across threads.
+
+    The first caller for a key runs the call while callers arriving before
+    it finishes wait for and share its result, or its error.
+    """
+
+    _shared = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        """
+        Initialize empty in-flight calls registry.
+        """
+        self._calls = {}
+        self._calls_lock = threading.Lock()
+        self._counters = {'calls': 0, 'executed': 0, 'coalesced': 0}
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'in_flight': len(self._calls),
+        }
+        params.update(self.stats)
+        return str(params)
+
+    @classmethod
+    def shared(cls):
+        """
+        Get process wide SingleFlight instance, creating it once.
+
+        :return cls: shared SingleFlight class instance.
+        """
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Run call once for every group of concurrent callers with same key.
+
+        :param str key: call key, usually the canonical request url.
+        :param callable function: call to run.
+        :param list args: call arguments.
+        :param dict kwargs: call keyword arguments.
+        :return obj: call result.
+        """
+        with self._calls_lock:
+            self._counters['calls'] += 1
+            future = self._calls.get(key)
+            if future is not None:
+                self._counters['coalesced'] += 1
+            else:
+                self._counters['executed'] += 1
+                self._calls[key] = Future()
+
+        if future is not None:
+            logger.debug('Coalesced call for %s', key)
+            return future.result()
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as error:
+            self._pop(key).set_exception(error)
+            raise
+        self._pop(key).set_result(result)
+        return result
+
+    def _pop(self, key):
+        """
+        Remove finished call so later callers run it again.
+
+        :param str key: call key.
+        :return obj: finished call future.
+        """
+        with self._calls_lock:
+            return self._calls.pop(key)
+
+    @property
+    def stats(self):
+        """
+        Get coalescing counters.
+
+        :return dict: calls, executed and coalesced counters.
+        """
+        with self._calls_lock:
+            return dict(self._counters)
+
+
+class AsyncSingleFlight(object):
+    """
+    Enable de-duplication of concurrent identical calls across tasks of
+    one event loop.
+    """
+
+    def __init__(self):
+        """
+        Initialize empty in-flight calls registry.
+        """
+        self._calls = {}
+        self._counters = {'calls': 0, 'executed': 0, 'coalesced': 0}
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'in_flight': len(self._calls),
+        }
+        params.update(self.stats)
+        return str(params)
+
+    async def do(self, key, function, *args, **kwargs):
+        """
+        Await call once for every group of concurrent callers with same key.
+
+        :param str key: call key, usually the canonical request url.
+        :param callable function: coroutine function to await.
+        :param list args: call arguments.
+        :param dict kwargs: call keyword arguments.
+        :return obj: call result.
+        """
+        self._counters['calls'] += 1
+        future = self._calls.get(key)
+        if future is not None:
+            self._counters['coalesced'] += 1
+            logger.debug('Coalesced call for %s', key)
+            return await asyncio.shield(future)
+
+        self._counters['executed'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await function(*args, **kwargs)
+        except asyncio.CancelledError:
+            self._calls.pop(key, None)
+            future.cancel()
+            raise
+        except Exception as error:
+            self._calls.pop(key, None)
+            future.set_exception(error)
+            # Retrieved here so unawaited errors are not reported by the loop
+            future.exception()
+            raise
+        self._calls.pop(key, None)
+        future.set_result(result)
+        return result
+
+    @property
+    def stats(self):
+        """
+        Get coalescing counters.
+
+        :return dict: calls, executed and coalesced counters.
+        """
+        return dict(self._counters)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import re
+import zlib
+
+from .resources.charts import ChartColumns
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Fastest available json decoder
+if orjson is not None:
+    DECODER = 'orjson'
+elif ujson is not None:
+    DECODER = 'ujson'
+else:
+    DECODER = 'json'
+
+NUMBER = rb'(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)'
+POINT = re.compile(rb'[\s,]*\{\s*"x"\s*:\s*' + NUMBER + rb'\s*,\s*"y"\s*:\s*' + NUMBER + rb'\s*\}')
+VALUES_KEY = re.compile(rb'"values"\s*:\s*\[')
+SEPARATORS = b' \t\r\n,'
+
+# Negotiated http content encodings
+ACCEPT_ENCODING = 'gzip, deflate'
+WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+def loads(data):
+    """
+    Decode json document with the fastest available decoder.
+
+    :param bytes data: json document.
+    :return json: decoded json object.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if ujson is not None:
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+class ContentDecoder(object):
+    """
+    Enable incremental decompression of http body chunks counting bytes
+    transferred over the wire and bytes decoded.
+    """
+
+    def __init__(self, encoding=None):
+        """
+        Initialize content decoder for response content encoding.
+
+        :param str encoding: Content-Encoding header value.
+        """
+        self.encoding = (encoding or 'identity').strip().lower()
+        if self.encoding in WBITS:
+            self._decompressor = zlib.decompressobj(WBITS[self.encoding])
+        elif self.encoding == 'identity':
+            self._decompressor = None
+        else:
+            raise ValueError('Unsupported content encoding {}'.format(self.encoding))
+        self.compressed = 0
+        self.decompressed = 0
+
+    def decode(self, chunk):
+        """
+        Decompress body chunk.
+
+        :param bytes chunk: body chunk as transferred.
+        :return bytes: decoded body chunk.
+        """
+        self.compressed += len(chunk)
+        if self._decompressor is not None:
+            try:
+                chunk = self._decompressor.decompress(chunk)
+            except zlib.error as error:
+                raise ValueError('Corrupt {} body: {}'.format(self.encoding, error))
+        self.decompressed += len(chunk)
+        return chunk
+
+    def flush(self):
+        """
+        Get remaining decoded bytes once body is transferred.
+
+        :return bytes: decoded body tail.
+        """
+        if self._decompressor is None:
+            return b''
+        chunk = self._decompressor.flush()
+        self.decompressed += len(chunk)
+        return chunk
+
+    def iter_decoded(self, chunks):
+        """
+        Decode body chunks as they arrive.
+
+        :param iterable chunks: body chunks as transferred.
+        :return iterator: decoded body chunks.
+        """
+        for chunk in chunks:
+            chunk = self.decode(chunk)
+            if chunk:
+                yield chunk
+        chunk = self.flush()
+        if chunk:
+            yield chunk
+
+    @property
+    def stats(self):
+        """
+        Get transferred and decoded bytes.
+
+        :return dict: encoding, compressed and decompressed bytes and ratio.
+        """
+        return {
+            'encoding': self.encoding,
+            'compressed': self.compressed,
+            'decompressed': self.decompressed,
+            'ratio': self.decompressed / self.compressed if self.compressed else 0.0,
+        }
+
+
+class ChartValuesDecoder(object):
+    """
+    Enable incremental chart decoding streaming values into columns.
+
+    Chart payload bytes are fed in chunks. Everything but the values array
+    is kept to be decoded as the chart header while values are parsed
+    straight into ChartColumns without building x, y dicts.
+    """
+
+    def __init__(self):
+        """
+        Initialize incremental chart decoder.
+        """
+        self._header = bytearray()
+        self._searched = 0
+        self._pending = b''
+        self._in_values = False
+        self._done_values = False
+        self.columns = ChartColumns()
+
+    def feed(self, chunk):
+        """
+        Decode payload chunk.
+
+        :param bytes chunk: chart payload chunk.
+        """
+        if self._in_values:
+            self._pending += chunk
+            self._parse_values()
+        elif self._done_values:
+            self._header += chunk
+        else:
+            self._header += chunk
+            self._find_values()
+
+    def _find_values(self):
+        """
+        Switch to values parsing once values array starts.
+        """
+        match = VALUES_KEY.search(self._header, max(self._searched - 16, 0))
+        if match is None:
+            self._searched = len(self._header)
+            return
+
+        self._pending = bytes(self._header[match.end():])
+        del self._header[match.end():]
+        self._header += b']'
+        self._in_values = True
+        self._parse_values()
+
+    def _parse_values(self):
+        """
+        Parse complete chart values from pending bytes.
+        """
+        pending = self._pending
+        position, size = 0, len(pending)
+        while position < size:
+            if pending[position] in SEPARATORS:
+                position += 1
+                continue
+
+            if pending[position:position + 1] == b']':
+                self._in_values = False
+                self._done_values = True
+                self._header += pending[position + 1:]
+                self._pending = b''
+                return
+
+            parsed = self._parse_points(pending, position)
+            if parsed != position:
+                position = parsed
+                continue
+
+            end = pending.find(b'}', position)
+            if end < 0:
+                break
+            value = json.loads(pending[position:end + 1].decode('utf-8'))
+            y = value.get('y')
+            self.columns.append(float(value['x']), float('nan') if y is None else float(y))
+            position = end + 1
+
+        self._pending = pending[position:]
+
+    def _parse_points(self, pending, position):
+        """
+        Parse run of contiguous standard x, y chart values in bulk.
+
+        :param bytes pending: pending payload bytes.
+        :param int position: run start position.
+        :return int: position after last parsed chart value.
+        """
+        xs, ys = [], []
+        for match in POINT.finditer(pending, position):
+            if match.start() != position:
+                break
+            xs.append(match.group(1))
+            ys.append(match.group(2))
+            position = match.end()
+        if xs:
+            self.columns.extend(map(float, xs), map(float, ys))
+        return position
+
+    def close(self):
+        """
+        Finish decoding and get chart header and values.
+
+        :return tuple: chart json header without values and chart columns.
+        """
+        if self._in_values:
+            raise ValueError('Incomplete chart values array')
+        header = loads(bytes(self._header))
+        header.pop('values', None)
+        return header, self.columns
+
+
+def decode_chart(chunks):
+    """
+    Decode chart payload chunks into header and columns.
+
+    :param iterable chunks: chart payload byte chunks.
+    :return tuple: chart json header without values and chart columns.
+    """
+    decoder = ChartValuesDecoder()
+    for chunk in chunks:
+        if chunk:
+            decoder.feed(chunk)
+    return decoder.close()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import hashlib
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Document field holding content digest of persisted data
+DIGEST_FIELD = '_digest'
+
+# Document fields left out of content digest
+IGNORED_FIELDS = ('_id', DIGEST_FIELD)
+
+
+def canonical(data):
+    """
+    Serialize document with sorted keys so equal content gives equal bytes.
+
+    :param json data: normalized json document.
+    :return bytes: canonical json document.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS, default=str)
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False,
+                      default=str).encode('utf-8')
+
+
+def digest(data):
+    """
+    Get content digest of normalized document, database fields excluded.
+
+    :param json data: normalized json document.
+    :return str: blake2b hex digest.
+    """
+    content = {key: value for key, value in data.items() if key not in IGNORED_FIELDS}
+    return hashlib.blake2b(canonical(content), digest_size=16).hexdigest()
+
+
+def diff_values(stored, fresh):
+    """
+    Get point level difference between stored and fresh chart values.
+    Fresh values must extend stored ones point by point, same timestamp
+    at every stored position, for the difference to be expressible.
+
+    :param list stored: stored chart x, y values.
+    :param list fresh: fetched chart x, y values.
+    :return tuple: changed y values by position and appended values, or
+    None if fresh values do not line up with stored ones.
+    """
+    if len(fresh) < len(stored):
+        return None
+    changed = {}
+    for position, (old, new) in enumerate(zip(stored, fresh)):
+        if old.get('x') != new.get('x'):
+            return None
+        if old.get('y') != new.get('y'):
+            changed[position] = new.get('y')
+    return changed, fresh[len(stored):]
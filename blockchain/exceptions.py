@@ -41,3 +41,80 @@ class MongoDBPipelineError(BaseError):
     Handle exception for MongoDB pipeline error.
     """
     pass
+
+
+class BlockchainAPISessionError(BaseError):
+    """
+    Handle exception for Blockchain API session error.
+    """
+    pass
+
+
+class BlockchainAPIRateLimitError(BaseError):
+    """
+    Handle exception for Blockchain API rate limit error.
+    """
+    pass
+
+
+class BlockchainAPICacheError(BaseError):
+    """
+    Handle exception for Blockchain API cache error.
+    """
+    pass
+
+
+class PipelineRegistryError(BaseError):
+    """
+    Handle exception for pipeline registry error.
+    """
+    pass
+
+
+class PostgreSQLPipelineError(BaseError):
+    """
+    Handle exception for PostgreSQL pipeline error.
+    """
+    pass
+
+
+class StagedPipelineError(BaseError):
+    """
+    Handle exception for staged pipeline error.
+    """
+    pass
+
+
+class BlockchainAPIRetryError(BaseError):
+    """
+    Handle exception for Blockchain API retry configuration error.
+    """
+    pass
+
+
+class BlockchainAPICircuitOpenError(BlockchainAPIHttpRequestError):
+    """
+    Handle exception for Blockchain API request short circuited by breaker.
+    """
+    pass
+
+
+class MetricsError(BaseError):
+    """
+    Handle exception for metrics configuration error.
+    """
+    pass
+
+
+class BlockchainAPIReplayError(BlockchainAPIHttpRequestError):
+    """
+    Handle exception for Blockchain API replay archive error.
+    """
+    pass
+
+
+class BlockchainAPIStreamError(BlockchainAPIHttpRequestError):
+    """
+    Handle exception for Blockchain API response body interrupted while streaming.
+    """
+    pass
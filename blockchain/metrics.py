@@ -0,0 +1,487 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import configparser
+import functools
+import logging
+import socket
+import threading
+import time
+
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.config import fileConfig
+from os.path import dirname, join
+
+from .exceptions import MetricsError
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+# Nested instrumented calls already being recorded
+_local = threading.local()
+
+# Latency histogram upper bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class NullTimer(object):
+    """
+    Enable timing calls at no cost while metrics are disabled.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        """
+        Start nothing.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Record nothing.
+        """
+        return False
+
+
+# Shared no-op timer
+NULL_TIMER = NullTimer()
+
+
+class Timer(object):
+    """
+    Enable timing a block into a latency histogram.
+    """
+
+    __slots__ = ('_registry', '_name', '_labels', '_started')
+
+    def __init__(self, registry, name, labels):
+        """
+        Initialize timer.
+
+        :param obj registry: metrics registry.
+        :param str name: histogram name.
+        :param dict labels: histogram labels.
+        """
+        self._registry = registry
+        self._name = name
+        self._labels = labels
+        self._started = None
+
+    def __enter__(self):
+        """
+        Start timing block.
+        """
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Record block latency, errors included.
+        """
+        self._registry.observe(self._name, time.perf_counter() - self._started, **self._labels)
+        return False
+
+
+class MetricsRegistry(object):
+    """
+    Enable labeled counters and latency histograms for hot paths.
+
+    Disabled registries return right away and hand out a shared no-op timer
+    so instrumented code pays a single attribute check.
+    """
+
+    _shared = None
+    _lock = threading.Lock()
+
+    def __init__(self, enabled=True, prefix='blockchain', buckets=BUCKETS, exporter=None):
+        """
+        Initialize empty metrics registry.
+
+        :param bool enabled: flag to signal metrics recording.
+        :param str prefix: metric names prefix.
+        :param tuple buckets: latency histogram upper bounds in seconds.
+        :param obj exporter: exporter publishing metrics.
+        """
+        self.enabled = enabled
+        self._prefix = prefix
+        self._buckets = tuple(sorted(buckets))
+        self._exporter = exporter
+        self._counters = {}
+        self._histograms = {}
+        self._metrics_lock = threading.Lock()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'enabled': self.enabled,
+            'prefix': self._prefix,
+            'exporter': str(self._exporter),
+        }
+        return str(params)
+
+    @classmethod
+    def config(cls, filename='blockchain.cfg', section='metrics'):
+        """
+        Get MetricsRegistry class instance.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: MetricsRegistry class instance.
+        """
+        parser = configparser.ConfigParser()
+        parser.read(filename)
+        if parser.has_section(section):
+            try:
+                if not parser.getboolean(section, 'enabled'):
+                    return cls(enabled=False)
+                exporter = parser.get(section, 'exporter')
+                host = parser.get(section, 'host')
+                port = parser.getint(section, 'port')
+                prefix = parser.get(section, 'prefix')
+            except (configparser.Error, ValueError) as msg:
+                msg = 'Incorrect metrics configuration in {}: {}'.format(filename, msg)
+                raise MetricsError(msg)
+            registry = cls(prefix=prefix)
+            if exporter == 'prometheus':
+                registry._exporter = PrometheusExporter(registry, host, port)
+            elif exporter == 'statsd':
+                registry._exporter = StatsDExporter(host, port, prefix)
+            elif exporter != 'none':
+                msg = 'Unknown metrics exporter: {}'.format(exporter)
+                raise MetricsError(msg)
+            return registry
+        else:
+            msg = 'Section {} not found in {} file'.format(section, filename)
+            raise MetricsError(msg)
+
+    @classmethod
+    def shared(cls, filename='blockchain.cfg', section='metrics'):
+        """
+        Get process wide MetricsRegistry instance, creating it once. Metrics
+        are disabled when configuration is missing, never breaking callers.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: shared MetricsRegistry class instance.
+        """
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None:
+                    try:
+                        cls._shared = cls.config(filename, section)
+                    except MetricsError as msg:
+                        logger.warning('Metrics disabled: %s', msg)
+                        cls._shared = cls(enabled=False)
+        return cls._shared
+
+    @staticmethod
+    def _key(labels):
+        """
+        Get hashable key for labels.
+
+        :param dict labels: metric labels.
+        :return tuple: sorted label items.
+        """
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Increase labeled counter.
+
+        :param str name: counter name.
+        :param int amount: counter increment.
+        :param dict labels: counter labels.
+        """
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._metrics_lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+        if isinstance(self._exporter, StatsDExporter):
+            self._exporter.send(name, amount, 'c', key)
+
+    def observe(self, name, value, **labels):
+        """
+        Record value in labeled histogram.
+
+        :param str name: histogram name.
+        :param float value: observed value, seconds for latencies.
+        :param dict labels: histogram labels.
+        """
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._metrics_lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = [[0] * (len(self._buckets) + 1), 0.0, 0]
+            histogram[0][bisect_left(self._buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+        if isinstance(self._exporter, StatsDExporter):
+            self._exporter.send(name, value * 1000, 'ms', key)
+
+    def timer(self, name, **labels):
+        """
+        Get context manager timing a block into labeled histogram.
+
+        :param str name: histogram name.
+        :param dict labels: histogram labels.
+        :return obj: timer context manager.
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name, labels)
+
+    def snapshot(self):
+        """
+        Get copy of every recorded metric.
+
+        :return dict: counters and histograms by name and labels.
+        """
+        with self._metrics_lock:
+            return {
+                'counters': {name: dict(series) for name, series in self._counters.items()},
+                'histograms': {name: {key: {'buckets': list(value[0]), 'sum': value[1],
+                                            'count': value[2]}
+                                      for key, value in series.items()}
+                               for name, series in self._histograms.items()},
+            }
+
+    def render(self):
+        """
+        Render every recorded metric in Prometheus text format.
+
+        :return str: Prometheus exposition text.
+        """
+        def labels_text(key, extra=()):
+            items = ['{}="{}"'.format(label, value.replace('"', '\\"'))
+                     for label, value in key + tuple(extra)]
+            return '{{{}}}'.format(','.join(items)) if items else ''
+
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in sorted(snapshot['counters'].items()):
+            metric = '{}_{}'.format(self._prefix, name)
+            lines.append('# TYPE {} counter'.format(metric))
+            for key, value in sorted(series.items()):
+                lines.append('{}{} {}'.format(metric, labels_text(key), value))
+        for name, series in sorted(snapshot['histograms'].items()):
+            metric = '{}_{}'.format(self._prefix, name)
+            lines.append('# TYPE {} histogram'.format(metric))
+            for key, value in sorted(series.items()):
+                cumulative = 0
+                bounds = [str(bound) for bound in self._buckets] + ['+Inf']
+                for bound, count in zip(bounds, value['buckets']):
+                    cumulative += count
+                    lines.append('{}_bucket{} {}'.format(
+                        metric, labels_text(key, [('le', bound)]), cumulative))
+                lines.append('{}_sum{} {}'.format(metric, labels_text(key), value['sum']))
+                lines.append('{}_count{} {}'.format(metric, labels_text(key), value['count']))
+        return '\n'.join(lines) + '\n'
+
+    def start(self):
+        """
+        Start metrics exporter, if any. Exporter failing to start, e.g. on
+        a port already in use, is logged so jobs keep running without it.
+        """
+        if self.enabled and self._exporter is not None:
+            try:
+                self._exporter.start()
+            except OSError as msg:
+                logger.error('Metrics exporter %s not started: %s', self._exporter, msg)
+
+    def stop(self):
+        """
+        Stop metrics exporter, if any.
+        """
+        if self._exporter is not None:
+            self._exporter.stop()
+
+
+class PrometheusExporter(object):
+    """
+    Enable scraping metrics in Prometheus text format over http.
+    """
+
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        """
+        Initialize Prometheus exporter.
+
+        :param obj registry: metrics registry to expose.
+        :param str host: listening host.
+        :param int port: listening port.
+        """
+        self._registry = registry
+        self._host = host
+        self._port = port
+        self._server = None
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'host': self._host,
+            'port': self._port,
+        }
+        return str(params)
+
+    def start(self):
+        """
+        Serve metrics from a background thread.
+        """
+        if self._server is not None:
+            return
+        registry = self._registry
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                """
+                Answer scrape with rendered metrics.
+                """
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                """
+                Silence per scrape logging.
+                """
+                pass
+
+        self._server = ThreadingHTTPServer((self._host, self._port), MetricsHandler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        logger.info('Prometheus metrics served at http://%s:%s/metrics',
+                    *self._server.server_address)
+
+    def stop(self):
+        """
+        Stop serving metrics.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class StatsDExporter(object):
+    """
+    Enable pushing metrics to a StatsD daemon over udp, with labels sent as
+    DogStatsD tags.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='blockchain'):
+        """
+        Initialize StatsD exporter.
+
+        :param str host: StatsD host.
+        :param int port: StatsD port.
+        :param str prefix: metric names prefix.
+        """
+        self._address = (host, port)
+        self._prefix = prefix
+        self._socket = None
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'host': self._address[0],
+            'port': self._address[1],
+        }
+        return str(params)
+
+    def start(self):
+        """
+        Open udp socket.
+        """
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.setblocking(False)
+
+    def send(self, name, value, kind, key):
+        """
+        Send metric, dropping it if StatsD is unreachable.
+
+        :param str name: metric name.
+        :param float value: metric value.
+        :param str kind: StatsD metric type (c, ms).
+        :param tuple key: sorted label items.
+        """
+        if self._socket is None:
+            return
+        line = '{}.{}:{}|{}'.format(self._prefix, name, value, kind)
+        if key:
+            line += '|#' + ','.join('{}:{}'.format(label, value) for label, value in key)
+        try:
+            self._socket.sendto(line.encode('utf-8'), self._address)
+        except OSError:
+            pass
+
+    def stop(self):
+        """
+        Close udp socket.
+        """
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def timed(function):
+    """
+    Instrument pipeline persist method with latency, documents and errors
+    labeled by pipeline and operation. Pipelines return None when a
+    persist failed. Persist calls nested in an instrumented one, as batch
+    persists made of single persists, are recorded once by the outer call.
+
+    :param callable function: pipeline persist method taking data.
+    :return callable: instrumented method.
+    """
+    @functools.wraps(function)
+    def wrapper(self, data, *args, **kwargs):
+        metrics = MetricsRegistry.shared()
+        if not metrics.enabled or getattr(_local, 'active', False):
+            return function(self, data, *args, **kwargs)
+
+        labels = {'pipeline': self.__class__.__name__, 'operation': function.__name__}
+        documents = len(data) if isinstance(data, list) else 1
+        result = None
+        _local.active = True
+        try:
+            with metrics.timer('persist_seconds', **labels):
+                result = function(self, data, *args, **kwargs)
+            return result
+        finally:
+            _local.active = False
+            if result is None:
+                metrics.inc('persist_errors_total', documents, **labels)
+            else:
+                metrics.inc('persisted_documents_total', documents, **labels)
+    return wrapper
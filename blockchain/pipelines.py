@@ -1,17 +1,32 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+import io
 import json
 import logging
+import mmap
 import os
+import psycopg2
 import pymongo
+import threading
+import time
 
+from bisect import bisect_left
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from functools import partial
 from json import JSONDecoder
 from logging.config import fileConfig
-from os.path import dirname, join
-from pymongo.errors import ConnectionFailure
+from os.path import basename, dirname, join
+from psycopg2 import sql
+from psycopg2.extras import Json
+from psycopg2.pool import ThreadedConnectionPool
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+
+from .digest import DIGEST_FIELD, diff_values, digest
+from .exceptions import JSONFileWriterPipelineError, PostgreSQLPipelineError
+from .metrics import MetricsRegistry, timed
 
 # Custom logger
 fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
@@ -25,15 +40,35 @@ load_dotenv(dotenv_path)
 class JSONFileWriterPipeline(object):
     """
     Enable persist data in JSON file.
+
+    Two formats are available: json appends pretty printed objects while
+    ndjson appends one compact object per line, which can be read back as a
+    stream of records. Every write is recorded in a sidecar index of slug,
+    timestamp, byte offset and length so single records can be read without
+    scanning the file.
     """
 
-    def __init__(self, filepath):
+    FORMATS = ('json', 'ndjson')
+
+    def __init__(self, filepath, fmt='json', buffer_size=65536, fsync=False):
         """
         Initialize JSON file writer class config.
 
         :param str filepath: json file path.
+        :param str fmt: file format (json, ndjson).
+        :param int buffer_size: write buffer size in bytes.
+        :param bool fsync: flag to signal flushing writes to disk.
         """
-        self._file = path
+        if fmt not in self.FORMATS:
+            msg = 'Unknown JSON file format: {}'.format(fmt)
+            raise JSONFileWriterPipelineError(msg)
+        self._file = filepath
+        self._index_file = '{}.idx'.format(filepath)
+        self._format = fmt
+        self._buffer_size = buffer_size
+        self._fsync = fsync
+        self._index = {}
+        self._index_position = 0
 
     def __str__(self):
         """
@@ -45,6 +80,7 @@ class JSONFileWriterPipeline(object):
             'class': self.__class__.__name__,
             'path': dirname(self._file),
             'filename': basename(self._file),
+            'format': self._format,
         }
         return str(params)
 
@@ -57,7 +93,9 @@ class JSONFileWriterPipeline(object):
         """
         filepath = os.getenv('JSON_FILE_PATH')
         if filepath is not None:
-            return cls(filepath)
+            fmt = os.getenv('JSON_FILE_FORMAT', 'json')
+            fsync = os.getenv('JSON_FILE_FSYNC', 'false').lower() == 'true'
+            return cls(filepath, fmt, fsync=fsync)
         else:
             msg = 'Incorrect JSON file configuration: {}'.format(filepath)
             raise ValueError(msg)
@@ -65,19 +103,155 @@ class JSONFileWriterPipeline(object):
     def write(self, data):
         """
         Open file connection and write data.
+
+        :param json data: json data to write.
+        """
+        self.write_many([data])
+
+    @timed
+    def write_many(self, documents):
+        """
+        Open file connection and write batch of data through a single
+        buffered append, then record written objects in the index.
+
+        :param list documents: json data documents to write.
+        :return int: number of written documents.
+        """
+        timestamp = int(time.time())
+        entries = []
+        with open(self._file, 'ab', buffering=self._buffer_size) as json_file:
+            offset = json_file.tell()
+            for data in documents:
+                if self._format == 'ndjson':
+                    record = json.dumps(data, separators=(',', ':')).encode('utf-8')
+                    delimeter = b'\n'
+                else:
+                    record = json.dumps(data, indent=2).encode('utf-8')
+                    delimeter = b'\n\n'
+                json_file.write(record)
+                json_file.write(delimeter)
+                entries.append((data.get('_slug', ''), timestamp, offset, len(record)))
+                offset += len(record) + len(delimeter)
+            if self._fsync:
+                json_file.flush()
+                os.fsync(json_file.fileno())
+
+        with open(self._index_file, 'a') as index_file:
+            for entry in entries:
+                index_file.write('{}\t{}\t{}\t{}\n'.format(*entry))
+            if self._fsync:
+                index_file.flush()
+                os.fsync(index_file.fileno())
+        return len(entries)
+
+    def _load_index(self):
+        """
+        Load index entries appended since last load.
+        """
+        if not os.path.exists(self._index_file):
+            return
+
+        with open(self._index_file, 'r') as index_file:
+            index_file.seek(self._index_position)
+            for line in index_file:
+                if not line.endswith('\n'):
+                    break
+                slug, timestamp, offset, length = line.rstrip('\n').split('\t')
+                timestamps, entries = self._index.setdefault(slug, ([], []))
+                timestamps.append(int(timestamp))
+                entries.append((int(offset), int(length)))
+                self._index_position += len(line.encode('utf-8'))
+
+    def rebuild_index(self):
+        """
+        Rebuild index scanning an ndjson file, timestamped with file
+        modification time.
+        """
+        if self._format != 'ndjson':
+            msg = 'Index can only be rebuilt for ndjson files: {}'.format(self._file)
+            raise JSONFileWriterPipelineError(msg)
+
+        timestamp = int(os.path.getmtime(self._file))
+        with open(self._file, 'rb') as json_file, open(self._index_file, 'w') as index_file:
+            offset = 0
+            for line in json_file:
+                record = line.rstrip(b'\n')
+                if record:
+                    slug = json.loads(record.decode('utf-8')).get('_slug', '')
+                    entry = (slug, timestamp, offset, len(record))
+                    index_file.write('{}\t{}\t{}\t{}\n'.format(*entry))
+                offset += len(line)
+        self._index = {}
+        self._index_position = 0
+
+    def _lookup(self, slug=None, since=None):
         """
-        with open(self._file, 'a') as json_file:
-            json.dump(data, json_file, indent=2)
-            json.dump('\n\n')
+        Get byte offsets and lengths of indexed objects.
 
-    def read(self):
+        :param str slug: object slug, None for every slug.
+        :param int since: unix timestamp objects were written from.
+        :return list: sorted byte offset and length tuples.
         """
-        Open file connection and read data.
+        self._load_index()
+        slugs = [slug] if slug is not None else list(self._index.keys())
+        found = []
+        for name in slugs:
+            timestamps, entries = self._index.get(name, ([], []))
+            start = bisect_left(timestamps, since) if since is not None else 0
+            found.extend(entries[start:])
+        return sorted(found)
 
+    def read(self, slug=None, since=None):
+        """
+        Open file connection and read data. Filtering by slug or timestamp
+        jumps straight to indexed objects through a memory map.
+
+        :param str slug: object slug to read.
+        :param int since: unix timestamp objects were written from.
         :return list: list with json objects.
         """
+        if slug is None and since is None:
+            return list(self.iter_records())
+
+        entries = self._lookup(slug, since)
+        if not entries:
+            return []
+
+        with open(self._file, 'rb') as json_file:
+            with mmap.mmap(json_file.fileno(), 0, access=mmap.ACCESS_READ) as json_map:
+                return [json.loads(json_map[offset:offset + length].decode('utf-8'))
+                        for offset, length in entries]
+
+    def latest(self, slug):
+        """
+        Read last written object for slug.
+
+        :param str slug: object slug to read.
+        :return json: last json object or None if not found.
+        """
+        self._load_index()
+        timestamps, entries = self._index.get(slug, ([], []))
+        if not entries:
+            return None
+
+        offset, length = entries[-1]
+        with open(self._file, 'rb') as json_file:
+            with mmap.mmap(json_file.fileno(), 0, access=mmap.ACCESS_READ) as json_map:
+                return json.loads(json_map[offset:offset + length].decode('utf-8'))
+
+    def iter_records(self):
+        """
+        Open file connection and yield json objects one at a time.
+
+        :return generator: json objects.
+        """
         with open(self._file, 'r') as json_file:
-            return list(self._parse(json_file))
+            if self._format == 'ndjson':
+                for line in json_file:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from self._parse(json_file)
 
     def _parse(self, file, decoder=JSONDecoder(), delimeter='\n', buffer_size=2048):
         """
@@ -106,18 +280,26 @@ class MongoDBPipeline(object):
     Enable persist data in MongoDB.
     """
 
-    def __init__(self, mongo_url, mongo_db, mongo_collection):
+    def __init__(self, mongo_url, mongo_db, mongo_collection, max_pool_size=100,
+                 min_pool_size=0, server_selection_timeout_ms=30000):
         """
         Initialize MongoDB class config.
 
         :param str mongo_uri: MongoDB identifier.
         :param str mongo_db: MongoDB name.
         :param str mongo_collection: MongoDB collection name.
+        :param int max_pool_size: max number of pooled connections.
+        :param int min_pool_size: min number of pooled connections.
+        :param int server_selection_timeout_ms: server selection timeout.
         """
         self._mongo_url = mongo_url
         self._mongo_db = mongo_db
         self._mongo_collection = mongo_collection
         self._mongo_uri = self._mongo_url + self._mongo_db
+        self._max_pool_size = max_pool_size
+        self._min_pool_size = min_pool_size
+        self._server_selection_timeout_ms = server_selection_timeout_ms
+        self.client = None
 
     def __str__(self):
         """
@@ -146,7 +328,12 @@ class MongoDBPipeline(object):
             'mongo_collection': os.getenv('MONGO_COLLECTION'),
         }
         if None not in mongo_config.values():
-            return cls(**mongo_config)
+            pool_config = {
+                'max_pool_size': int(os.getenv('MONGO_MAX_POOL_SIZE', 100)),
+                'min_pool_size': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+                'server_selection_timeout_ms': int(os.getenv('MONGO_TIMEOUT_MS', 30000)),
+            }
+            return cls(**mongo_config, **pool_config)
         else:
             msg = 'Incorrect MongoDB configuration: {}'.format(mongo_config)
             raise ValueError(msg)
@@ -155,17 +342,51 @@ class MongoDBPipeline(object):
         """
         Establish MongoDB client connection.
         """
-        self.client = pymongo.MongoClient(self._mongo_uri)
+        self.client = pymongo.MongoClient(
+            self._mongo_uri,
+            maxPoolSize=self._max_pool_size,
+            minPoolSize=self._min_pool_size,
+            serverSelectionTimeoutMS=self._server_selection_timeout_ms,
+        )
         if self.client is None:
             raise ConnectionFailure('No client connection: {}').format(self._mongo_uri)
         self.db = self.client[self._mongo_db]
         self.collection = self.db[self._mongo_collection]
+        self.ensure_indexes()
+
+    def ensure_indexes(self):
+        """
+        Create unique index on slug used as upsert key and index on chart
+        used by incremental lookups.
+        """
+        try:
+            self.collection.create_index([('_slug', pymongo.ASCENDING)], unique=True)
+            self.collection.create_index([('_chart', pymongo.ASCENDING)])
+        except PyMongoError as msg:
+            logger.error('Failed to create _slug index in MongoDB: %s', msg)
 
     def close_connection(self):
         """
         Close MongoDB client connection.
         """
-        self.client.close()
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    def ping(self):
+        """
+        Check MongoDB server is reachable through client connection.
+
+        :return bool: connection health.
+        """
+        if self.client is None:
+            return False
+        try:
+            self.client.admin.command('ping')
+            return True
+        except PyMongoError as msg:
+            logger.error('MongoDB health check failure: %s', msg)
+            return False
 
     def _insert(self, data):
         """
@@ -175,7 +396,7 @@ class MongoDBPipeline(object):
         :return json: inserted data in MongoDB.
         """
         self.collection.insert_one(data)
-        logger.info('Data inserted to MongoDB: %s', data)
+        logger.info('Data inserted to MongoDB: %s', data.get('_slug'))
         return data
 
     def _update(self, data):
@@ -188,10 +409,10 @@ class MongoDBPipeline(object):
         criteria = data.get('_slug', None)
         if criteria is not None:
             self.collection.update_one({'_slug': criteria}, {'$set': data})
-            logger.info('Data updated to MongoDB: %s', data)
-            return data.update({'_slug': criteria})
+            logger.info('Data updated to MongoDB: %s', criteria)
+            return data
 
-        logger.error('Failed to update data to MongoDB: %s', data)
+        logger.error('Failed to update data to MongoDB: %s', data.get('_name'))
         return False
 
     def _delete(self, data):
@@ -204,15 +425,67 @@ class MongoDBPipeline(object):
         criteria = data.get('_slug')
         if criteria is not None:
             self.collection.delete_one({'_slug': criteria})
-            logger.info('Data deleted from MongoDB: %s', data)
+            logger.info('Data deleted from MongoDB: %s', criteria)
             return data
 
-        logger.info('Failed to delete data from MongoDB: %s', data)
+        logger.info('Failed to delete data from MongoDB: %s', data.get('_name'))
         return False
 
+    def _update_values(self, data):
+        """
+        Update chart in MongoDB writing only new or changed values.
+
+        :param json data: json chart data to update.
+        :return json: updated data in MongoDB.
+        """
+        criteria = data.get('_slug')
+        data_found = self.collection.find_one({'_slug': criteria}, {'values': 1, '_id': 0})
+        stored = data_found.get('values') if data_found else None
+        self.collection.update_one({'_slug': criteria}, self._diff_update(data, stored))
+        return data
+
+    @staticmethod
+    def _diff_update(data, stored):
+        """
+        Get update setting chart fields and only new or changed values by
+        position. Whole chart is set when values do not line up.
+
+        :param json data: json chart data to update.
+        :param list stored: stored chart values.
+        :return dict: MongoDB update document.
+        """
+        diff = diff_values(stored, data.get('values')) if stored else None
+        if diff is None:
+            logger.info('Data updated to MongoDB: %s', data.get('_slug'))
+            return {'$set': data}
+
+        changed, appended = diff
+        fields = {key: value for key, value in data.items() if key != 'values'}
+        fields.update({'values.{}.y'.format(position): y for position, y in changed.items()})
+        fields.update({'values.{}'.format(len(stored) + offset): value
+                       for offset, value in enumerate(appended)})
+        logger.info('Data diffed to MongoDB: %s, %s changed and %s new values',
+                    data.get('_slug'), len(changed), len(appended))
+        return {'$set': fields}
+
+    def _skip(self, operation, count):
+        """
+        Record writes skipped for unchanged data.
+
+        :param str operation: persist method name.
+        :param int count: number of skipped documents.
+        """
+        metrics = MetricsRegistry.shared()
+        if count and metrics.enabled:
+            metrics.inc('persist_skipped_total', count, pipeline=self.__class__.__name__,
+                        operation=operation)
+
+    @timed
     def persist_data(self, data):
         """
-        Persist data in MongoDB.
+        Persist data in MongoDB. Write is skipped when data content digest
+        matches the stored one, and only new or changed values are written
+        for stored charts.
 
         :param json data: json data to persist.
         :return json: persisted data in MongoDB.
@@ -221,14 +494,148 @@ class MongoDBPipeline(object):
             if not value:
                 raise ValueError('Missing value for: {}'.format(key))
 
+        data = dict(data, **{DIGEST_FIELD: digest(data)})
         try:
             data_found = self.collection.find_one(
                 {'_slug': data.get('_slug')},
-                {'_slug': 1, '_id': 0}
+                {'_slug': 1, DIGEST_FIELD: 1, '_id': 0}
             )
-            if data_found:
-                return self._update(data)
-            return self._insert(data)
+            if not data_found:
+                return self._insert(data)
+            if data_found.get(DIGEST_FIELD) == data[DIGEST_FIELD]:
+                self._skip('persist_data', 1)
+                logger.info('Data unchanged in MongoDB: %s', data.get('_slug'))
+                return data
+            if 'values' in data:
+                return self._update_values(data)
+            return self._update(data)
+
+        except PyMongoError as msg:
+            logger.error('Database operation failure: %s', msg)
+
+    @timed
+    def persist_many(self, documents):
+        """
+        Persist batch of data in MongoDB with a single unordered bulk write
+        of upserts keyed on slug. Unchanged data is skipped and only new or
+        changed values are written for stored charts.
+
+        :param list documents: json data documents to persist.
+        :return dict: number of matched, modified, upserted and skipped
+        documents.
+        """
+        for data in documents:
+            for key, value in data.items():
+                if not value:
+                    raise ValueError('Missing value for: {}'.format(key))
+        documents = [dict(data, **{DIGEST_FIELD: digest(data)}) for data in documents]
+
+        if not documents:
+            return {'matched': 0, 'modified': 0, 'upserted': 0, 'skipped': 0}
+
+        try:
+            slugs = [data.get('_slug') for data in documents]
+            digests = {
+                found.get('_slug'): found.get(DIGEST_FIELD)
+                for found in self.collection.find(
+                    {'_slug': {'$in': slugs}},
+                    {'_slug': 1, DIGEST_FIELD: 1, '_id': 0}
+                )
+            }
+            changed = [data for data in documents if data.get('_slug') in digests
+                       and digests[data.get('_slug')] != data[DIGEST_FIELD]]
+            charts = [data.get('_slug') for data in changed if 'values' in data]
+            values = {}
+            if charts:
+                values = {
+                    found.get('_slug'): found.get('values')
+                    for found in self.collection.find(
+                        {'_slug': {'$in': charts}},
+                        {'_slug': 1, 'values': 1, '_id': 0}
+                    )
+                }
+
+            operations = []
+            for data in documents:
+                criteria = {'_slug': data.get('_slug')}
+                if data.get('_slug') in values:
+                    update = self._diff_update(data, values[data.get('_slug')])
+                elif digests.get(data.get('_slug')) != data[DIGEST_FIELD]:
+                    update = {'$set': data}
+                else:
+                    continue
+                operations.append(UpdateOne(criteria, update, upsert=True))
+
+            skipped = len(documents) - len(operations)
+            self._skip('persist_many', skipped)
+            if not operations:
+                summary = {'matched': 0, 'modified': 0, 'upserted': 0, 'skipped': skipped}
+                logger.info('Data unchanged in MongoDB: %s', summary)
+                return summary
+
+            result = self.collection.bulk_write(operations, ordered=False)
+            summary = {
+                'matched': result.matched_count,
+                'modified': result.modified_count,
+                'upserted': result.upserted_count,
+                'skipped': skipped,
+            }
+            logger.info('Data bulk persisted to MongoDB: %s', summary)
+            return summary
+
+        except BulkWriteError as msg:
+            logger.error('Bulk write failure: %s', msg.details.get('writeErrors'))
+        except PyMongoError as msg:
+            logger.error('Database operation failure: %s', msg)
+
+    def last_timestamp(self, chart):
+        """
+        Get timestamp of last stored value for chart.
+
+        :param str chart: chart name.
+        :return int: unix timestamp or None if chart not stored.
+        """
+        try:
+            data_found = self.collection.find_one(
+                {'_chart': chart},
+                {'values': {'$slice': -1}, '_id': 0}
+            )
+        except PyMongoError as msg:
+            logger.error('Database operation failure: %s', msg)
+            return None
+
+        if data_found and data_found.get('values'):
+            return data_found['values'][-1].get('x')
+        return None
+
+    @timed
+    def merge_data(self, data, since):
+        """
+        Append chart values newer than timestamp to stored chart values.
+
+        :param json data: json chart data fetched incrementally.
+        :param int since: unix timestamp of last stored chart value.
+        :return json: merged data in MongoDB.
+        """
+        criteria = data.get('_chart', None)
+        if criteria is None:
+            raise ValueError('Missing value for: _chart')
+
+        values = [value for value in data.get('values') or [] if value.get('x') > since]
+        if not values:
+            logger.info('No new values for chart %s since %s', criteria, since)
+            return data
+
+        fields = {key: value for key, value in data.items() if key != 'values'}
+        try:
+            # Merged content digest is unknown, next full persist diffs again
+            self.collection.update_one(
+                {'_chart': criteria},
+                {'$set': fields, '$push': {'values': {'$each': values}},
+                 '$unset': {DIGEST_FIELD: ''}}
+            )
+            logger.info('Data merged to MongoDB: %s new values for %s', len(values), criteria)
+            return data
 
         except PyMongoError as msg:
             logger.error('Database operation failure: %s', msg)
@@ -247,8 +654,588 @@ class MongoDBPipeline(object):
         }
 
 
+class MongoDBTimeSeriesPipeline(MongoDBPipeline):
+    """
+    Enable persist chart values in MongoDB as time bucketed documents.
+
+    Chart metadata is kept in the configured collection while values are
+    spread over bucket documents in a companion points collection, keyed by
+    chart slug and bucket start timestamp. Charts and buckets keep content
+    digests so unchanged ones are not written again.
+    """
+
+    def __init__(self, mongo_url, mongo_db, mongo_collection, bucket_span=2592000,
+                 **kwargs):
+        """
+        Initialize MongoDB time series class config.
+
+        :param str mongo_uri: MongoDB identifier.
+        :param str mongo_db: MongoDB name.
+        :param str mongo_collection: MongoDB collection name.
+        :param int bucket_span: seconds of chart values per bucket document.
+        :param dict kwargs: MongoDB connection pool parameters.
+        """
+        super(MongoDBTimeSeriesPipeline, self).__init__(
+            mongo_url, mongo_db, mongo_collection, **kwargs)
+        self._bucket_span = bucket_span
+        self._points_collection = '{}_points'.format(mongo_collection)
+
+    @classmethod
+    def config(cls):
+        """
+        Get MongoDB time series configuration parameters.
+
+        :return cls: MongoDBTimeSeriesPipeline class.
+        """
+        pipeline = super(MongoDBTimeSeriesPipeline, cls).config()
+        pipeline._bucket_span = int(os.getenv('MONGO_BUCKET_SPAN', pipeline._bucket_span))
+        return pipeline
+
+    def open_connection(self):
+        """
+        Establish MongoDB client connection.
+        """
+        super(MongoDBTimeSeriesPipeline, self).open_connection()
+        self.points = self.db[self._points_collection]
+
+    def ensure_indexes(self):
+        """
+        Create unique indexes on slug and on slug and bucket.
+        """
+        super(MongoDBTimeSeriesPipeline, self).ensure_indexes()
+        try:
+            self.db[self._points_collection].create_index(
+                [('_slug', pymongo.ASCENDING), ('_bucket', pymongo.ASCENDING)],
+                unique=True
+            )
+        except PyMongoError as msg:
+            logger.error('Failed to create bucket index in MongoDB: %s', msg)
+
+    def _bucket(self, timestamp):
+        """
+        Get bucket start timestamp for chart value timestamp.
+
+        :param int timestamp: unix timestamp.
+        :return int: bucket start unix timestamp.
+        """
+        timestamp = int(timestamp)
+        return timestamp - timestamp % self._bucket_span
+
+    def _write_points(self, slug, values, digests=None):
+        """
+        Write chart values into their buckets with one bulk write. Given
+        stored bucket digests, values are the whole chart and unchanged
+        buckets are skipped. Otherwise digests of touched buckets are dropped.
+
+        :param str slug: chart slug.
+        :param list values: chart values as x, y dicts.
+        :param dict digests: stored digest by bucket start timestamp.
+        :return int: number of touched buckets.
+        """
+        buckets = {}
+        for value in values:
+            buckets.setdefault(self._bucket(value['x']), []).append(value)
+
+        operations = []
+        for bucket, points in buckets.items():
+            timestamps = [int(point['x']) for point in points]
+            fields = {'points.{}'.format(int(point['x'])): point['y'] for point in points}
+            update = {'$set': fields,
+                      '$min': {'first': min(timestamps)},
+                      '$max': {'last': max(timestamps)}}
+            if digests is None:
+                update.update({'$unset': {DIGEST_FIELD: ''}})
+            else:
+                fields.update({DIGEST_FIELD: digest({'points': points})})
+                if digests.get(bucket) == fields[DIGEST_FIELD]:
+                    continue
+            operations.append(UpdateOne({'_slug': slug, '_bucket': bucket}, update,
+                                        upsert=True))
+
+        if operations:
+            self.points.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def _write_metadata(self, data, values):
+        """
+        Upsert chart metadata keeping track of last value timestamp. Chart
+        digest is dropped unless data carries the whole chart digest.
+
+        :param json data: json chart data.
+        :param list values: chart values being written.
+        """
+        fields = {key: value for key, value in data.items() if key != 'values'}
+        update = {'$set': fields}
+        if DIGEST_FIELD not in fields:
+            update.update({'$unset': {DIGEST_FIELD: ''}})
+        if values:
+            update.update({'$max': {'_last': max(int(value['x']) for value in values)}})
+        self.collection.update_one({'_slug': data.get('_slug')}, update, upsert=True)
+
+    @timed
+    def persist_data(self, data):
+        """
+        Persist data in MongoDB, chart values into buckets. Write is skipped
+        when chart digest matches the stored one and only buckets with new
+        or changed values are written otherwise.
+
+        :param json data: json data to persist.
+        :return json: persisted data in MongoDB.
+        """
+        if 'values' not in data:
+            return super(MongoDBTimeSeriesPipeline, self).persist_data(data)
+
+        for key, value in data.items():
+            if not value:
+                raise ValueError('Missing value for: {}'.format(key))
+
+        slug = data.get('_slug')
+        data = dict(data, **{DIGEST_FIELD: digest(data)})
+        try:
+            data_found = self.collection.find_one({'_slug': slug}, {DIGEST_FIELD: 1, '_id': 0})
+            if data_found and data_found.get(DIGEST_FIELD) == data[DIGEST_FIELD]:
+                self._skip('persist_data', 1)
+                logger.info('Data unchanged in MongoDB: %s', slug)
+                return data
+
+            digests = {
+                found.get('_bucket'): found.get(DIGEST_FIELD)
+                for found in self.points.find({'_slug': slug},
+                                              {'_bucket': 1, DIGEST_FIELD: 1, '_id': 0})
+            }
+            values = data.get('values')
+            buckets = self._write_points(slug, values, digests)
+            # Chart digest written last, an interrupted write is retried
+            self._write_metadata(data, values)
+            logger.info('Data persisted to MongoDB: %s values in %s changed buckets for %s',
+                        len(values), buckets, slug)
+            return data
+
+        except PyMongoError as msg:
+            logger.error('Database operation failure: %s', msg)
+
+    @timed
+    def persist_many(self, documents):
+        """
+        Persist batch of data in MongoDB, chart values into buckets.
+
+        :param list documents: json data documents to persist.
+        :return dict: number of persisted documents.
+        """
+        persisted = 0
+        for data in documents:
+            if self.persist_data(data) is not None:
+                persisted += 1
+        return {'persisted': persisted}
+
+    def last_timestamp(self, chart):
+        """
+        Get timestamp of last stored value for chart.
+
+        :param str chart: chart name.
+        :return int: unix timestamp or None if chart not stored.
+        """
+        try:
+            data_found = self.collection.find_one({'_chart': chart}, {'_last': 1, '_id': 0})
+        except PyMongoError as msg:
+            logger.error('Database operation failure: %s', msg)
+            return None
+
+        return data_found.get('_last') if data_found else None
+
+    @timed
+    def merge_data(self, data, since):
+        """
+        Write chart values newer than timestamp, touching only their buckets.
+
+        :param json data: json chart data fetched incrementally.
+        :param int since: unix timestamp of last stored chart value.
+        :return json: merged data in MongoDB.
+        """
+        values = [value for value in data.get('values') or [] if value.get('x') > since]
+        if not values:
+            logger.info('No new values for chart %s since %s', data.get('_chart'), since)
+            return data
+
+        try:
+            buckets = self._write_points(data.get('_slug'), values)
+            # Last timestamp written after points, an interrupted merge is retried
+            self._write_metadata(data, values)
+            logger.info('Data merged to MongoDB: %s new values in %s buckets for %s',
+                        len(values), buckets, data.get('_slug'))
+            return data
+
+        except PyMongoError as msg:
+            logger.error('Database operation failure: %s', msg)
+
+    def find_range(self, slug, start=None, end=None):
+        """
+        Get chart values within time range.
+
+        :param str slug: chart slug.
+        :param int start: range start unix timestamp, inclusive.
+        :param int end: range end unix timestamp, inclusive.
+        :return list: chart values as x, y dicts sorted by timestamp.
+        """
+        criteria = {'_slug': slug}
+        if start is not None:
+            criteria.update({'last': {'$gte': int(start)}})
+        if end is not None:
+            criteria.update({'_bucket': {'$lte': int(end)}})
+
+        values = []
+        buckets = self.points.find(criteria, {'points': 1, '_id': 0})
+        buckets = buckets.sort('_bucket', pymongo.ASCENDING)
+        for bucket in buckets:
+            for timestamp, value in bucket.get('points', {}).items():
+                timestamp = int(timestamp)
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    continue
+                values.append({'x': timestamp, 'y': value})
+        values.sort(key=lambda value: value['x'])
+        return values
+
+    def find_chart(self, slug, start=None, end=None):
+        """
+        Get chart metadata with values within time range.
+
+        :param str slug: chart slug.
+        :param int start: range start unix timestamp, inclusive.
+        :param int end: range end unix timestamp, inclusive.
+        :return json: chart data or None if chart not stored.
+        """
+        data = self.collection.find_one({'_slug': slug}, {'_id': 0})
+        if data is not None:
+            data.update({'values': self.find_range(slug, start, end)})
+        return data
+
+
 class PostgreSQLPipeline(object):
     """
     Enable persist data in PostgreSQL database.
+
+    Resources are kept as jsonb documents keyed by slug while chart values
+    go to a narrow (slug, ts, value) points table bulk loaded with COPY.
+    Every operation runs in its own transaction on a connection checked out
+    from a thread safe pool, so concurrent jobs never share a transaction.
     """
-    pass
+
+    def __init__(self, postgres_url, postgres_table, max_pool_size=10, min_pool_size=1):
+        """
+        Initialize PostgreSQL class config.
+
+        :param str postgres_url: PostgreSQL connection string.
+        :param str postgres_table: PostgreSQL resources table name.
+        :param int max_pool_size: max number of pooled connections.
+        :param int min_pool_size: min number of pooled connections.
+        """
+        self._postgres_url = postgres_url
+        self._postgres_table = postgres_table
+        self._points_table = '{}_points'.format(postgres_table)
+        self._max_pool_size = max_pool_size
+        self._min_pool_size = min_pool_size
+        self._pool = None
+        self._slots = None
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'table': self._postgres_table,
+            'points_table': self._points_table,
+        }
+        return str(params)
+
+    @classmethod
+    def config(cls):
+        """
+        Get PostgreSQL configuration parameters.
+
+        :return cls: PostgreSQLPipeline class.
+        """
+        postgres_config = {
+            'postgres_url': os.getenv('POSTGRES_URL'),
+            'postgres_table': os.getenv('POSTGRES_TABLE'),
+        }
+        if None not in postgres_config.values():
+            pool_config = {
+                'max_pool_size': int(os.getenv('POSTGRES_MAX_POOL_SIZE', 10)),
+                'min_pool_size': int(os.getenv('POSTGRES_MIN_POOL_SIZE', 1)),
+            }
+            return cls(**postgres_config, **pool_config)
+        else:
+            msg = 'Incorrect PostgreSQL configuration: {}'.format(postgres_config)
+            raise ValueError(msg)
+
+    def _sql(self, query):
+        """
+        Compose query with pipeline table identifiers.
+
+        :param str query: query with {table}, {points} and {chart_index}
+        placeholders.
+        :return obj: composed sql query.
+        """
+        chart_index = '{}_chart_key'.format(self._postgres_table)
+        return sql.SQL(query).format(table=sql.Identifier(self._postgres_table),
+                                     points=sql.Identifier(self._points_table),
+                                     chart_index=sql.Identifier(chart_index))
+
+    def open_connection(self):
+        """
+        Establish PostgreSQL connection pool and create tables.
+        """
+        try:
+            self._pool = ThreadedConnectionPool(self._min_pool_size, self._max_pool_size,
+                                                self._postgres_url)
+        except psycopg2.Error as msg:
+            raise PostgreSQLPipelineError('No connection: {}'.format(msg))
+        # Pool raises once exhausted, callers wait for a free connection instead
+        self._slots = threading.BoundedSemaphore(self._max_pool_size)
+        self.ensure_tables()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Check out pooled connection for a single transaction, committed on
+        success and rolled back on error.
+
+        :return obj: context manager yielding PostgreSQL cursor.
+        """
+        pool, slots = self._pool, self._slots
+        if pool is None:
+            raise PostgreSQLPipelineError('No connection: pipeline not open')
+
+        with slots:
+            connection = pool.getconn()
+            try:
+                with connection, connection.cursor() as cursor:
+                    yield cursor
+            finally:
+                pool.putconn(connection, close=bool(connection.closed))
+
+    def ensure_tables(self):
+        """
+        Create resources and chart points tables, resources indexed on chart.
+        """
+        with self.transaction() as cursor:
+            cursor.execute(self._sql(
+                'CREATE TABLE IF NOT EXISTS {table} ('
+                'slug text PRIMARY KEY, chart text, name text, data jsonb NOT NULL, '
+                'last_ts bigint, updated_at timestamptz NOT NULL DEFAULT now())'
+            ))
+            cursor.execute(self._sql(
+                'CREATE TABLE IF NOT EXISTS {points} ('
+                'slug text NOT NULL, ts bigint NOT NULL, value double precision, '
+                'PRIMARY KEY (slug, ts))'
+            ))
+            # Incremental runs look charts up by name
+            cursor.execute(self._sql(
+                'CREATE UNIQUE INDEX IF NOT EXISTS {chart_index} ON {table} (chart)'
+            ))
+
+    def close_connection(self):
+        """
+        Close every pooled PostgreSQL connection.
+        """
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+
+    def ping(self):
+        """
+        Check PostgreSQL server is reachable through a pooled connection.
+
+        :return bool: connection health.
+        """
+        if self._pool is None or self._pool.closed:
+            return False
+        try:
+            with self.transaction() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error as msg:
+            logger.error('PostgreSQL health check failure: %s', msg)
+            return False
+
+    def _upsert_resource(self, cursor, data, values=None):
+        """
+        Upsert resource document without chart values.
+
+        :param obj cursor: PostgreSQL cursor.
+        :param json data: json data to persist.
+        :param list values: chart values being written.
+        """
+        document = {key: value for key, value in data.items() if key != 'values'}
+        last_ts = max(int(value['x']) for value in values) if values else None
+        cursor.execute(self._sql(
+            'INSERT INTO {table} (slug, chart, name, data, last_ts) '
+            'VALUES (%s, %s, %s, %s, %s) '
+            'ON CONFLICT (slug) DO UPDATE SET chart = EXCLUDED.chart, '
+            'name = EXCLUDED.name, data = EXCLUDED.data, updated_at = now(), '
+            'last_ts = GREATEST({table}.last_ts, EXCLUDED.last_ts)'
+        ), (data.get('_slug'), data.get('_chart'),
+            data.get('name') or data.get('_name'), Json(document), last_ts))
+
+    def _copy_points(self, cursor, slug, values):
+        """
+        Bulk load chart values through COPY into a staging table and upsert
+        them into the points table. Staging table is emptied right away so
+        later charts of the same transaction only upsert their own values.
+
+        :param obj cursor: PostgreSQL cursor.
+        :param str slug: chart slug.
+        :param list values: chart values as x, y dicts.
+        :return int: number of upserted chart values.
+        """
+        buffer = io.StringIO()
+        for value in values:
+            y = value.get('y')
+            y = '\\N' if y is None else repr(float(y))
+            buffer.write('{}\t{}\t{}\n'.format(slug, int(value['x']), y))
+        buffer.seek(0)
+
+        cursor.execute(self._sql(
+            'CREATE TEMP TABLE IF NOT EXISTS points_staging '
+            '(LIKE {points} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+        ))
+        cursor.copy_expert('COPY points_staging (slug, ts, value) FROM STDIN', buffer)
+        cursor.execute(self._sql(
+            'INSERT INTO {points} (slug, ts, value) '
+            'SELECT DISTINCT ON (slug, ts) slug, ts, value FROM points_staging '
+            'ON CONFLICT (slug, ts) DO UPDATE SET value = EXCLUDED.value'
+        ))
+        rows = cursor.rowcount
+        cursor.execute('TRUNCATE points_staging')
+        return rows
+
+    @timed
+    def persist_data(self, data):
+        """
+        Persist data in PostgreSQL.
+
+        :param json data: json data to persist.
+        :return json: persisted data in PostgreSQL.
+        """
+        for key, value in data.items():
+            if not value:
+                raise ValueError('Missing value for: {}'.format(key))
+
+        try:
+            with self.transaction() as cursor:
+                values = data.get('values')
+                self._upsert_resource(cursor, data, values)
+                if values:
+                    rows = self._copy_points(cursor, data.get('_slug'), values)
+                    logger.info('Data persisted to PostgreSQL: %s values for %s',
+                                rows, data.get('_slug'))
+                else:
+                    logger.info('Data persisted to PostgreSQL: %s', data.get('_slug'))
+            return data
+
+        except psycopg2.Error as msg:
+            logger.error('Database operation failure: %s', msg)
+
+    @timed
+    def persist_many(self, documents):
+        """
+        Persist batch of data in PostgreSQL within a single transaction.
+
+        :param list documents: json data documents to persist.
+        :return dict: number of persisted documents and chart values.
+        """
+        for data in documents:
+            for key, value in data.items():
+                if not value:
+                    raise ValueError('Missing value for: {}'.format(key))
+
+        try:
+            rows = 0
+            with self.transaction() as cursor:
+                for data in documents:
+                    values = data.get('values')
+                    self._upsert_resource(cursor, data, values)
+                    if values:
+                        rows += self._copy_points(cursor, data.get('_slug'), values)
+            summary = {'persisted': len(documents), 'values': rows}
+            logger.info('Data bulk persisted to PostgreSQL: %s', summary)
+            return summary
+
+        except psycopg2.Error as msg:
+            logger.error('Database operation failure: %s', msg)
+
+    def last_timestamp(self, chart):
+        """
+        Get timestamp of last stored value for chart.
+
+        :param str chart: chart name.
+        :return int: unix timestamp or None if chart not stored.
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(self._sql('SELECT last_ts FROM {table} WHERE chart = %s'), (chart,))
+                row = cursor.fetchone()
+        except psycopg2.Error as msg:
+            logger.error('Database operation failure: %s', msg)
+            return None
+
+        return row[0] if row else None
+
+    @timed
+    def merge_data(self, data, since):
+        """
+        Write chart values newer than timestamp.
+
+        :param json data: json chart data fetched incrementally.
+        :param int since: unix timestamp of last stored chart value.
+        :return json: merged data in PostgreSQL.
+        """
+        values = [value for value in data.get('values') or [] if value.get('x') > since]
+        if not values:
+            logger.info('No new values for chart %s since %s', data.get('_chart'), since)
+            return data
+
+        try:
+            with self.transaction() as cursor:
+                self._upsert_resource(cursor, data, values)
+                rows = self._copy_points(cursor, data.get('_slug'), values)
+            logger.info('Data merged to PostgreSQL: %s new values for %s', rows, data.get('_slug'))
+            return data
+
+        except psycopg2.Error as msg:
+            logger.error('Database operation failure: %s', msg)
+
+    def find_range(self, slug, start=None, end=None):
+        """
+        Get chart values within time range.
+
+        :param str slug: chart slug.
+        :param int start: range start unix timestamp, inclusive.
+        :param int end: range end unix timestamp, inclusive.
+        :return list: chart values as x, y dicts sorted by timestamp.
+        """
+        with self.transaction() as cursor:
+            cursor.execute(self._sql(
+                'SELECT ts, value FROM {points} WHERE slug = %s '
+                'AND (%s IS NULL OR ts >= %s) AND (%s IS NULL OR ts <= %s) ORDER BY ts'
+            ), (slug, start, start, end, end))
+            return [{'x': ts, 'y': value} for ts, value in cursor.fetchall()]
+
+    @property
+    def configuration(self):
+        """
+        Show database configuration parameters.
+
+        :return dict: PostgreSQL configuration.
+        """
+        return {
+            'table': self._postgres_table,
+            'points_table': self._points_table,
+            'max_pool_size': self._max_pool_size,
+            'min_pool_size': self._min_pool_size,
+        }
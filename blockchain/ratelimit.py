@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import asyncio
+import configparser
+import logging
+import threading
+import time
+
+from logging.config import fileConfig
+from os.path import dirname, join
+
+from .exceptions import BlockchainAPIRateLimitError
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    """
+    Enable thread and asyncio safe token bucket rate limiting.
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        Initialize token bucket full of tokens.
+
+        :param float rate: tokens added per second.
+        :param int capacity: max number of tokens stored for bursts.
+        """
+        if rate <= 0 or capacity < 1:
+            msg = 'Incorrect token bucket rate {} or capacity {}'.format(rate, capacity)
+            raise BlockchainAPIRateLimitError(msg)
+        self._rate = float(rate)
+        self._capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'rate': self._rate,
+            'capacity': self._capacity,
+        }
+        return str(params)
+
+    def _reserve(self, tokens=1):
+        """
+        Take tokens from bucket, going into debt when empty.
+
+        Callers wait until their debt is paid back, so concurrent threads and
+        tasks are served in arrival order at the configured rate.
+
+        :param int tokens: number of tokens to take.
+        :return float: seconds to wait before proceeding.
+        """
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def acquire(self, tokens=1):
+        """
+        Block current thread until tokens are available.
+
+        :param int tokens: number of tokens to take.
+        :return float: seconds waited.
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """
+        Suspend current task until tokens are available.
+
+        :param int tokens: number of tokens to take.
+        :return float: seconds waited.
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class RateLimiter(object):
+    """
+    Enable Blockchain API rate limiting per API key and resource.
+    """
+
+    _shared = None
+    _lock = threading.Lock()
+
+    def __init__(self, rates, keyed_rates=None, burst=1, enabled=True):
+        """
+        Initialize rate limiter. Requests without API key are limited with
+        rates and requests with API key with keyed rates.
+
+        :param dict rates: requests per second for every resource.
+        :param dict keyed_rates: requests per second with API key.
+        :param int burst: max number of requests sent back to back.
+        :param bool enabled: flag to signal rate limiting.
+        """
+        self._rates = rates
+        self._keyed_rates = keyed_rates or rates
+        self._burst = burst
+        self._enabled = enabled
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'rates': self._rates,
+            'keyed_rates': self._keyed_rates,
+            'burst': self._burst,
+            'enabled': self._enabled,
+        }
+        return str(params)
+
+    @classmethod
+    def config(cls, filename='blockchain.cfg', section='ratelimit'):
+        """
+        Get RateLimiter class instance.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: RateLimiter class instance.
+        """
+        parser = configparser.ConfigParser()
+        parser.read(filename)
+        if parser.has_section(section):
+            try:
+                resources = ('charts', 'stats', 'pools')
+                rates = {resource: parser.getfloat(section, resource)
+                         for resource in resources}
+                keyed_rates = {resource: parser.getfloat(section, 'keyed_' + resource)
+                               for resource in resources}
+                burst = parser.getint(section, 'burst')
+                enabled = parser.getboolean(section, 'enabled')
+                return cls(rates, keyed_rates, burst, enabled)
+            except (configparser.Error, ValueError) as msg:
+                msg = 'Incorrect rate limit configuration in {}: {}'.format(filename, msg)
+                raise BlockchainAPIRateLimitError(msg)
+        else:
+            msg = 'Section {} not found in {} file'.format(section, filename)
+            raise BlockchainAPIRateLimitError(msg)
+
+    @classmethod
+    def shared(cls, filename='blockchain.cfg', section='ratelimit'):
+        """
+        Get process wide RateLimiter instance, creating it once.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: shared RateLimiter class instance.
+        """
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None:
+                    cls._shared = cls.config(filename, section)
+                    logger.info('Shared rate limiter created: %s', cls._shared)
+        return cls._shared
+
+    def bucket(self, api_key, resource):
+        """
+        Get token bucket for API key and resource, creating it once.
+
+        :param str api_key: Blockchain API key or None.
+        :param str resource: type of data (charts, stats, pools).
+        :return obj: TokenBucket instance.
+        """
+        key = (api_key, resource)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._buckets_lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    rates = self._keyed_rates if api_key is not None else self._rates
+                    if resource not in rates:
+                        msg = 'No rate configured for resource {}'.format(resource)
+                        raise BlockchainAPIRateLimitError(msg)
+                    bucket = TokenBucket(rates[resource], self._burst)
+                    self._buckets[key] = bucket
+        return bucket
+
+    def acquire(self, api_key, resource):
+        """
+        Block current thread until request is allowed.
+
+        :param str api_key: Blockchain API key or None.
+        :param str resource: type of data (charts, stats, pools).
+        :return float: seconds waited.
+        """
+        if not self._enabled:
+            return 0.0
+        return self.bucket(api_key, resource).acquire()
+
+    async def acquire_async(self, api_key, resource):
+        """
+        Suspend current task until request is allowed.
+
+        :param str api_key: Blockchain API key or None.
+        :param str resource: type of data (charts, stats, pools).
+        :return float: seconds waited.
+        """
+        if not self._enabled:
+            return 0.0
+        return await self.bucket(api_key, resource).acquire_async()
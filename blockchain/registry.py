@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import logging
+import threading
+
+from contextlib import contextmanager
+from logging.config import fileConfig
+from os.path import dirname, join
+
+from .exceptions import PipelineRegistryError
+from .pipelines import (MongoDBPipeline, MongoDBTimeSeriesPipeline,
+                        PostgreSQLPipeline)
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+
+class PipelineRegistry(object):
+    """
+    Enable long lived pipeline connections shared across scheduler jobs.
+
+    Jobs lease pipelines while using them. Unhealthy pipelines are dropped
+    so next leases reconnect, but are only closed once no job holds them.
+    """
+
+    PIPELINES = {
+        'mongodb': MongoDBPipeline,
+        'mongodb_timeseries': MongoDBTimeSeriesPipeline,
+        'postgresql': PostgreSQLPipeline,
+    }
+
+    def __init__(self):
+        """
+        Initialize empty pipeline registry.
+        """
+        self._pipelines = {}
+        self._leases = {}
+        self._retired = {}
+        self._lock = threading.RLock()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'pipelines': list(self._pipelines.keys()),
+        }
+        return str(params)
+
+    def get(self, name='mongodb'):
+        """
+        Get open pipeline, configuring and connecting it on first use.
+
+        :param str name: pipeline name.
+        :return obj: pipeline instance with open connection.
+        """
+        pipeline = self._pipelines.get(name)
+        if pipeline is None:
+            with self._lock:
+                pipeline = self._pipelines.get(name)
+                if pipeline is None:
+                    pipeline_class = self.PIPELINES.get(name)
+                    if pipeline_class is None:
+                        msg = 'Unknown pipeline: {}'.format(name)
+                        raise PipelineRegistryError(msg)
+                    pipeline = pipeline_class.config()
+                    pipeline.open_connection()
+                    self._pipelines[name] = pipeline
+                    logger.info('Pipeline connection opened: %s', pipeline)
+        return pipeline
+
+    @contextmanager
+    def lease(self, name='mongodb'):
+        """
+        Hold open pipeline while in use so health checks never close it
+        under a running job.
+
+        :param str name: pipeline name.
+        :return obj: context manager yielding pipeline instance.
+        """
+        with self._lock:
+            pipeline = self.get(name)
+            self._leases[id(pipeline)] = self._leases.get(id(pipeline), 0) + 1
+        try:
+            yield pipeline
+        finally:
+            with self._lock:
+                self._leases[id(pipeline)] -= 1
+                if self._leases[id(pipeline)]:
+                    pipeline = None
+                else:
+                    del self._leases[id(pipeline)]
+                    pipeline = self._retired.pop(id(pipeline), None)
+            if pipeline is not None:
+                self._close(name, pipeline)
+
+    def health_check(self):
+        """
+        Check every open pipeline, dropping unhealthy ones so they are
+        reconnected on next use. Leased ones are closed once released.
+
+        :return dict: health status for every pipeline.
+        """
+        with self._lock:
+            pipelines = list(self._pipelines.items())
+
+        status = {}
+        for name, pipeline in pipelines:
+            status[name] = pipeline.ping()
+            if not status[name]:
+                logger.error('Pipeline %s unhealthy, dropping connection.', name)
+                self._retire(name, pipeline)
+        return status
+
+    def _retire(self, name, pipeline):
+        """
+        Remove pipeline from registry, closing it unless leased.
+
+        :param str name: pipeline name.
+        :param obj pipeline: pipeline instance.
+        """
+        with self._lock:
+            if self._pipelines.get(name) is pipeline:
+                del self._pipelines[name]
+            if self._leases.get(id(pipeline)):
+                self._retired[id(pipeline)] = pipeline
+                logger.info('Pipeline %s in use, closing it once released.', name)
+                return
+        self._close(name, pipeline)
+
+    def close(self, name):
+        """
+        Close pipeline connection and remove it from registry.
+
+        :param str name: pipeline name.
+        """
+        with self._lock:
+            pipeline = self._pipelines.pop(name, None)
+        if pipeline is not None:
+            self._close(name, pipeline)
+
+    def _close(self, name, pipeline):
+        """
+        Close pipeline connection.
+
+        :param str name: pipeline name.
+        :param obj pipeline: pipeline instance.
+        """
+        try:
+            pipeline.close_connection()
+            logger.info('Pipeline connection closed: %s', pipeline)
+        except Exception as msg:
+            logger.error('Failed to close pipeline %s: %s', name, msg)
+
+    def close_all(self):
+        """
+        Close every pipeline connection.
+        """
+        for name in list(self._pipelines.keys()):
+            self.close(name)
@@ -0,0 +1,475 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import configparser
+import gzip
+import json
+import logging
+import requests
+import threading
+import time
+import urllib3
+
+from logging.config import fileConfig
+from os.path import dirname, join
+from requests.structures import CaseInsensitiveDict
+
+from .coalesce import canonical_url, public_params
+from .decoders import ContentDecoder
+from .exceptions import BlockchainAPIReplayError, BlockchainAPIStreamError
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+# Request headers dropped while recording so full bodies are archived
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+# Response headers not describing the archived decoded body
+SKIPPED_HEADERS = ('Content-Encoding', 'Content-Length', 'Transfer-Encoding',
+                   'Connection', 'Keep-Alive', 'Set-Cookie')
+
+
+class ReplayedResponse(object):
+    """
+    Enable http response served from memory, compatible with the streamed
+    requests response interface used by Blockchain API requests.
+    """
+
+    def __init__(self, url, status_code, headers, body):
+        """
+        Initialize in memory http response.
+
+        :param str url: requested url.
+        :param int status_code: http status code.
+        :param dict headers: http response headers.
+        :param bytes body: response body as sent over the wire.
+        """
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self._body = body
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'url': self.url,
+            'status_code': self.status_code,
+            'size': len(self._body),
+        }
+        return str(params)
+
+    @property
+    def raw(self):
+        """
+        Get raw body stream, the response itself.
+
+        :return obj: ReplayedResponse instance.
+        """
+        return self
+
+    def stream(self, chunk_size=65536, decode_content=False):
+        """
+        Stream body in chunks as sent over the wire.
+
+        :param int chunk_size: body chunk size in bytes.
+        :param bool decode_content: ignored, body is never decoded.
+        :return iterator: body chunks.
+        """
+        for start in range(0, len(self._body), chunk_size):
+            yield self._body[start:start + chunk_size]
+
+    def close(self):
+        """
+        Release response, nothing to release.
+        """
+        pass
+
+
+class ReplayArchive(object):
+    """
+    Enable offline record and replay of Blockchain API responses.
+
+    Recorded responses are appended as json lines to a gzip archive with
+    url, params, status, headers, decoded body and latency. Replayed
+    responses are served from the archive with no network, at full speed
+    or after their recorded latency, cycling through the responses
+    recorded for the same request.
+    """
+
+    MODES = ('off', 'record', 'replay')
+
+    _shared = None
+    _lock = threading.Lock()
+
+    def __init__(self, path='replay.ndjson.gz', mode='off', latency=False):
+        """
+        Initialize replay archive.
+
+        :param str path: gzip json lines archive path.
+        :param str mode: off, record or replay.
+        :param bool latency: replay responses after their recorded latency.
+        """
+        if mode not in self.MODES:
+            msg = 'Unknown replay mode: {}'.format(mode)
+            raise BlockchainAPIReplayError(msg)
+        self._path = path
+        self._mode = mode
+        self._latency = latency
+        self._file = None
+        self._records = None
+        self._served = {}
+        self._archive_lock = threading.Lock()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'path': self._path,
+            'mode': self._mode,
+            'latency': self._latency,
+        }
+        return str(params)
+
+    @classmethod
+    def config(cls, filename='blockchain.cfg', section='replay'):
+        """
+        Get ReplayArchive class instance.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: ReplayArchive class instance.
+        """
+        parser = configparser.ConfigParser()
+        parser.read(filename)
+        if parser.has_section(section):
+            try:
+                return cls(
+                    path=parser.get(section, 'path'),
+                    mode=parser.get(section, 'mode'),
+                    latency=parser.getboolean(section, 'latency'),
+                )
+            except (configparser.Error, ValueError) as msg:
+                msg = 'Incorrect replay configuration in {}: {}'.format(filename, msg)
+                raise BlockchainAPIReplayError(msg)
+        else:
+            msg = 'Section {} not found in {} file'.format(section, filename)
+            raise BlockchainAPIReplayError(msg)
+
+    @classmethod
+    def shared(cls, filename='blockchain.cfg', section='replay'):
+        """
+        Get process wide ReplayArchive instance, creating it once. Record
+        and replay are off when configuration is missing.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: shared ReplayArchive class instance.
+        """
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None:
+                    try:
+                        cls._shared = cls.config(filename, section)
+                    except BlockchainAPIReplayError as msg:
+                        logger.warning('Replay off: %s', msg)
+                        cls._shared = cls()
+                    if cls._shared.enabled:
+                        logger.info('Shared replay archive created: %s', cls._shared)
+        return cls._shared
+
+    @classmethod
+    def close_shared(cls):
+        """
+        Close and discard process wide archive.
+        """
+        with cls._lock:
+            if cls._shared is not None:
+                cls._shared.close()
+                cls._shared = None
+
+    @property
+    def enabled(self):
+        """
+        Check whether responses are recorded or replayed.
+
+        :return bool: record or replay mode.
+        """
+        return self._mode != 'off'
+
+    @property
+    def recording(self):
+        """
+        Check whether responses are recorded.
+
+        :return bool: record mode.
+        """
+        return self._mode == 'record'
+
+    @property
+    def replaying(self):
+        """
+        Check whether responses are replayed without network.
+
+        :return bool: replay mode.
+        """
+        return self._mode == 'replay'
+
+    @property
+    def latency(self):
+        """
+        Check whether responses are replayed after their recorded latency.
+
+        :return bool: recorded latency replayed.
+        """
+        return self._latency
+
+    def wrap(self, session=None):
+        """
+        Wrap http session recording or replaying its requests.
+
+        :param obj session: pooled http session shared between requests.
+        :return obj: ReplaySession instance or given session if off.
+        """
+        if not self.enabled:
+            return session
+        return ReplaySession(self, session)
+
+    @staticmethod
+    def _key(url, params=None):
+        """
+        Get archive key identifying request, secrets excluded.
+
+        :param str url: requested url.
+        :param dict params: request parameters.
+        :return tuple: canonical url and archived parameters.
+        """
+        archived = {}
+        for key, value in public_params(params).items():
+            archived[key] = value.decode('utf-8') if isinstance(value, bytes) else str(value)
+        return canonical_url(url, archived), archived
+
+    def record(self, url, params, status, headers, body, latency):
+        """
+        Append response to archive.
+
+        :param str url: requested url without query.
+        :param dict params: request parameters.
+        :param int status: http status code.
+        :param dict headers: http response headers.
+        :param bytes body: decoded response body.
+        :param float latency: seconds until body was received.
+        """
+        _, archived = self._key(url, params)
+        entry = {
+            'url': url,
+            'params': archived,
+            'status': status,
+            'headers': {key: value for key, value in headers.items()
+                        if key.title() not in SKIPPED_HEADERS},
+            'latency': round(latency, 6),
+        }
+        try:
+            entry.update({'body': body.decode('utf-8')})
+        except UnicodeDecodeError:
+            entry.update({'body': body.hex(), 'binary': True})
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+
+        with self._archive_lock:
+            if self._file is None:
+                self._file = gzip.open(self._path, 'at', encoding='utf-8')
+            self._file.write(line)
+            # Sync flush so records survive an unclean exit
+            self._file.flush()
+
+    def lookup(self, url, params=None):
+        """
+        Get next archived response recorded for request.
+
+        :param str url: requested url without query.
+        :param dict params: request parameters.
+        :return dict: archived response.
+        """
+        key, _ = self._key(url, params)
+        with self._archive_lock:
+            if self._records is None:
+                self._records = self._load()
+            entries = self._records.get(key)
+            if not entries:
+                msg = 'Error: url {} not found in replay archive {}'.format(key, self._path)
+                raise BlockchainAPIReplayError(msg, 404)
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        return entries[served % len(entries)]
+
+    def responses(self):
+        """
+        Get every archived response, grouped by request in recorded order.
+
+        :return list: archived responses.
+        """
+        with self._archive_lock:
+            if self._records is None:
+                self._records = self._load()
+            return [entry for entries in self._records.values() for entry in entries]
+
+    def _load(self):
+        """
+        Read archived responses grouped by request in recorded order.
+
+        :return dict: archived responses by canonical url.
+        """
+        records = {}
+        count = 0
+        try:
+            with gzip.open(self._path, 'rt', encoding='utf-8') as archive:
+                for line in archive:
+                    entry = json.loads(line)
+                    key, _ = self._key(entry['url'], entry['params'])
+                    records.setdefault(key, []).append(entry)
+                    count += 1
+        except EOFError:
+            logger.warning('Replay archive %s truncated after %s responses', self._path, count)
+        except (OSError, ValueError) as error:
+            msg = 'Error: unreadable replay archive {}: {}'.format(self._path, error)
+            raise BlockchainAPIReplayError(msg)
+        logger.info('Replay archive %s loaded: %s responses, %s requests',
+                    self._path, count, len(records))
+        return records
+
+    def close(self):
+        """
+        Close archive being recorded.
+        """
+        with self._archive_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ReplaySession(object):
+    """
+    Enable http session recording responses of the wrapped session, or
+    replaying archived responses without network.
+    """
+
+    def __init__(self, archive, session=None):
+        """
+        Initialize replay session.
+
+        :param obj archive: ReplayArchive instance.
+        :param obj session: pooled http session used while recording.
+        """
+        self._archive = archive
+        self._session = session
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'archive': str(self._archive),
+            'session': str(self._session),
+        }
+        return str(params)
+
+    @property
+    def retry(self):
+        """
+        Get retry policy of wrapped session, replayed responses never break
+        off.
+
+        :return obj: RetryPolicy instance or None.
+        """
+        if self._archive.replaying:
+            return None
+        return getattr(self._session, 'retry', None)
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        """
+        Make http GET request recording or replaying its response.
+
+        :param str url: requested url.
+        :param dict params: request parameters.
+        :param dict headers: http request headers.
+        :param dict kwargs: requests keyword arguments.
+        :return obj: ReplayedResponse instance.
+        """
+        if self._archive.replaying:
+            return self._replay(url, params)
+        return self._record(url, params, headers, **kwargs)
+
+    def _record(self, url, params=None, headers=None, **kwargs):
+        """
+        Make http request through wrapped session and archive its response.
+        Body is read once as sent over the wire and served from memory.
+
+        :param str url: requested url.
+        :param dict params: request parameters.
+        :param dict headers: http request headers.
+        :param dict kwargs: requests keyword arguments.
+        :return obj: ReplayedResponse instance.
+        """
+        headers = {key: value for key, value in (headers or {}).items()
+                   if key not in CONDITIONAL_HEADERS}
+        kwargs.update({'stream': True})
+        started = time.perf_counter()
+        if self._session is not None:
+            http_response = self._session.get(url, params=params, headers=headers, **kwargs)
+        else:
+            http_response = requests.get(url, params=params, headers=headers, **kwargs)
+        try:
+            body = b''.join(http_response.raw.stream(65536, decode_content=False))
+        except (urllib3.exceptions.HTTPError, requests.RequestException, OSError) as error:
+            msg = 'Error: body from url {} broke off: {}'.format(url, error)
+            raise BlockchainAPIStreamError(msg)
+        finally:
+            http_response.close()
+        latency = time.perf_counter() - started
+
+        try:
+            decoder = ContentDecoder(http_response.headers.get('Content-Encoding'))
+            decoded = decoder.decode(body) + decoder.flush()
+        except ValueError as error:
+            logger.warning('Response from %s not recorded: %s', url, error)
+        else:
+            self._archive.record(url, params, http_response.status_code,
+                                 http_response.headers, decoded, latency)
+        return ReplayedResponse(http_response.url, http_response.status_code,
+                                http_response.headers, body)
+
+    def _replay(self, url, params=None):
+        """
+        Serve archived response, after its recorded latency if enabled.
+
+        :param str url: requested url.
+        :param dict params: request parameters.
+        :return obj: ReplayedResponse instance.
+        """
+        entry = self._archive.lookup(url, params)
+        if self._archive.latency:
+            time.sleep(entry['latency'])
+        body = entry['body']
+        body = bytes.fromhex(body) if entry.get('binary') else body.encode('utf-8')
+        request_url = requests.Request('GET', url, params=params).prepare().url
+        return ReplayedResponse(request_url, entry['status'], entry['headers'], body)
+
+    def close(self):
+        """
+        Close wrapped session and archive being recorded.
+        """
+        if self._session is not None:
+            self._session.close()
+        self._archive.close()
@@ -6,4 +6,7 @@ __url__ = 'github.com/sdediego'
 __version__ = '1.0'
 __date__ = 'March 2018'
 
-__all__ = ['BlockchainAPIChart', 'BlockchainAPIStatistics', 'BlockchainAPIPool']
+__all__ = [
+    'BlockchainAPIChart', 'BlockchainAPIStatistics', 'BlockchainAPIPool',
+    'ChartColumns'
+]
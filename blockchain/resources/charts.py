@@ -3,17 +3,267 @@
 
 import json
 
+from array import array
+from bisect import bisect_left, bisect_right
+from math import isnan
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _column(values):
+    """
+    Copy numpy array into a double array column.
+
+    :param obj values: numpy array.
+    :return array: double array column.
+    """
+    column = array('d')
+    column.frombytes(np.ascontiguousarray(values, dtype='d').tobytes())
+    return column
+
+
+class ChartColumns(object):
+    """
+    Keep chart values as parallel timestamp and value columns. Missing
+    values are kept as NaN and given back as None.
+    """
+
+    __slots__ = ('_x', '_y')
+
+    def __init__(self, x=None, y=None):
+        """
+        Initialize chart columns.
+
+        :param iterable x: chart values timestamps, sorted ascending.
+        :param iterable y: chart values.
+        """
+        self._x = x if isinstance(x, array) else array('d', x or [])
+        self._y = y if isinstance(y, array) else array('d', y or [])
+
+    def __len__(self):
+        """
+        Get number of chart values.
+
+        :return int: number of chart values.
+        """
+        return len(self._x)
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        return '<{} - {} values>'.format(self.__class__.__name__, len(self))
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Get ChartColumns class instance from chart values.
+
+        :param list values: chart values as x, y dicts.
+        :return cls: ChartColumns class instance.
+        """
+        columns = cls()
+        for value in values or []:
+            y = value.get('y')
+            columns.append(value['x'], float('nan') if y is None else y)
+        return columns
+
+    def append(self, x, y):
+        """
+        Append chart value.
+
+        :param float x: chart value timestamp.
+        :param float y: chart value.
+        """
+        self._x.append(x)
+        self._y.append(y)
+
+    def extend(self, xs, ys):
+        """
+        Append chart values in bulk.
+
+        :param iterable xs: chart values timestamps.
+        :param iterable ys: chart values.
+        """
+        self._x.extend(xs)
+        self._y.extend(ys)
+        if len(self._x) != len(self._y):
+            raise ValueError('Chart columns length mismatch')
+
+    @property
+    def x(self):
+        """
+        Get zero copy view of timestamps column.
+
+        :return memoryview: timestamps.
+        """
+        return memoryview(self._x)
+
+    @property
+    def y(self):
+        """
+        Get zero copy view of values column.
+
+        :return memoryview: values.
+        """
+        return memoryview(self._y)
+
+    def as_numpy(self):
+        """
+        Get zero copy numpy views of timestamps and values columns.
+
+        :return tuple: timestamps and values numpy arrays.
+        """
+        if np is None:
+            raise ImportError('numpy is required for numpy chart columns')
+        return np.frombuffer(self._x, dtype='d'), np.frombuffer(self._y, dtype='d')
+
+    def to_values(self):
+        """
+        Get chart values as x, y dicts.
+
+        :return list: chart values.
+        """
+        return [{'x': int(x) if x.is_integer() else x, 'y': None if isnan(y) else y}
+                for x, y in zip(self._x, self._y)]
+
+    def _range(self, start=None, end=None):
+        """
+        Get index bounds of time range.
+
+        :param float start: range start timestamp, inclusive.
+        :param float end: range end timestamp, inclusive.
+        :return tuple: start and end indexes.
+        """
+        lower = bisect_left(self._x, start) if start is not None else 0
+        upper = bisect_right(self._x, end) if end is not None else len(self._x)
+        return lower, upper
+
+    def range_stats(self, start=None, end=None):
+        """
+        Get min, max and last value within time range.
+
+        :param float start: range start timestamp, inclusive.
+        :param float end: range end timestamp, inclusive.
+        :return dict: values count, min, max and last.
+        """
+        lower, upper = self._range(start, end)
+        if np is not None:
+            values = np.frombuffer(self._y, dtype='d')[lower:upper]
+            values = values[~np.isnan(values)]
+            count = len(values)
+            low, high = (float(values.min()), float(values.max())) if count else (None, None)
+        else:
+            values = [value for value in self._y[lower:upper] if not isnan(value)]
+            count = len(values)
+            low, high = (min(values), max(values)) if count else (None, None)
+        last = values[-1] if count else None
+        return {'count': count, 'min': low, 'max': high,
+                'last': float(last) if count else None}
+
+    def resample(self, step, how='last'):
+        """
+        Resample chart values into fixed size time buckets. Missing values
+        are left out of means.
+
+        :param float step: bucket size in seconds.
+        :param str how: bucket aggregation (last, mean).
+        :return obj: ChartColumns instance with one value per bucket.
+        """
+        if how not in ('last', 'mean'):
+            raise ValueError('Unknown resample aggregation: {}'.format(how))
+        if not len(self):
+            return ChartColumns()
+
+        if np is not None:
+            x, y = self.as_numpy()
+            buckets = np.floor(x / step) * step
+            keys, starts = np.unique(buckets, return_index=True)
+            if how == 'last':
+                ends = np.append(starts[1:], len(y)) - 1
+                values = y[ends]
+            else:
+                valid = ~np.isnan(y)
+                counts = np.add.reduceat(valid.astype('d'), starts)
+                sums = np.add.reduceat(np.where(valid, y, 0.0), starts)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    values = np.where(counts > 0, sums / counts, np.nan)
+            return ChartColumns(_column(keys), _column(values))
+
+        keys, values, counts = [], [], []
+        for x, y in zip(self._x, self._y):
+            bucket = (x // step) * step
+            if not keys or keys[-1] != bucket:
+                keys.append(bucket)
+                values.append(y if how == 'last' else 0.0)
+                counts.append(0)
+            if how == 'last':
+                values[-1] = y
+            elif not isnan(y):
+                values[-1] += y
+                counts[-1] += 1
+        if how == 'mean':
+            values = [value / count if count else float('nan')
+                      for value, count in zip(values, counts)]
+        return ChartColumns(keys, values)
+
+    def rolling_mean(self, window):
+        """
+        Get rolling average over a window of consecutive values. Windows
+        with missing values average to a missing value.
+
+        :param int window: number of values averaged.
+        :return obj: ChartColumns instance timestamped at window end.
+        """
+        if window < 1:
+            raise ValueError('Rolling window must be positive: {}'.format(window))
+        if len(self) < window:
+            return ChartColumns()
+
+        if np is not None:
+            x, y = self.as_numpy()
+            missing = np.isnan(y)
+            sums = np.cumsum(np.insert(np.where(missing, 0.0, y), 0, 0.0))
+            gaps = np.cumsum(np.insert(missing, 0, False))
+            means = (sums[window:] - sums[:-window]) / window
+            means[gaps[window:] != gaps[:-window]] = np.nan
+            return ChartColumns(_column(x[window - 1:]), _column(means))
+
+        means = []
+        total, gaps = 0.0, 0
+        for index, y in enumerate(self._y):
+            if isnan(y):
+                gaps += 1
+            else:
+                total += y
+            if index >= window:
+                dropped = self._y[index - window]
+                if isnan(dropped):
+                    gaps -= 1
+                else:
+                    total -= dropped
+            if index >= window - 1:
+                means.append(float('nan') if gaps else total / window)
+        return ChartColumns(self._x[window - 1:], array('d', means))
+
 
 class BlockchainAPIChart(object):
     """
     Get chart data behind Blockchain API.
     """
-    def __init__(self, chart, keep=False):
+    def __init__(self, chart, keep=False, columnar=False):
         """
-        Initialize Blockchain API for chart.
+        Initialize Blockchain API for chart. Columnar charts keep values in
+        columns instead of the list of x, y dicts.
 
         :param json chart: json object with chart data.
         :param bool keep: flag to signal data keeping.
+        :param bool columnar: flag to signal columnar values.
         """
         self.chart = chart if keep else None
         self.status = chart.get('status')
@@ -21,7 +271,8 @@ class BlockchainAPIChart(object):
         self.unit = chart.get('unit')
         self.period = chart.get('period')
         self.description = chart.get('description')
-        self.values = chart.get('values')
+        self.columns = ChartColumns.from_values(chart.get('values')) if columnar else None
+        self.values = None if columnar else chart.get('values')
 
     def __str__(self):
         """
@@ -37,14 +288,29 @@ class BlockchainAPIChart(object):
         return '<{classname} - {chart}: {description}>'.format(**chart)
 
     @classmethod
-    def start(cls, chart, keep=False):
+    def start(cls, chart, keep=False, columnar=False):
         """
         Get BlockchainAPIChart class instance.
 
         :param str data: chart data response.
+        :param bool keep: flag to signal data keeping.
+        :param bool columnar: flag to signal columnar values.
+        :return cls: BlockchainAPIChart class instance.
+        """
+        return cls(chart, keep, columnar)
+
+    @classmethod
+    def from_columns(cls, chart, columns):
+        """
+        Get BlockchainAPIChart class instance with already decoded values.
+
+        :param json chart: chart data response without values.
+        :param obj columns: chart values as ChartColumns.
         :return cls: BlockchainAPIChart class instance.
         """
-        return cls(chart, keep)
+        instance = cls(chart, False, True)
+        instance.columns = columns
+        return instance
 
     @property
     def response(self):
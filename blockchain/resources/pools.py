@@ -4,12 +4,27 @@
 import json
 import re
 
+# Characters stripped from pool names
+NAME_PATTERN = re.compile('[^0-9a-zA-Z]+')
+
+
+def normalize(name):
+    """
+    Normalize pool name keeping lower case alphanumeric characters.
+
+    :param str name: pool name.
+    :return str: normalized pool name.
+    """
+    return NAME_PATTERN.sub('', name).lower()
+
 
 class BlockchainAPIPool(object):
     """
     Get pools data behind Blockchain API.
     """
 
+    __slots__ = ('_pools', '_index', '_normalized', '_ranking', '_shares', '_herfindahl')
+
     def __init__(self, pools, *args, **kwargs):
         """
         Initialize Blockchain API for pools.
@@ -17,9 +32,11 @@ class BlockchainAPIPool(object):
         :param json pools: json object with pools data.
         """
         self._pools = pools
-        for key, value in self._pools.items():
-            var_name = re.sub('[^0-9a-zA-Z]+', '', key).lower()
-            setattr(self, '_{}'.format(var_name), {'pool': key, 'hashrate': value})
+        self._index = {key: {'pool': key, 'hashrate': value} for key, value in pools.items()}
+        self._normalized = {normalize(key): record for key, record in self._index.items()}
+        self._ranking = None
+        self._shares = None
+        self._herfindahl = None
 
     def __str__(self):
         """
@@ -29,6 +46,20 @@ class BlockchainAPIPool(object):
         """
         return '<{} - Bitcoin pools>'.format(self.__class__.__name__)
 
+    def __getattr__(self, name):
+        """
+        Get pool record by normalized name attribute, as in '_antpool'.
+
+        :param str name: attribute name.
+        :return dict: pool hash rate contribution.
+        """
+        if name in self.__slots__ or not name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._normalized[name[1:]]
+        except KeyError:
+            raise AttributeError(name)
+
     @classmethod
     def start(cls, pools, *args, **kwargs):
         """
@@ -38,20 +69,64 @@ class BlockchainAPIPool(object):
         :return cls: BlockchainAPIPool class instance.
         """
         return cls(pools, *args, **kwargs)
-        
+
     def get_info(self, pool):
         """
-        Get pool hash rate distribution information.
+        Get pool hash rate distribution information. Pool is looked up by
+        exact name first and by normalized name otherwise.
 
         :param str pool: pool name.
         :return dict: pool hash rate contribution.
         """
-        pool_name = list(filter(lambda name: name == pool, self._pools.keys()))
-        if len(pool_name) > 0:
-            var_name = re.sub('[^0-9a-zA-Z]+', '', pool_name[0]).lower()
-            return vars(self)['_{}'.format(var_name)]
+        record = self._index.get(pool)
+        if record is None:
+            record = self._normalized.get(normalize(pool), {})
+        return record
+
+    def _aggregate(self):
+        """
+        Compute pools ranking, shares and concentration once.
+        """
+        if self._ranking is not None:
+            return
+
+        self._ranking = sorted(self._index.values(), key=lambda record: record['hashrate'],
+                               reverse=True)
+        total = sum(record['hashrate'] for record in self._ranking)
+        self._shares = {record['pool']: 100.0 * record['hashrate'] / total if total else 0.0
+                        for record in self._ranking}
+        self._herfindahl = sum(share ** 2 for share in self._shares.values())
+
+    def top(self, n=5):
+        """
+        Get pools with highest hash rate contribution.
 
-        return {}
+        :param int n: number of pools.
+        :return list: pool records sorted by hash rate.
+        """
+        self._aggregate()
+        return self._ranking[:n]
+
+    @property
+    def shares(self):
+        """
+        Get pools hash rate share.
+
+        :return dict: hash rate percentage by pool name.
+        """
+        self._aggregate()
+        return self._shares
+
+    @property
+    def herfindahl(self):
+        """
+        Get Herfindahl-Hirschman index of hash rate concentration, from
+        near 0 for evenly spread hash rate to 10000 for a single pool.
+
+        :return float: sum of squared percentage shares.
+        """
+        self._aggregate()
+        return self._herfindahl
 
     @property
     def pools(self):
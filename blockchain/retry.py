@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import configparser
+import logging
+import random
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from logging.config import fileConfig
+from os.path import dirname, join
+
+from .exceptions import BlockchainAPICircuitOpenError, BlockchainAPIRetryError
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy(object):
+    """
+    Enable retries with exponential backoff and jitter.
+    """
+
+    def __init__(self, retries=3, backoff_factor=0.5, max_backoff=30.0, jitter=True,
+                 statuses=(429, 500, 502, 503, 504)):
+        """
+        Initialize retry policy.
+
+        :param int retries: max number of retries after first attempt.
+        :param float backoff_factor: seconds of first backoff, doubled per retry.
+        :param float max_backoff: max seconds waited between attempts.
+        :param bool jitter: flag to signal randomized backoff.
+        :param tuple statuses: http status codes worth retrying.
+        """
+        self.retries = retries
+        self._backoff_factor = backoff_factor
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._statuses = frozenset(statuses)
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'retries': self.retries,
+            'backoff_factor': self._backoff_factor,
+            'max_backoff': self._max_backoff,
+            'jitter': self._jitter,
+            'statuses': sorted(self._statuses),
+        }
+        return str(params)
+
+    @classmethod
+    def config(cls, filename='blockchain.cfg', section='retry'):
+        """
+        Get RetryPolicy class instance.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: RetryPolicy class instance.
+        """
+        parser = configparser.ConfigParser()
+        parser.read(filename)
+        if parser.has_section(section):
+            try:
+                statuses = parser.get(section, 'statuses').split(',')
+                return cls(
+                    retries=parser.getint(section, 'retries'),
+                    backoff_factor=parser.getfloat(section, 'backoff_factor'),
+                    max_backoff=parser.getfloat(section, 'max_backoff'),
+                    jitter=parser.getboolean(section, 'jitter'),
+                    statuses=tuple(int(status) for status in statuses),
+                )
+            except (configparser.Error, ValueError) as msg:
+                msg = 'Incorrect retry configuration in {}: {}'.format(filename, msg)
+                raise BlockchainAPIRetryError(msg)
+        else:
+            msg = 'Section {} not found in {} file'.format(section, filename)
+            raise BlockchainAPIRetryError(msg)
+
+    def should_retry(self, status):
+        """
+        Check whether http status code is worth retrying.
+
+        :param int status: http status code.
+        :return bool: retryable status.
+        """
+        return status in self._statuses
+
+    @staticmethod
+    def parse_retry_after(value):
+        """
+        Parse Retry-After header given as seconds or http date.
+
+        :param str value: Retry-After header value.
+        :return float: seconds to wait or None if unparseable.
+        """
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Get seconds to wait before next attempt. Server Retry-After is
+        honored, otherwise exponential backoff with full jitter is used.
+
+        :param int attempt: number of failed attempts so far, from zero.
+        :param str retry_after: Retry-After header value.
+        :return float: seconds to wait.
+        """
+        delay = self.parse_retry_after(retry_after)
+        if delay is not None:
+            return min(delay, self._max_backoff)
+
+        delay = min(self._backoff_factor * (2 ** attempt), self._max_backoff)
+        return random.uniform(0, delay) if self._jitter else delay
+
+
+class CircuitBreaker(object):
+    """
+    Enable short circuiting calls while upstream is failing.
+
+    The circuit opens after consecutive failures, rejects calls during the
+    recovery timeout and then lets a single trial call through: success
+    closes the circuit while failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, failure_threshold=5, recovery_timeout=60.0):
+        """
+        Initialize closed circuit breaker.
+
+        :param int failure_threshold: consecutive failures opening circuit.
+        :param float recovery_timeout: seconds before a trial call.
+        """
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'state': self.state,
+            'failures': self._failures,
+        }
+        return str(params)
+
+    @classmethod
+    def config(cls, filename='blockchain.cfg', section='circuit'):
+        """
+        Get CircuitBreaker class instance.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: CircuitBreaker class instance.
+        """
+        parser = configparser.ConfigParser()
+        parser.read(filename)
+        if parser.has_section(section):
+            try:
+                return cls(
+                    failure_threshold=parser.getint(section, 'failure_threshold'),
+                    recovery_timeout=parser.getfloat(section, 'recovery_timeout'),
+                )
+            except (configparser.Error, ValueError) as msg:
+                msg = 'Incorrect circuit configuration in {}: {}'.format(filename, msg)
+                raise BlockchainAPIRetryError(msg)
+        else:
+            msg = 'Section {} not found in {} file'.format(section, filename)
+            raise BlockchainAPIRetryError(msg)
+
+    @classmethod
+    def shared(cls, filename='blockchain.cfg', section='circuit'):
+        """
+        Get process wide CircuitBreaker instance, creating it once, so
+        synchronous and asynchronous clients track the same upstream.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: shared CircuitBreaker class instance.
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls.config(filename, section)
+        return cls._shared
+
+    @property
+    def state(self):
+        """
+        Get circuit state.
+
+        :return str: closed, open or half-open.
+        """
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self._recovery_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """
+        Check whether a call may go through, reserving the trial call when
+        recovery timeout elapsed.
+
+        :return tuple: call allowed and whether caller got the trial call.
+        """
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True, False
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True, True
+            return False, False
+
+    def release(self):
+        """
+        Give back trial call ended without recorded outcome, so an
+        unexpected error never leaves the circuit half-open for good. Only
+        the caller holding the trial call may release it.
+        """
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        """
+        Close circuit after successful call.
+        """
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info('Circuit closed after successful trial call.')
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """
+        Count failed call, opening circuit when threshold is reached.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self._failure_threshold:
+                if self._opened_at is None or self._trial:
+                    logger.error('Circuit opened after %s consecutive failures.', self._failures)
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+
+class RetryAttempts(object):
+    """
+    Track attempts of a single request against retry policy and circuit
+    breaker.
+
+    Every attempt runs inside the instance used as context manager: entering
+    checks the circuit, reserving the trial call when recovery timeout
+    elapsed, and leaving gives back a trial call whose outcome was never
+    recorded.
+    """
+
+    def __init__(self, url, retry=None, breaker=None):
+        """
+        Initialize attempts of a request.
+
+        :param str url: requested url.
+        :param obj retry: retry policy for failed attempts.
+        :param obj breaker: circuit breaker for failing upstream.
+        """
+        self._url = url
+        self._retry = retry
+        self._breaker = breaker
+        self._trial = False
+        self._recorded = False
+        self.attempt = 0
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'url': self._url,
+            'attempt': self.attempt,
+        }
+        return str(params)
+
+    def __enter__(self):
+        """
+        Start attempt unless circuit is open.
+
+        :return obj: RetryAttempts instance.
+        """
+        self._trial = False
+        self._recorded = False
+        if self._breaker is not None:
+            allowed, self._trial = self._breaker.allow()
+            if not allowed:
+                msg = 'Error: circuit open, url {} short circuited'.format(self._url)
+                raise BlockchainAPICircuitOpenError(msg, 503)
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        End attempt, releasing its trial call when no outcome was recorded.
+        """
+        if self._trial and not self._recorded:
+            self._breaker.release()
+        self._trial = False
+
+    def record(self, success):
+        """
+        Record attempt outcome in circuit breaker.
+
+        :param bool success: upstream answered without server error.
+        """
+        self._recorded = True
+        if self._breaker is None:
+            return
+        if success:
+            self._breaker.record_success()
+        else:
+            self._breaker.record_failure()
+
+    def retryable(self, status=None):
+        """
+        Check whether failed attempt may be retried.
+
+        :param int status: http status code, None for connection errors.
+        :return bool: retry allowed.
+        """
+        if self._retry is None or self.attempt >= self._retry.retries:
+            return False
+        return status is None or self._retry.should_retry(status)
+
+    def backoff(self, retry_after=None):
+        """
+        Get seconds to wait before next attempt, counting failed attempt.
+
+        :param str retry_after: Retry-After header value.
+        :return float: seconds to wait.
+        """
+        delay = self._retry.backoff(self.attempt, retry_after)
+        self.attempt += 1
+        return delay
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import configparser
+import logging
+import requests
+import threading
+import time
+
+from logging.config import fileConfig
+from os.path import dirname, join
+from requests.adapters import HTTPAdapter
+
+from .exceptions import BlockchainAPIHttpRequestError, BlockchainAPISessionError
+from .retry import CircuitBreaker, RetryAttempts, RetryPolicy
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+
+class BlockchainAPISession(object):
+    """
+    Enable pooled, keep-alive HTTP connections to Blockchain API.
+
+    Requests are bounded by connect and read timeouts. Connection errors
+    and retryable statuses are retried with backoff while the circuit
+    breaker short circuits requests once upstream keeps failing.
+    """
+
+    _shared = None
+    _lock = threading.Lock()
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 keep_alive=True, connect_timeout=5.0, read_timeout=30.0, retry=None,
+                 breaker=None):
+        """
+        Initialize Blockchain API connection pool session.
+
+        :param int pool_connections: number of host connection pools to cache.
+        :param int pool_maxsize: max number of connections kept per host.
+        :param bool pool_block: block when per host connections limit is hit.
+        :param bool keep_alive: reuse connections between requests.
+        :param float connect_timeout: seconds to wait for connection.
+        :param float read_timeout: seconds to wait between response bytes.
+        :param obj retry: retry policy for failed requests.
+        :param obj breaker: circuit breaker for failing upstream.
+        """
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._keep_alive = keep_alive
+        self._timeout = (connect_timeout, read_timeout)
+        self._retry = retry
+        self._breaker = breaker
+        self._session = self._build_session()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'pool_connections': self._pool_connections,
+            'pool_maxsize': self._pool_maxsize,
+            'pool_block': self._pool_block,
+            'keep_alive': self._keep_alive,
+            'timeout': self._timeout,
+            'retry': str(self._retry),
+            'breaker': str(self._breaker),
+        }
+        return str(params)
+
+    @classmethod
+    def config(cls, filename='blockchain.cfg', section='session'):
+        """
+        Get BlockchainAPISession class instance.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: BlockchainAPISession class instance.
+        """
+        parser = configparser.ConfigParser()
+        parser.read(filename)
+        if parser.has_section(section):
+            try:
+                return cls(
+                    pool_connections=parser.getint(section, 'pool_connections'),
+                    pool_maxsize=parser.getint(section, 'pool_maxsize'),
+                    pool_block=parser.getboolean(section, 'pool_block'),
+                    keep_alive=parser.getboolean(section, 'keep_alive'),
+                    connect_timeout=parser.getfloat(section, 'connect_timeout'),
+                    read_timeout=parser.getfloat(section, 'read_timeout'),
+                    retry=RetryPolicy.config(filename),
+                    breaker=CircuitBreaker.shared(filename),
+                )
+            except (configparser.Error, ValueError) as msg:
+                msg = 'Incorrect session configuration in {}: {}'.format(filename, msg)
+                raise BlockchainAPISessionError(msg)
+        else:
+            msg = 'Section {} not found in {} file'.format(section, filename)
+            raise BlockchainAPISessionError(msg)
+
+    @classmethod
+    def shared(cls, filename='blockchain.cfg', section='session'):
+        """
+        Get process wide BlockchainAPISession instance, creating it once.
+
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: shared BlockchainAPISession class instance.
+        """
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None:
+                    cls._shared = cls.config(filename, section)
+                    logger.info('Shared HTTP session created: %s', cls._shared)
+        return cls._shared
+
+    def _build_session(self):
+        """
+        Build requests session mounting pooled adapters.
+
+        :return obj: requests session.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self._pool_connections,
+                              pool_maxsize=self._pool_maxsize,
+                              pool_block=self._pool_block)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not self._keep_alive:
+            session.headers.update({'Connection': 'close'})
+        return session
+
+    def get(self, url, **kwargs):
+        """
+        Make http GET request through pooled connections, retrying failed
+        attempts. Last response is returned once retries are exhausted.
+
+        :param str url: requested url.
+        :param dict kwargs: requests keyword arguments.
+        :return obj: http object response.
+        """
+        kwargs.setdefault('timeout', self._timeout)
+        attempts = RetryAttempts(url, self._retry, self._breaker)
+        while True:
+            with attempts:
+                try:
+                    http_response = self._session.get(url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as error:
+                    attempts.record(False)
+                    if not attempts.retryable():
+                        msg = 'Error: url {}, {}'.format(url, error)
+                        raise BlockchainAPIHttpRequestError(msg)
+                    delay = attempts.backoff()
+                    logger.warning('Request to %s failed (%s), retry in %.2fs.',
+                                   url, error, delay)
+                else:
+                    status = http_response.status_code
+                    attempts.record(status < 500)
+                    if not attempts.retryable(status):
+                        return http_response
+                    delay = attempts.backoff(http_response.headers.get('Retry-After'))
+                    http_response.close()
+                    logger.warning('Request to %s got status %s, retry in %.2fs.',
+                                   url, status, delay)
+
+            time.sleep(delay)
+
+    @property
+    def retry(self):
+        """
+        Get retry policy, also used by requests whose body stream broke off.
+
+        :return obj: RetryPolicy instance or None.
+        """
+        return self._retry
+
+    def close(self):
+        """
+        Close pooled connections.
+        """
+        self._session.close()
+
+    @classmethod
+    def close_shared(cls):
+        """
+        Close and discard process wide session.
+        """
+        with cls._lock:
+            if cls._shared is not None:
+                cls._shared.close()
+                cls._shared = None
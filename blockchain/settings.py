@@ -4,6 +4,9 @@
 # Settings for Blockchain API project
 
 
+# Request parameters never written to cache entries or replay archives
+SECRET_PARAMS = ('api_code',)
+
 # Configure Blockchain API resources
 RESOURCES = {
     'charts': 'BlockchainAPIChart',
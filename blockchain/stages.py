@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import configparser
+import logging
+import queue
+import threading
+import time
+
+from logging.config import fileConfig
+from os.path import dirname, join
+
+from .api import BlockchainAPIClient
+from .exceptions import StagedPipelineError
+
+# Custom logger
+fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
+logger = logging.getLogger(__name__)
+
+# Queue end marker
+DONE = object()
+
+
+def fetch(data, **params):
+    """
+    Get data from Blockchain API.
+
+    :param str data: type of data (charts, stats, pools).
+    :param dict params: request parameters.
+    :return obj: BlockchainAPIHttpResponse instance.
+    """
+    return BlockchainAPIClient.config(data).call(**params)
+
+
+def fetch_incremental(data, chart, since=None, **params):
+    """
+    Get chart values newer than given timestamp from Blockchain API.
+
+    :param str data: type of data, only charts.
+    :param str chart: requested chart name.
+    :param int since: unix timestamp of last stored chart value.
+    :param dict params: additional request parameters.
+    :return obj: BlockchainAPIHttpResponse instance.
+    """
+    return BlockchainAPIClient.config(data).call_incremental(chart, since, **params)
+
+
+def validate(document):
+    """
+    Check normalized document has a value for every field as sinks require,
+    raising ValueError otherwise.
+
+    :param json document: normalized json document.
+    :return json: validated document.
+    """
+    for key, value in document.items():
+        if not value:
+            raise ValueError('Missing value for: {}'.format(key))
+    return document
+
+
+class IncrementalSink(object):
+    """
+    Enable persisting incrementally fetched charts through a pipeline:
+    charts with stored values get new values merged, others are persisted
+    whole.
+    """
+
+    def __init__(self, pipeline, since):
+        """
+        Initialize incremental sink.
+
+        :param obj pipeline: pipeline instance with merge_data support.
+        :param dict since: unix timestamp of last stored value by chart name.
+        """
+        self._pipeline = pipeline
+        self._since = since
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'pipeline': str(self._pipeline),
+            'charts': len(self._since),
+        }
+        return str(params)
+
+    def persist_many(self, documents):
+        """
+        Merge or persist batch of chart documents.
+
+        :param list documents: normalized chart documents.
+        :return dict: number of persisted documents.
+        """
+        persisted = 0
+        for data in documents:
+            since = self._since.get(data.get('_chart'))
+            if since is None:
+                result = self._pipeline.persist_data(data)
+            else:
+                result = self._pipeline.merge_data(data, since)
+            if result is not None:
+                persisted += 1
+        return {'persisted': persisted}
+
+
+class StagedPipeline(object):
+    """
+    Enable overlapping fetch, normalization and persistence stages.
+
+    Stages run in their own threads connected by bounded queues, so a slow
+    sink makes fetchers wait instead of piling up responses in memory and a
+    slow fetch leaves the sink flushing what is already available.
+    """
+
+    def __init__(self, sink, fetcher=fetch, fetchers=2, queue_size=8, batch_size=8,
+                 flush_interval=5.0):
+        """
+        Initialize staged pipeline.
+
+        :param obj sink: pipeline instance persisting normalized data.
+        :param callable fetcher: function fetching a (data, params) spec.
+        :param int fetchers: number of concurrent fetcher threads.
+        :param int queue_size: max number of items waiting between stages.
+        :param int batch_size: max number of documents persisted at once.
+        :param float flush_interval: max seconds a document waits in batch.
+        """
+        self._sink = sink
+        self._fetcher = fetcher
+        self._fetchers = fetchers
+        self._queue_size = queue_size
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        """
+        Represent class via params string.
+
+        :return str: class representarion.
+        """
+        params = {
+            'classname': self.__class__.__name__,
+            'sink': str(self._sink),
+            'fetchers': self._fetchers,
+            'queue_size': self._queue_size,
+            'batch_size': self._batch_size,
+            'flush_interval': self._flush_interval,
+        }
+        return str(params)
+
+    @classmethod
+    def config(cls, sink, fetcher=fetch, filename='blockchain.cfg', section='stages'):
+        """
+        Get StagedPipeline class instance.
+
+        :param obj sink: pipeline instance persisting normalized data.
+        :param callable fetcher: function fetching a (data, params) spec.
+        :param str filename: Blockchain API Client configuration filename.
+        :param str section: filename section to parse.
+        :return cls: StagedPipeline class instance.
+        """
+        parser = configparser.ConfigParser()
+        parser.read(filename)
+        if parser.has_section(section):
+            try:
+                return cls(
+                    sink,
+                    fetcher=fetcher,
+                    fetchers=parser.getint(section, 'fetchers'),
+                    queue_size=parser.getint(section, 'queue_size'),
+                    batch_size=parser.getint(section, 'batch_size'),
+                    flush_interval=parser.getfloat(section, 'flush_interval'),
+                )
+            except (configparser.Error, ValueError) as msg:
+                msg = 'Incorrect stages configuration in {}: {}'.format(filename, msg)
+                raise StagedPipelineError(msg)
+        else:
+            msg = 'Section {} not found in {} file'.format(section, filename)
+            raise StagedPipelineError(msg)
+
+    def _count(self, counter, amount=1):
+        """
+        Increase pipeline counter.
+
+        :param str counter: counter name.
+        :param int amount: counter increment.
+        """
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def _fetch_stage(self, specs, responses):
+        """
+        Fetch specs until none left.
+
+        :param obj specs: queue of (data, params) specs.
+        :param obj responses: queue of fetched responses.
+        """
+        while True:
+            try:
+                data, params = specs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                responses.put(self._fetcher(data, **(params or {})))
+                self._count('fetched')
+            except Exception as msg:
+                self._count('failed')
+                logger.error('Fetch stage failed for %s %s: %s', data, params, msg)
+
+    def _normalize_stage(self, responses, documents):
+        """
+        Normalize fetched responses until end marker, leaving out documents
+        sinks would reject so they never fail a whole batch.
+
+        :param obj responses: queue of fetched responses.
+        :param obj documents: queue of normalized documents.
+        """
+        while True:
+            response = responses.get()
+            if response is DONE:
+                documents.put(DONE)
+                return
+            try:
+                document = validate(response.response)
+            except Exception as msg:
+                self._count('failed')
+                logger.error('Normalize stage failed for %s: %s', response, msg)
+                continue
+            documents.put(document)
+            self._count('normalized')
+
+    @staticmethod
+    def _persisted(result, size):
+        """
+        Get number of documents persisted by a sink batch call.
+
+        :param obj result: batch call summary or count, None if it failed.
+        :param int size: number of documents in batch.
+        :return int: number of persisted documents.
+        """
+        if result is None:
+            return 0
+        if isinstance(result, int):
+            return result
+        return result.get('persisted', size)
+
+    def _flush(self, batch):
+        """
+        Persist batch of documents through the sink. Documents the sink did
+        not persist are counted as failed.
+
+        :param list batch: normalized documents.
+        """
+        if not batch:
+            return
+        try:
+            if hasattr(self._sink, 'persist_many'):
+                persisted = self._persisted(self._sink.persist_many(batch), len(batch))
+            elif hasattr(self._sink, 'write_many'):
+                persisted = self._persisted(self._sink.write_many(batch), len(batch))
+            elif hasattr(self._sink, 'persist_data'):
+                persisted = sum(self._sink.persist_data(document) is not None
+                                for document in batch)
+            else:
+                for document in batch:
+                    self._sink.write(document)
+                persisted = len(batch)
+        except Exception as msg:
+            self._count('failed', len(batch))
+            logger.error('Sink stage failed for batch of %s documents: %s', len(batch), msg)
+            return
+
+        self._count('persisted', persisted)
+        self._count('batches')
+        if persisted < len(batch):
+            self._count('failed', len(batch) - persisted)
+            logger.error('Sink stage failed for %s of %s documents',
+                         len(batch) - persisted, len(batch))
+
+    def _sink_stage(self, documents):
+        """
+        Persist documents in batches until end marker, flushing when batch is
+        full or flush interval elapsed.
+
+        :param obj documents: queue of normalized documents.
+        """
+        batch = []
+        deadline = time.monotonic() + self._flush_interval
+        while True:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                document = documents.get(timeout=timeout)
+            except queue.Empty:
+                document = None
+
+            if document is DONE:
+                self._flush(batch)
+                return
+            if document is not None:
+                batch.append(document)
+            if len(batch) >= self._batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self._flush_interval
+
+    def run(self, specs):
+        """
+        Fetch, normalize and persist specs with overlapping stages.
+
+        :param list specs: list of (data, params) tuples.
+        :return dict: stage counters and elapsed seconds.
+        """
+        started = time.perf_counter()
+        self._counters = {'fetched': 0, 'normalized': 0, 'persisted': 0,
+                          'batches': 0, 'failed': 0}
+
+        pending = queue.Queue()
+        for spec in specs:
+            pending.put(spec)
+        responses = queue.Queue(maxsize=self._queue_size)
+        documents = queue.Queue(maxsize=self._queue_size)
+
+        fetchers = [threading.Thread(target=self._fetch_stage, args=(pending, responses),
+                                     daemon=True) for _ in range(self._fetchers)]
+        normalizer = threading.Thread(target=self._normalize_stage,
+                                      args=(responses, documents), daemon=True)
+        sink = threading.Thread(target=self._sink_stage, args=(documents,), daemon=True)
+        for thread in fetchers + [normalizer, sink]:
+            thread.start()
+
+        for thread in fetchers:
+            thread.join()
+        responses.put(DONE)
+        normalizer.join()
+        sink.join()
+
+        summary = dict(self._counters)
+        summary.update({'elapsed': time.perf_counter() - started})
+        logger.info('Staged pipeline finished: %s', summary)
+        return summary
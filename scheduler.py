@@ -1,24 +1,73 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
+import configparser
 import logging
 import time
 
+from apscheduler.events import EVENT_SCHEDULER_SHUTDOWN
 from apscheduler.schedulers.blocking import BlockingScheduler
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from logging.config import fileConfig
 from os.path import dirname, join
 
 from blockchain import settings
 from blockchain.api import BlockchainAPIClient
-from blockchain.pipelines import MongoDBPipeline
+from blockchain.metrics import MetricsRegistry
+from blockchain.registry import PipelineRegistry
+from blockchain.replay import ReplayArchive
+from blockchain.session import BlockchainAPISession
+from blockchain.stages import IncrementalSink, StagedPipeline, fetch_incremental
 
 # Custom logger
 fileConfig(join(dirname(dirname(__file__)), 'logging.cfg'))
 logger = logging.getLogger(__name__)
 
+# Scheduler configuration
+parser = configparser.ConfigParser()
+parser.read('blockchain.cfg')
+INCREMENTAL = parser.getboolean('scheduler', 'incremental', fallback=False)
+PIPELINE = parser.get('scheduler', 'pipeline', fallback='mongodb')
+HEALTH_CHECK_INTERVAL = parser.getint('scheduler', 'health_check_interval', fallback=300)
+WORKERS = parser.getint('scheduler', 'workers', fallback=4)
+
+# Pipeline connections kept alive while scheduler runs
+registry = PipelineRegistry()
+
+# Metrics exported while scheduler runs
+metrics = MetricsRegistry.shared()
+
 scheduler = BlockingScheduler()
 
 
+def run_concurrently(job, function, items):
+    """
+    Run function over items in a thread pool isolating every item errors.
+
+    :param str job: job name.
+    :param callable function: function called with every item.
+    :param list items: items to process.
+    :return list: results of succeeded items.
+    """
+    started = time.perf_counter()
+    results, failures = [], 0
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        futures = {executor.submit(function, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as msg:
+                failures += 1
+                logger.error('Job %s failed for %s: %s', job, futures[future], msg)
+
+    elapsed = time.perf_counter() - started
+    metrics.observe('job_seconds', elapsed, job=job)
+    metrics.inc('job_failures_total', failures, job=job)
+    logger.info('Job %s finished in %.2f s: %s succeeded, %s failed.',
+                job, elapsed, len(results), failures)
+    return results
+
+
 def fetch_and_persist_data(data, *args, **kwargs):
     """
     Get and save data from Blockchain API.
@@ -26,25 +75,35 @@ def fetch_and_persist_data(data, *args, **kwargs):
     :param str data: type of data (charts, stats, pools).
     """
     # Retrieve blockchain data
-    api = BlockchainAPIClient(data)
+    api = BlockchainAPIClient.config(data)
     result = api.call(**kwargs)
     # Persist retrieved data
-    logger.info('Persisting fetched data in MongoDB: %s', result)
-    mongo = MongoDBPipeline.config()
-    mongo.open_connection()
-    mongo.persist_data(result.response)
-    mongo.close_connection()
+    logger.info('Persisting fetched data in %s pipeline: %s', PIPELINE, result)
+    with registry.lease(PIPELINE) as pipeline:
+        pipeline.persist_data(result.response)
     logger.info('Data successfully persisted.')
-    time.sleep(2)
+
 
 @scheduler.scheduled_job(id='charts', trigger='cron', day_of_week='mon-sun', hour=0)
 def charts_job():
     """
     Get and save blockchain charts data from Blockchain API.
     """
-    for chart in settings.CHARTS:
-        logger.info('Fetching %s chart data.', chart)
-        fetch_and_persist_data('charts', chart=chart, timespan='all')
+    logger.info('Fetching %s charts data.', len(settings.CHARTS))
+    with registry.lease(PIPELINE) as pipeline:
+        if INCREMENTAL:
+            # Only chart values newer than the stored ones are fetched and merged
+            since = {chart: pipeline.last_timestamp(chart) for chart in settings.CHARTS}
+            specs = [('charts', {'chart': chart, 'since': since[chart]})
+                     for chart in settings.CHARTS]
+            logger.info('Merging fetched charts data in %s pipeline.', PIPELINE)
+            StagedPipeline.config(IncrementalSink(pipeline, since), fetch_incremental) \
+                .run(specs)
+            return
+
+        specs = [('charts', {'chart': chart, 'timespan': 'all'}) for chart in settings.CHARTS]
+        logger.info('Persisting fetched charts data in %s pipeline.', PIPELINE)
+        StagedPipeline.config(pipeline).run(specs)
 
 @scheduler.scheduled_job(id='stats', trigger='cron', day_of_week='mon-sun', hour=0)
 def stats_job():
@@ -52,7 +111,7 @@ def stats_job():
     Get and save blockchain stats data from Blockchain API.
     """
     logger.info('Fetching blockchain statistical data.')
-    fetch_and_persist_data('stats')
+    run_concurrently('stats', fetch_and_persist_data, ['stats'])
 
 @scheduler.scheduled_job(id='pools', trigger='cron', day_of_week='mon-sun', hour=0)
 def pools_job():
@@ -60,7 +119,31 @@ def pools_job():
     Get and save blockchain pools data from Blockchain API.
     """
     logger.info('Fetching bitcoin mining pools data.')
-    fetch_and_persist_data('pools', timespan='5days')
+    run_concurrently('pools', lambda data: fetch_and_persist_data(data, timespan='5days'),
+                     ['pools'])
+
+@scheduler.scheduled_job(id='health', trigger='interval', seconds=HEALTH_CHECK_INTERVAL)
+def health_job():
+    """
+    Check long lived pipeline connections.
+    """
+    status = registry.health_check()
+    logger.info('Pipelines health status: %s', status)
+
+def shutdown(event=None):
+    """
+    Release pooled connections on scheduler exit.
+    """
+    registry.close_all()
+    BlockchainAPISession.close_shared()
+    ReplayArchive.close_shared()
+    metrics.stop()
+
+scheduler.add_listener(shutdown, EVENT_SCHEDULER_SHUTDOWN)
 
 # Start queueing jobs
-scheduler.start()
+try:
+    metrics.start()
+    scheduler.start()
+except (KeyboardInterrupt, SystemExit):
+    shutdown()
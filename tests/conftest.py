@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import pymongo
+import pytest
+import sys
+
+from os.path import abspath, dirname, join
+
+from blockchain.api import BlockchainAPIHttpResponse
+from blockchain.exceptions import PostgreSQLPipelineError
+from blockchain.pipelines import (MongoDBPipeline, MongoDBTimeSeriesPipeline,
+                                  PostgreSQLPipeline)
+
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), 'benchmarks'))
+
+from stub_server import FaultInjectingHandler, start_server
+
+# First chart value timestamp, 2009-01-03
+START = 1230940800
+
+
+def chart_document(chart, points=10, start=START, step=86400):
+    """
+    Build normalized chart document with y equal to value position.
+
+    :param str chart: chart name.
+    :param int points: number of chart values.
+    :param int start: first value unix timestamp.
+    :param int step: seconds between values.
+    :return json: normalized chart document.
+    """
+    payload = {
+        'status': 'ok',
+        'name': chart.replace('-', ' ').title(),
+        'unit': 'USD',
+        'period': 'day',
+        'description': 'Test {} chart.'.format(chart),
+        'values': [{'x': start + i * step, 'y': float(i)} for i in range(points)],
+    }
+    url = 'http://localhost/charts/{}'.format(chart)
+    return BlockchainAPIHttpResponse('charts', url, payload).response
+
+
+def stats_document(n_tx=250000):
+    """
+    Build normalized stats document.
+
+    :param int n_tx: number of transactions stat.
+    :return json: normalized stats document.
+    """
+    payload = {'market_price_usd': 6500.0, 'n_tx': n_tx, 'timestamp': 1530000000000}
+    return BlockchainAPIHttpResponse('stats', 'http://localhost/stats', payload).response
+
+
+@pytest.fixture
+def mongomock_client(monkeypatch):
+    """
+    Route MongoDB pipelines to mongomock.
+    """
+    mongomock = pytest.importorskip('mongomock')
+    monkeypatch.setattr(pymongo, 'MongoClient', mongomock.MongoClient)
+
+
+@pytest.fixture
+def mongo(mongomock_client):
+    """
+    Get MongoDBPipeline with open connection to an empty collection.
+    """
+    pipeline = MongoDBPipeline('mongodb://localhost:27017/', 'blockchain_test', 'charts')
+    pipeline.open_connection()
+    pipeline.collection.delete_many({})
+    yield pipeline
+    pipeline.collection.drop()
+    pipeline.close_connection()
+
+
+@pytest.fixture
+def timeseries(mongomock_client):
+    """
+    Get MongoDBTimeSeriesPipeline with open connection to empty collections.
+    """
+    pipeline = MongoDBTimeSeriesPipeline('mongodb://localhost:27017/', 'blockchain_test',
+                                         'charts_meta', bucket_span=864000)
+    pipeline.open_connection()
+    pipeline.collection.delete_many({})
+    pipeline.points.delete_many({})
+    yield pipeline
+    pipeline.collection.drop()
+    pipeline.points.drop()
+    pipeline.close_connection()
+
+
+@pytest.fixture
+def postgres():
+    """
+    Get PostgreSQLPipeline with open connection to empty tables of the
+    database in POSTGRES_TEST_URL.
+    """
+    postgres_url = os.getenv('POSTGRES_TEST_URL')
+    if not postgres_url:
+        pytest.skip('POSTGRES_TEST_URL not set')
+    pipeline = PostgreSQLPipeline(postgres_url, 'blockchain_test', max_pool_size=4)
+    try:
+        pipeline.open_connection()
+    except PostgreSQLPipelineError as msg:
+        pytest.skip('PostgreSQL not available: {}'.format(msg))
+    with pipeline.transaction() as cursor:
+        cursor.execute(pipeline._sql('TRUNCATE {table}, {points}'))
+    yield pipeline
+    with pipeline.transaction() as cursor:
+        cursor.execute(pipeline._sql('DROP TABLE {table}, {points}'))
+    pipeline.close_connection()
+
+
+@pytest.fixture
+def stub():
+    """
+    Get base url of a stub Blockchain API server injecting scripted faults.
+    """
+    FaultInjectingHandler.inject()
+    server, base_url = start_server(handler=FaultInjectingHandler)
+    yield base_url
+    FaultInjectingHandler.inject()
+    server.shutdown()
+    server.server_close()
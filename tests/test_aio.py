@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import asyncio
+
+import pytest
+
+from blockchain.cache import MemoryCacheBackend, ResponseCache
+from blockchain.exceptions import (BlockchainAPICircuitOpenError,
+                                   BlockchainAPIHttpRequestError)
+from blockchain.retry import CircuitBreaker, RetryPolicy
+
+from conftest import FaultInjectingHandler
+
+aio = pytest.importorskip('blockchain.aio')
+
+DATA_URLS = {'charts': 'charts', 'stats': 'stats', 'pools': 'pools'}
+
+
+def client(stub, **kwargs):
+    """
+    Get asynchronous client of stub server retrying without delay.
+    """
+    kwargs.setdefault('retry', RetryPolicy(retries=3, backoff_factor=0.0, jitter=False))
+    return aio.AsyncBlockchainAPIClient(stub, DATA_URLS, read_timeout=2.0, **kwargs)
+
+
+def test_fetch_many_returns_responses_in_specs_order(stub):
+    specs = [('charts', {'chart': 'market-price', 'timespan': 'all'}), ('stats', {}),
+             ('charts', {'chart': 'hash-rate', 'timespan': 'all'})]
+
+    responses = client(stub).run(specs)
+
+    assert [response.response['_slug'] for response in responses] == \
+        ['market-price', 'stats', 'hash-rate']
+    assert responses[0].transfer['decompressed'] > 0
+
+
+def test_requests_in_flight_are_bounded_by_concurrency(stub, monkeypatch):
+    in_flight, peak = [0], [0]
+    attempt = aio.AsyncBlockchainAPIHttpRequest._attempt
+
+    async def counted(self, *args, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        try:
+            await asyncio.sleep(0.01)
+            return await attempt(self, *args, **kwargs)
+        finally:
+            in_flight[0] -= 1
+
+    monkeypatch.setattr(aio.AsyncBlockchainAPIHttpRequest, '_attempt', counted)
+    specs = [('charts', {'chart': 'chart-{}'.format(i)}) for i in range(12)]
+
+    responses = client(stub, concurrency=3).run(specs)
+
+    assert len(responses) == 12
+    assert peak[0] == 3
+
+
+def test_retryable_statuses_and_resets_are_retried(stub):
+    FaultInjectingHandler.inject(503, 'reset', 429)
+
+    response, = client(stub).run([('stats', {})])
+
+    assert response.response['_values']['n_tx'] == 250000
+    assert FaultInjectingHandler.faults == []
+
+
+def test_client_errors_are_raised_or_returned(stub):
+    FaultInjectingHandler.inject(404)
+
+    with pytest.raises(BlockchainAPIHttpRequestError) as error:
+        client(stub).run([('stats', {})])
+    assert error.value.code == 404
+
+    FaultInjectingHandler.inject(404)
+    api_client = client(stub, retry=None, concurrency=1)
+    failed, response = api_client.run([('stats', {}), ('pools', {})], return_exceptions=True)
+    assert isinstance(failed, BlockchainAPIHttpRequestError)
+    assert response.response['_values']['AntPool'] == 120
+
+
+def test_open_circuit_short_circuits_requests(stub):
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60.0)
+    FaultInjectingHandler.inject(500, 500, 500)
+
+    with pytest.raises(BlockchainAPICircuitOpenError):
+        client(stub, breaker=breaker).run([('stats', {})])
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert FaultInjectingHandler.faults == [500]
+
+
+def test_trial_call_is_released_on_unexpected_error(stub, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60.0)
+    breaker.record_failure()
+    breaker._opened_at -= 60.0
+    attempt = aio.AsyncBlockchainAPIHttpRequest._attempt
+
+    async def broken(self, *args, **kwargs):
+        raise RuntimeError('unexpected')
+
+    monkeypatch.setattr(aio.AsyncBlockchainAPIHttpRequest, '_attempt', broken)
+    with pytest.raises(RuntimeError):
+        client(stub, breaker=breaker).run([('stats', {})])
+    monkeypatch.setattr(aio.AsyncBlockchainAPIHttpRequest, '_attempt', attempt)
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    client(stub, breaker=breaker).run([('stats', {})])
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_fresh_cached_responses_skip_network(stub):
+    cache = ResponseCache(MemoryCacheBackend(), ttls={'stats': 300})
+    first, = client(stub, cache=cache).run([('stats', {})])
+    FaultInjectingHandler.inject(500)
+
+    second, = client(stub, cache=cache, retry=None).run([('stats', {})])
+
+    assert second.response == first.response
+    assert FaultInjectingHandler.faults == [500]
+    assert cache.stats['hits'] == 1
+
+
+def test_identical_concurrent_calls_are_coalesced(stub):
+    async def fetch(api_client):
+        async with api_client:
+            return await asyncio.gather(*[api_client.call('stats') for _ in range(5)])
+
+    api_client = client(stub)
+    responses = asyncio.run(fetch(api_client))
+
+    assert len({id(response) for response in responses}) == 1
+    assert api_client.coalesced['executed'] == 1
+    assert api_client.coalesced['coalesced'] == 4
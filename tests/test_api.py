@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import pytest
+
+from blockchain.api import BlockchainAPIClient
+from blockchain.exceptions import BlockchainAPIClientError
+from blockchain.session import BlockchainAPISession
+
+
+def test_call_many_rejects_non_chart_data_at_call_time(stub):
+    client = BlockchainAPIClient('stats', stub + 'stats')
+
+    with pytest.raises(BlockchainAPIClientError):
+        client.call_many(['market-price'])
+
+
+def test_call_many_yields_every_chart(stub):
+    session = BlockchainAPISession()
+    client = BlockchainAPIClient('charts', stub + 'charts', session=session)
+    charts = ['market-price', 'market-cap', 'hash-rate']
+
+    try:
+        results = dict(client.call_many(charts, workers=2, timespan='all'))
+    finally:
+        session.close()
+
+    assert sorted(results) == sorted(charts)
+    for chart, response in results.items():
+        assert response.response['_chart'] == chart
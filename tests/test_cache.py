@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import os
+import time
+
+import pytest
+
+from blockchain.api import BlockchainAPIHttpRequest
+from blockchain.cache import FileCacheBackend, MemoryCacheBackend, ResponseCache
+from blockchain.exceptions import BlockchainAPICacheError
+
+from stub_server import StubHandler, start_server
+
+URL = 'http://localhost/stats'
+
+
+class ETagHandler(StubHandler):
+    """
+    Serve stub responses tagged with an ETag, answering not modified to
+    requests revalidating it.
+    """
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        return super().do_GET()
+
+    def send_header(self, keyword, value):
+        super().send_header(keyword, value)
+        if keyword == 'Content-Type':
+            super().send_header('ETag', self.etag)
+
+
+@pytest.fixture
+def etag_stub():
+    """
+    Get base url of a stub server answering conditional requests.
+    """
+    ETagHandler.requests = []
+    server, base_url = start_server(handler=ETagHandler)
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(base_url, cache, params=None):
+    """
+    Fetch stub stats through cache.
+    """
+    request = BlockchainAPIHttpRequest(base_url + 'stats', params or {}, cache=cache,
+                                       resource='stats')
+    return request.fetch_json_response()
+
+
+def test_fresh_entries_are_served_until_their_ttl_elapses(monkeypatch):
+    cache = ResponseCache(MemoryCacheBackend(), ttls={'stats': 300}, default_ttl=10)
+    cache.set(URL, 'stats', URL, {'n_tx': 1})
+    cache.set('other', 'pools', 'other', {'n_tx': 2})
+    now = time.time()
+
+    assert cache.get(URL) == (URL, {'n_tx': 1})
+    monkeypatch.setattr(time, 'time', lambda: now + 60)
+    assert cache.get(URL) == (URL, {'n_tx': 1})
+    assert cache.get('other') is None
+    monkeypatch.setattr(time, 'time', lambda: now + 301)
+    assert cache.get(URL) is None
+    assert cache.stats == {'hits': 2, 'misses': 2, 'revalidations': 0, 'stores': 2}
+
+
+def test_stale_entry_is_revalidated_with_its_etag(etag_stub):
+    cache = ResponseCache(MemoryCacheBackend(), ttls={'stats': 0})
+
+    _, first = fetch(etag_stub, cache)
+    _, second = fetch(etag_stub, cache)
+
+    assert second == first
+    assert ETagHandler.requests == [None, '"v1"']
+    assert cache.stats['revalidations'] == 1
+    assert cache.stats['stores'] == 1
+
+
+def test_fresh_entry_is_served_without_request(etag_stub):
+    cache = ResponseCache(MemoryCacheBackend(), ttls={'stats': 300})
+
+    first = fetch(etag_stub, cache)
+    second = fetch(etag_stub, cache)
+
+    assert second == first
+    assert ETagHandler.requests == [None]
+
+
+def test_api_key_never_reaches_cache_entries(etag_stub, tmp_path):
+    cache = ResponseCache(FileCacheBackend(str(tmp_path)), ttls={'stats': 300})
+
+    fetch(etag_stub, cache, {'api_code': 'secret-key'})
+    cached_url, _ = fetch(etag_stub, cache, {'api_code': 'other-key'})
+
+    assert cached_url == etag_stub + 'stats'
+    assert ETagHandler.requests == [None]
+    entry_file, = os.listdir(str(tmp_path))
+    with open(str(tmp_path / entry_file)) as file:
+        stored = file.read()
+    assert 'api_code' not in stored
+    assert 'secret-key' not in stored
+
+
+def test_memory_backend_evicts_least_recently_used_entries():
+    backend = MemoryCacheBackend(maxsize=2)
+    backend.set('a', {'body': 'a'})
+    backend.set('b', {'body': 'b'})
+    backend.get('a')
+
+    backend.set('c', {'body': 'c'})
+
+    assert backend.get('b') is None
+    assert backend.get('a') == {'body': 'a'}
+    assert backend.get('c') == {'body': 'c'}
+
+
+def test_cache_config_is_disabled_or_validated(tmp_path):
+    filename = tmp_path / 'blockchain.cfg'
+    section = '[cache]\nenabled={}\nbackend={}\nmaxsize=8\npath=.cache\n' \
+        'charts_ttl=1\nstats_ttl=2\npools_ttl=3\n'
+
+    filename.write_text(section.format('false', 'memory'))
+    assert ResponseCache.config(str(filename)) is None
+    filename.write_text(section.format('true', 'memory'))
+    assert ResponseCache.config(str(filename)).ttl('pools') == 3
+    filename.write_text(section.format('true', 'redis'))
+    with pytest.raises(BlockchainAPICacheError):
+        ResponseCache.config(str(filename))
+
+
+def test_failed_file_cache_write_does_not_fail_fetch(tmp_path, monkeypatch):
+    backend = FileCacheBackend(str(tmp_path))
+    cache = ResponseCache(backend, ttls={'stats': 300})
+
+    def replace(*args):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(os, 'replace', replace)
+    cache.set(URL, 'stats', URL, {'n_tx': 250000})
+    monkeypatch.undo()
+
+    assert backend.get(URL) is None
+    assert os.listdir(str(tmp_path)) == []
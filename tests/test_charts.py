@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import math
+
+import pytest
+
+from blockchain.decoders import ChartValuesDecoder
+from blockchain.resources import charts
+from blockchain.resources.charts import BlockchainAPIChart, ChartColumns
+
+from conftest import START
+
+DAY = 86400
+
+VALUES = [{'x': START, 'y': 1.0}, {'x': START + DAY, 'y': None},
+          {'x': START + 2 * DAY, 'y': 3.0}, {'x': START + 3 * DAY, 'y': 5.0},
+          {'x': START + 4 * DAY, 'y': 7.0}]
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def columns(request, monkeypatch):
+    """
+    Get chart columns with a missing value, with and without numpy.
+    """
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(charts, 'np', None)
+    return ChartColumns.from_values(VALUES)
+
+
+def test_columnar_chart_keeps_missing_values():
+    payload = {'status': 'ok', 'name': 'Market Price (USD)', 'unit': 'USD',
+               'period': 'day', 'description': 'Price', 'values': VALUES}
+
+    chart = BlockchainAPIChart.start(payload, columnar=True)
+
+    assert math.isnan(chart.columns.y[1])
+    assert chart.columns.to_values() == VALUES
+    assert all(isinstance(value['x'], int) for value in chart.columns.to_values())
+
+
+def test_from_values_matches_streaming_decoder():
+    decoder = ChartValuesDecoder()
+    decoder.feed(json.dumps({'name': 'chart', 'values': VALUES}).encode('utf-8'))
+    _, decoded = decoder.close()
+
+    columns = ChartColumns.from_values(VALUES)
+
+    assert columns.to_values() == decoded.to_values() == VALUES
+    assert json.loads(json.dumps(columns.to_values(), allow_nan=False)) == VALUES
+
+
+def test_range_stats_skip_missing_values(columns):
+    assert columns.range_stats() == {'count': 4, 'min': 1.0, 'max': 7.0, 'last': 7.0}
+    assert columns.range_stats(START + DAY, START + DAY) == \
+        {'count': 0, 'min': None, 'max': None, 'last': None}
+    assert columns.range_stats(START, START + 2 * DAY)['last'] == 3.0
+
+
+def test_resample_means_skip_missing_values(columns):
+    # START is an odd day, two day buckets start the day before START
+    resampled = columns.resample(2 * DAY, 'mean').to_values()
+
+    assert resampled == [{'x': START - DAY, 'y': 1.0}, {'x': START + DAY, 'y': 3.0},
+                         {'x': START + 3 * DAY, 'y': 6.0}]
+    assert [value['y'] for value in columns.resample(2 * DAY).to_values()] == [1.0, 3.0, 7.0]
+    assert columns.resample(DAY, 'mean').to_values() == VALUES
+
+
+def test_rolling_mean_only_misses_windows_with_missing_values(columns):
+    means = columns.rolling_mean(2).to_values()
+
+    assert means == [{'x': START + DAY, 'y': None}, {'x': START + 2 * DAY, 'y': None},
+                     {'x': START + 3 * DAY, 'y': 4.0}, {'x': START + 4 * DAY, 'y': 6.0}]
+
+
+def test_decoder_splits_values_at_any_chunk_boundary():
+    values = VALUES + [{'x': START + 5 * DAY, 'y': -1.5e-3}, {'x': START + 6 * DAY, 'y': 12}]
+    payload = json.dumps({'status': 'ok', 'name': 'Chart "values"', 'values': values,
+                          'period': 'day'}, indent=1).encode('utf-8')
+
+    for size in range(1, len(payload) + 1):
+        decoder = ChartValuesDecoder()
+        for position in range(0, len(payload), size):
+            decoder.feed(payload[position:position + size])
+        header, decoded = decoder.close()
+
+        assert header == {'status': 'ok', 'name': 'Chart "values"', 'period': 'day'}
+        assert decoded.to_values() == values
+
+
+def test_decoder_rejects_unterminated_values():
+    decoder = ChartValuesDecoder()
+    decoder.feed(json.dumps({'values': VALUES}).encode('utf-8')[:-2])
+
+    with pytest.raises(ValueError):
+        decoder.close()
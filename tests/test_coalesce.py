@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from blockchain.coalesce import (AsyncSingleFlight, SingleFlight, canonical_url,
+                                 public_params, redact_url)
+
+
+def run_concurrently(flight, key, function, callers=4):
+    """
+    Run identical calls from threads released together.
+    """
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, function))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def wait_for_calls(flight, calls, timeout=5.0):
+    """
+    Wait until every caller joined the in-flight call.
+    """
+    deadline = time.monotonic() + timeout
+    while flight.stats['calls'] < calls and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    executions = []
+
+    def function():
+        executions.append(None)
+        started.set()
+        release.wait(5)
+        return {'status': 'ok'}
+
+    threads, results, errors = run_concurrently(flight, 'stats', function)
+    started.wait(5)
+    wait_for_calls(flight, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(executions) == 1
+    assert results == [{'status': 'ok'}] * 4
+    assert errors == []
+    assert flight.stats == {'calls': 4, 'executed': 1, 'coalesced': 3}
+
+
+def test_error_is_shared_and_later_calls_run_again():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def function():
+        started.set()
+        release.wait(5)
+        raise ValueError('Broken response')
+
+    threads, results, errors = run_concurrently(flight, 'stats', function, callers=3)
+    started.wait(5)
+    wait_for_calls(flight, 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == []
+    assert [str(error) for error in errors] == ['Broken response'] * 3
+    assert flight.do('stats', lambda: 'retried') == 'retried'
+    assert flight.stats['executed'] == 2
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+
+    assert flight.do('stats', lambda: 1) == 1
+    assert flight.do('pools', lambda: 2) == 2
+    assert flight.stats == {'calls': 2, 'executed': 2, 'coalesced': 0}
+
+
+def test_concurrent_identical_tasks_share_one_execution():
+    flight = AsyncSingleFlight()
+    executions = []
+
+    async def function():
+        executions.append(None)
+        await asyncio.sleep(0.01)
+        return {'status': 'ok'}
+
+    async def call_all():
+        return await asyncio.gather(*[flight.do('stats', function) for _ in range(4)])
+
+    assert asyncio.run(call_all()) == [{'status': 'ok'}] * 4
+    assert len(executions) == 1
+    assert flight.stats == {'calls': 4, 'executed': 1, 'coalesced': 3}
+
+
+def test_cancelled_waiter_does_not_cancel_shared_task():
+    flight = AsyncSingleFlight()
+
+    async def function():
+        await asyncio.sleep(0.02)
+        return 'done'
+
+    async def call_all():
+        first = asyncio.ensure_future(flight.do('stats', function))
+        waiter = asyncio.ensure_future(flight.do('stats', function))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await first
+
+    assert asyncio.run(call_all()) == 'done'
+
+
+def test_identical_requests_share_key_without_secrets():
+    url = 'http://localhost/charts/market-price'
+
+    assert canonical_url(url, {'timespan': 'all', 'format': 'json'}) == \
+        canonical_url(url, {'format': 'json', 'timespan': 'all'})
+    assert canonical_url(url) == url
+    assert public_params({'timespan': 'all', 'api_code': 'secret'}) == {'timespan': 'all'}
+    assert redact_url(url + '?api_code=secret&timespan=all') == url + '?timespan=all'
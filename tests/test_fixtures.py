@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import gzip
+import json
+
+import fixtures
+
+from blockchain import settings
+
+from conftest import FaultInjectingHandler
+
+
+def test_recorded_fixtures_load_without_api_key(stub, tmp_path, monkeypatch):
+    monkeypatch.setenv('API_KEY', 'SECRET-KEY')
+    monkeypatch.setattr(FaultInjectingHandler, 'points', 30)
+    path = str(tmp_path / 'fixtures.ndjson.gz')
+
+    assert fixtures.record(path, base_url=stub) == len(settings.CHARTS) + 2
+
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        content = archive.read()
+    assert 'SECRET-KEY' not in content
+    assert all('api_code' not in json.loads(line)['params'] for line in content.splitlines())
+
+    bodies = fixtures.load(path)
+    assert sorted(bodies) == sorted(['charts/{}'.format(chart) for chart in settings.CHARTS]
+                                    + ['stats', 'pools'])
+    chart = json.loads(bodies['charts/market-price'])
+    assert chart['status'] == 'ok'
+    assert len(chart['values']) == 30
+    assert fixtures.checksum(bodies) == fixtures.checksum(fixtures.load(path))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import time
+
+import pytest
+
+from blockchain.exceptions import JSONFileWriterPipelineError
+from blockchain.pipelines import JSONFileWriterPipeline
+
+from conftest import chart_document, stats_document
+
+
+@pytest.fixture(params=['json', 'ndjson'])
+def writer(request, tmp_path):
+    """
+    Get JSON file writer pipeline in every format.
+    """
+    return JSONFileWriterPipeline(str(tmp_path / 'history.json'), fmt=request.param)
+
+
+def test_ndjson_writes_one_compact_object_per_line(tmp_path):
+    filepath = tmp_path / 'history.json'
+    writer = JSONFileWriterPipeline(str(filepath), fmt='ndjson')
+    documents = [chart_document('market-price', points=3), stats_document()]
+
+    assert writer.write_many(documents) == 2
+
+    lines = filepath.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == documents
+    assert all(': ' not in line and ', ' not in line for line in lines)
+
+
+def test_records_are_read_back_in_written_order(writer):
+    documents = [chart_document('market-price', points=2), stats_document(),
+                 chart_document('hash-rate', points=2)]
+    writer.write(documents[0])
+    writer.write_many(documents[1:])
+
+    assert list(writer.iter_records()) == documents
+    assert writer.read() == documents
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(JSONFileWriterPipelineError):
+        JSONFileWriterPipeline(str(tmp_path / 'history.json'), fmt='csv')
+
+
+def test_read_filters_indexed_records_by_slug_and_timestamp(writer, monkeypatch):
+    old, new = chart_document('market-price', points=1), chart_document('market-price')
+    monkeypatch.setattr(time, 'time', lambda: 1000.0)
+    writer.write_many([old, stats_document()])
+    monkeypatch.setattr(time, 'time', lambda: 2000.0)
+    writer.write_many([new, chart_document('hash-rate')])
+
+    assert writer.read(slug=old['_slug']) == [old, new]
+    assert writer.read(slug=old['_slug'], since=1500) == [new]
+    assert writer.read(since=2000) == [new, chart_document('hash-rate')]
+    assert writer.read(slug='missing') == []
+    assert writer.latest(old['_slug']) == new
+    assert writer.latest('missing') is None
+
+
+def test_index_picks_up_records_appended_by_other_writer(writer):
+    first, second = chart_document('market-price', points=1), chart_document('market-price')
+    writer.write(first)
+    assert writer.latest(first['_slug']) == first
+
+    other = JSONFileWriterPipeline(writer._file, fmt=writer._format)
+    other.write(second)
+
+    assert writer.latest(first['_slug']) == second
+
+
+def test_rebuilt_index_matches_written_index(tmp_path):
+    filepath = tmp_path / 'history.json'
+    writer = JSONFileWriterPipeline(str(filepath), fmt='ndjson')
+    documents = [chart_document('market-price'), stats_document()]
+    writer.write_many(documents)
+    (tmp_path / 'history.json.idx').unlink()
+
+    writer.rebuild_index()
+
+    assert writer.read(slug=documents[1]['_slug']) == [documents[1]]
+    assert writer.read(since=0) == documents
+
+
+def test_index_is_only_rebuilt_for_ndjson(tmp_path):
+    writer = JSONFileWriterPipeline(str(tmp_path / 'history.json'))
+    writer.write(stats_document())
+
+    with pytest.raises(JSONFileWriterPipelineError):
+        writer.rebuild_index()
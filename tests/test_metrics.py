@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import logging
+import socket
+
+from blockchain import api
+from blockchain.api import BlockchainAPIHttpRequest
+from blockchain.metrics import MetricsRegistry, PrometheusExporter
+
+
+def test_exporter_on_busy_port_does_not_stop_registry():
+    busy = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    busy.bind(('127.0.0.1', 0))
+    busy.listen(1)
+    registry = MetricsRegistry()
+    registry._exporter = PrometheusExporter(registry, *busy.getsockname())
+
+    try:
+        registry.start()
+        registry.inc('http_requests_total', resource='charts')
+    finally:
+        registry.stop()
+        busy.close()
+
+    assert 'blockchain_http_requests_total' in registry.render()
+
+
+def test_disabled_metrics_never_compute_labels(stub, monkeypatch):
+    def labels(request):
+        raise AssertionError('labels computed with metrics disabled')
+
+    monkeypatch.setattr(MetricsRegistry, '_shared', MetricsRegistry(enabled=False))
+    monkeypatch.setattr(BlockchainAPIHttpRequest, 'labels', property(labels))
+    url = '{}charts/market-price'.format(stub)
+
+    _, response = BlockchainAPIHttpRequest(url, {'timespan': 'all'}).fetch_json_response()
+    _, header, columns = BlockchainAPIHttpRequest(url, {'timespan': 'all'}, resource='charts') \
+        .fetch_columnar_response()
+
+    assert response['status'] == header['status'] == 'ok'
+    assert len(columns) == len(response['values'])
+
+
+def test_transfer_stats_are_logged_at_debug_only(stub, caplog, monkeypatch):
+    url = '{}charts/market-price'.format(stub)
+    # Module loggers are disabled by fileConfig calls of modules imported later
+    monkeypatch.setattr(api.logger, 'disabled', False)
+
+    with caplog.at_level(logging.DEBUG, logger='blockchain.api'):
+        request = BlockchainAPIHttpRequest(url, {'timespan': 'all'})
+        request.fetch_json_response()
+
+    transfers = [record for record in caplog.records if record.msg.startswith('Transfer')]
+    assert [record.levelno for record in transfers] == [logging.DEBUG]
+    assert request.transfer['decompressed'] > 0
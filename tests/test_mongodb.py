@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import copy
+
+import pytest
+
+from blockchain.digest import DIGEST_FIELD, digest
+from blockchain.pipelines import MongoDBPipeline
+
+from conftest import START, chart_document, stats_document
+
+
+def stored(mongo, slug):
+    """
+    Get stored document without MongoDB id.
+    """
+    return mongo.collection.find_one({'_slug': slug}, {'_id': 0})
+
+
+def test_persist_many_upserts_new_documents(mongo):
+    documents = [chart_document('market-price'), stats_document()]
+
+    summary = mongo.persist_many(copy.deepcopy(documents))
+
+    assert summary == {'matched': 0, 'modified': 0, 'upserted': 2, 'skipped': 0}
+    assert mongo.collection.count_documents({}) == 2
+    for data in documents:
+        document = stored(mongo, data['_slug'])
+        assert document.pop(DIGEST_FIELD) == digest(data)
+        assert document == data
+
+
+def test_persist_many_skips_unchanged_documents(mongo):
+    documents = [chart_document('market-price'), stats_document()]
+    mongo.persist_many(copy.deepcopy(documents))
+
+    summary = mongo.persist_many(copy.deepcopy(documents))
+
+    assert summary == {'matched': 0, 'modified': 0, 'upserted': 0, 'skipped': 2}
+
+
+def test_persist_many_writes_changed_and_new_documents_only(mongo):
+    documents = [chart_document('market-price'), chart_document('market-cap'),
+                 stats_document()]
+    mongo.persist_many(copy.deepcopy(documents))
+
+    changed = copy.deepcopy(documents)
+    changed[0]['values'][3]['y'] = 42.0
+    changed[0]['values'].append({'x': START + 10 * 86400, 'y': 10.0})
+    changed[2] = stats_document(n_tx=1)
+    changed.append(chart_document('hash-rate'))
+    summary = mongo.persist_many(copy.deepcopy(changed))
+
+    assert summary == {'matched': 2, 'modified': 2, 'upserted': 1, 'skipped': 1}
+    document = stored(mongo, changed[0]['_slug'])
+    assert document['values'] == changed[0]['values']
+    assert document[DIGEST_FIELD] == digest(changed[0])
+    assert stored(mongo, changed[2]['_slug'])['_values']['n_tx'] == 1
+    assert stored(mongo, 'hash-rate')['values'] == changed[3]['values']
+
+
+def test_persist_many_rejects_documents_with_missing_values(mongo):
+    data = chart_document('market-price')
+    data['unit'] = ''
+
+    with pytest.raises(ValueError):
+        mongo.persist_many([data])
+    assert mongo.collection.count_documents({}) == 0
+
+
+def test_persist_data_inserts_skips_and_updates(mongo):
+    data = stats_document()
+
+    assert mongo.persist_data(copy.deepcopy(data))[DIGEST_FIELD] == digest(data)
+    first = mongo.collection.find_one({'_slug': data['_slug']})
+    assert mongo.persist_data(copy.deepcopy(data)) is not None
+    assert mongo.collection.find_one({'_slug': data['_slug']}) == first
+
+    changed = stats_document(n_tx=1)
+    mongo.persist_data(copy.deepcopy(changed))
+    document = stored(mongo, data['_slug'])
+    assert document['_values']['n_tx'] == 1
+    assert document[DIGEST_FIELD] == digest(changed)
+
+
+def test_persist_data_writes_changed_and_appended_chart_values(mongo):
+    data = chart_document('market-price')
+    mongo.persist_data(copy.deepcopy(data))
+
+    changed = copy.deepcopy(data)
+    changed['values'][5]['y'] = 1.5
+    changed['values'].extend([{'x': START + 10 * 86400, 'y': 2.0},
+                              {'x': START + 11 * 86400, 'y': 3.0}])
+    mongo.persist_data(copy.deepcopy(changed))
+
+    document = stored(mongo, data['_slug'])
+    assert document['values'] == changed['values']
+    assert document[DIGEST_FIELD] == digest(changed)
+
+
+def test_persist_data_sets_whole_chart_when_values_do_not_line_up(mongo):
+    data = chart_document('market-price')
+    mongo.persist_data(copy.deepcopy(data))
+
+    shifted = chart_document('market-price', points=8, start=START + 3 * 86400)
+    mongo.persist_data(copy.deepcopy(shifted))
+
+    assert stored(mongo, data['_slug'])['values'] == shifted['values']
+
+
+def test_diff_update_sets_only_changed_and_new_values():
+    stored_values = [{'x': 1, 'y': 1.0}, {'x': 2, 'y': 2.0}]
+    data = {'_slug': 'chart', 'name': 'Chart',
+            'values': [{'x': 1, 'y': 1.0}, {'x': 2, 'y': 5.0}, {'x': 3, 'y': 3.0}]}
+
+    update = MongoDBPipeline._diff_update(data, stored_values)
+
+    assert update == {'$set': {'_slug': 'chart', 'name': 'Chart', 'values.1.y': 5.0,
+                               'values.2': {'x': 3, 'y': 3.0}}}
+
+
+def test_diff_update_sets_whole_chart_without_stored_values():
+    data = {'_slug': 'chart', 'values': [{'x': 1, 'y': 1.0}]}
+
+    assert MongoDBPipeline._diff_update(data, None) == {'$set': data}
+    assert MongoDBPipeline._diff_update(data, [{'x': 0, 'y': 1.0}]) == {'$set': data}
+
+
+def test_merge_data_appends_values_and_drops_digest(mongo):
+    data = chart_document('market-price')
+    mongo.persist_data(copy.deepcopy(data))
+    since = mongo.last_timestamp('market-price')
+
+    newer = chart_document('market-price', points=12)
+    mongo.merge_data(copy.deepcopy(newer), since)
+
+    document = stored(mongo, data['_slug'])
+    assert document['values'] == newer['values']
+    assert DIGEST_FIELD not in document
+    assert mongo.last_timestamp('market-price') == newer['values'][-1]['x']
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+
+import pytest
+
+from blockchain.resources.pools import BlockchainAPIPool
+
+POOLS = {'AntPool': 60, 'F2Pool': 30, 'BTC.com': 10}
+
+
+def test_pools_are_looked_up_by_exact_or_normalized_name():
+    pools = BlockchainAPIPool.start(POOLS)
+
+    assert pools.get_info('F2Pool') == {'pool': 'F2Pool', 'hashrate': 30}
+    assert pools.get_info('btc com') == {'pool': 'BTC.com', 'hashrate': 10}
+    assert pools.get_info('Unknown') == {}
+    assert pools._antpool == {'pool': 'AntPool', 'hashrate': 60}
+    with pytest.raises(AttributeError):
+        pools._unknown
+    with pytest.raises(AttributeError):
+        pools.antpool
+
+
+def test_aggregates_rank_and_share_hash_rate():
+    pools = BlockchainAPIPool(POOLS)
+
+    assert [record['pool'] for record in pools.top(2)] == ['AntPool', 'F2Pool']
+    assert pools.shares == {'AntPool': 60.0, 'F2Pool': 30.0, 'BTC.com': 10.0}
+    assert pools.herfindahl == pytest.approx(4600.0)
+    assert BlockchainAPIPool({'AntPool': 1}).herfindahl == 10000.0
+
+
+def test_aggregates_are_computed_once():
+    pools = BlockchainAPIPool(POOLS)
+    assert pools._ranking is None
+
+    shares = pools.shares
+    ranking = pools._ranking
+
+    assert pools.top(1) == ranking[:1]
+    assert pools.herfindahl == pytest.approx(4600.0)
+    assert pools._ranking is ranking
+    assert pools.shares is shares
+
+
+def test_pools_without_hash_rate_have_zero_shares():
+    pools = BlockchainAPIPool({'AntPool': 0, 'F2Pool': 0})
+
+    assert pools.shares == {'AntPool': 0.0, 'F2Pool': 0.0}
+    assert pools.herfindahl == 0.0
+    assert BlockchainAPIPool({}).top() == []
+
+
+def test_slots_keep_pools_instances_without_dict():
+    pools = BlockchainAPIPool(POOLS)
+
+    assert not hasattr(pools, '__dict__')
+    with pytest.raises(AttributeError):
+        pools.name = 'pools'
+    assert pools.pools == list(POOLS)
+    assert json.loads(pools.response) == POOLS
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import copy
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import START, chart_document, stats_document
+
+
+def count(postgres, query, params=None):
+    """
+    Get single value of count query.
+    """
+    with postgres.transaction() as cursor:
+        cursor.execute(postgres._sql(query), params)
+        return cursor.fetchone()[0]
+
+
+def test_persist_many_upserts_every_chart_value_once(postgres):
+    documents = [chart_document('market-price', points=10),
+                 chart_document('market-cap', points=20),
+                 chart_document('hash-rate', points=30), stats_document()]
+
+    summary = postgres.persist_many(copy.deepcopy(documents))
+
+    assert summary == {'persisted': 4, 'values': 60}
+    assert count(postgres, 'SELECT count(*) FROM {table}') == 4
+    assert count(postgres, 'SELECT count(*) FROM {points}') == 60
+    for data in documents[:3]:
+        assert postgres.find_range(data['_slug']) == data['values']
+        assert count(postgres, 'SELECT last_ts FROM {table} WHERE slug = %s',
+                     (data['_slug'],)) == data['values'][-1]['x']
+
+
+def test_persist_many_again_updates_without_duplicates(postgres):
+    documents = [chart_document('market-price', points=10),
+                 chart_document('market-cap', points=20)]
+    postgres.persist_many(copy.deepcopy(documents))
+
+    changed = copy.deepcopy(documents)
+    changed[0]['values'][4]['y'] = 42.0
+    summary = postgres.persist_many(copy.deepcopy(changed))
+
+    assert summary == {'persisted': 2, 'values': 30}
+    assert count(postgres, 'SELECT count(*) FROM {points}') == 30
+    assert postgres.find_range('market-price') == changed[0]['values']
+
+
+def test_persist_many_rejects_documents_with_missing_values(postgres):
+    data = chart_document('market-price')
+    data['unit'] = ''
+
+    with pytest.raises(ValueError):
+        postgres.persist_many([data])
+    assert count(postgres, 'SELECT count(*) FROM {table}') == 0
+
+
+def test_persist_data_and_merge_data(postgres):
+    data = chart_document('market-price', points=10)
+    assert postgres.persist_data(copy.deepcopy(data)) is not None
+    since = postgres.last_timestamp('market-price')
+    assert since == data['values'][-1]['x']
+
+    newer = chart_document('market-price', points=15)
+    assert postgres.merge_data(copy.deepcopy(newer), since) is not None
+
+    assert postgres.find_range('market-price') == newer['values']
+    assert postgres.last_timestamp('market-price') == newer['values'][-1]['x']
+    assert postgres.find_range('market-price', START + 86400, START + 2 * 86400) == \
+        newer['values'][1:3]
+
+
+def test_concurrent_writers_keep_every_value(postgres):
+    # More writers than pooled connections, each merging its own chart
+    charts = ['chart-{}'.format(number) for number in range(12)]
+    for chart in charts:
+        postgres.persist_data(chart_document(chart, points=50))
+
+    def merge(chart):
+        since = postgres.last_timestamp(chart)
+        return postgres.merge_data(chart_document(chart, points=80), since)
+
+    def persist_many(chart):
+        documents = [chart_document('{}-{}'.format(chart, number), points=40)
+                     for number in range(3)]
+        return postgres.persist_many(documents)
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        merged = list(executor.map(merge, charts))
+        summaries = list(executor.map(persist_many, charts))
+
+    assert None not in merged
+    assert summaries == [{'persisted': 3, 'values': 120}] * len(charts)
+    assert count(postgres, 'SELECT count(*) FROM {points}') == 12 * 80 + 12 * 120
+    for chart in charts:
+        assert postgres.find_range(chart) == chart_document(chart, points=80)['values']
+
+
+def test_closed_pipeline_is_unhealthy(postgres):
+    assert postgres.ping()
+
+    postgres.close_connection()
+
+    assert not postgres.ping()
+    postgres.open_connection()
+
+
+def test_charts_are_indexed_for_incremental_lookups(postgres):
+    query = 'SELECT indexdef FROM pg_indexes WHERE indexname = %s'
+
+    with postgres.transaction() as cursor:
+        cursor.execute(query, ('blockchain_test_chart_key',))
+        indexdef, = cursor.fetchone()
+
+    assert indexdef.startswith('CREATE UNIQUE INDEX')
+    assert indexdef.endswith('(chart)')
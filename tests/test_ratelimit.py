@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from blockchain.exceptions import BlockchainAPIRateLimitError
+from blockchain.ratelimit import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Freeze monotonic clock, moved forward by hand, and record sleeps.
+    """
+    now = [1000.0]
+    sleeps = []
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(time, 'sleep', sleeps.append)
+    return now, sleeps
+
+
+def test_bucket_allows_burst_then_spaces_calls_at_rate(clock):
+    _, sleeps = clock
+    bucket = TokenBucket(rate=2.0, capacity=3)
+
+    waits = [bucket.acquire() for _ in range(5)]
+
+    assert waits == [0.0, 0.0, 0.0, 0.5, 1.0]
+    assert sleeps == [0.5, 1.0]
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    now, _ = clock
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+
+    now[0] += 60.0
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 1.0]
+
+
+def test_bucket_rejects_incorrect_rate_or_capacity():
+    with pytest.raises(BlockchainAPIRateLimitError):
+        TokenBucket(rate=0)
+    with pytest.raises(BlockchainAPIRateLimitError):
+        TokenBucket(rate=1.0, capacity=0)
+
+
+def test_concurrent_threads_are_served_at_rate(clock):
+    bucket = TokenBucket(rate=4.0)
+    waits = []
+    threads = [threading.Thread(target=lambda: waits.append(bucket.acquire()))
+               for _ in range(4)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(waits) == [0.0, 0.25, 0.5, 0.75]
+
+
+def test_concurrent_tasks_are_served_at_rate():
+    # Event loop runs on the monotonic clock, which is not frozen here
+    bucket = TokenBucket(rate=50.0)
+
+    async def acquire_all():
+        return await asyncio.gather(*[bucket.acquire_async() for _ in range(4)])
+
+    started = time.monotonic()
+    waits = asyncio.run(acquire_all())
+
+    assert waits == pytest.approx([0.0, 0.02, 0.04, 0.06], abs=0.005)
+    assert time.monotonic() - started >= 0.06
+
+
+def test_limiter_keeps_a_bucket_per_api_key_and_resource(clock):
+    limiter = RateLimiter({'charts': 1.0, 'stats': 1.0}, keyed_rates={'charts': 10.0})
+
+    assert limiter.acquire(None, 'charts') == 0.0
+    assert limiter.acquire(None, 'charts') == 1.0
+    assert limiter.acquire(None, 'stats') == 0.0
+    assert limiter.acquire('key', 'charts') == 0.0
+    assert limiter.acquire('key', 'charts') == pytest.approx(0.1)
+    assert limiter.bucket(None, 'charts') is limiter.bucket(None, 'charts')
+    with pytest.raises(BlockchainAPIRateLimitError):
+        limiter.acquire('key', 'stats')
+
+
+def test_disabled_limiter_never_waits():
+    limiter = RateLimiter({'charts': 1.0}, enabled=False)
+
+    async def acquire_async():
+        return await limiter.acquire_async(None, 'charts')
+
+    assert [limiter.acquire(None, 'charts') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert asyncio.run(acquire_async()) == 0.0
+    assert limiter._buckets == {}
+
+
+def test_limiter_config_reads_rates(tmp_path):
+    filename = tmp_path / 'blockchain.cfg'
+    filename.write_text('[ratelimit]\nenabled=true\nburst=2\ncharts=0.5\nstats=1\npools=1\n'
+                        'keyed_charts=5\nkeyed_stats=10\nkeyed_pools=10\n')
+
+    limiter = RateLimiter.config(str(filename))
+
+    assert limiter.bucket(None, 'charts')._rate == 0.5
+    assert limiter.bucket('key', 'stats')._rate == 10.0
+    assert limiter.bucket(None, 'pools')._capacity == 2.0
+    with pytest.raises(BlockchainAPIRateLimitError):
+        RateLimiter.config(str(filename), section='missing')
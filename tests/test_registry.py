@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from blockchain.registry import PipelineRegistry
+
+
+class FakePipeline(object):
+    """
+    Pipeline recording its connection state.
+    """
+
+    healthy = True
+
+    @classmethod
+    def config(cls):
+        return cls()
+
+    def open_connection(self):
+        self.open = True
+
+    def close_connection(self):
+        self.open = False
+
+    def ping(self):
+        return self.healthy
+
+
+def registry():
+    """
+    Get registry serving fake pipelines.
+    """
+    pipelines = PipelineRegistry()
+    pipelines.PIPELINES = {'fake': FakePipeline}
+    return pipelines
+
+
+def test_health_check_closes_idle_unhealthy_pipeline():
+    pipelines = registry()
+    pipeline = pipelines.get('fake')
+    pipeline.healthy = False
+
+    assert pipelines.health_check() == {'fake': False}
+    assert pipeline.open is False
+    assert pipelines.get('fake') is not pipeline
+
+
+def test_health_check_keeps_leased_pipeline_open_until_released():
+    pipelines = registry()
+    with pipelines.lease('fake') as pipeline:
+        pipeline.healthy = False
+        assert pipelines.health_check() == {'fake': False}
+        assert pipeline.open is True
+
+        with pipelines.lease('fake') as replacement:
+            assert replacement is not pipeline
+            assert replacement.open is True
+        assert replacement.open is True
+        assert pipeline.open is True
+
+    assert pipeline.open is False
+    assert pipelines.get('fake') is replacement
+
+
+def test_nested_leases_release_pipeline_once():
+    pipelines = registry()
+    with pipelines.lease('fake') as pipeline:
+        with pipelines.lease('fake') as same:
+            assert same is pipeline
+        pipeline.healthy = False
+        pipelines.health_check()
+        assert pipeline.open is True
+    assert pipeline.open is False
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import configparser
+import gzip
+import json
+
+import pytest
+
+from blockchain.api import BlockchainAPIClient, BlockchainAPIHttpRequest
+from blockchain.cache import ResponseCache
+from blockchain.exceptions import BlockchainAPIReplayError
+from blockchain.replay import ReplayArchive
+from blockchain.retry import RetryPolicy
+from blockchain.session import BlockchainAPISession
+
+from conftest import FaultInjectingHandler, chart_document
+
+
+def archived(path):
+    """
+    Read archive entries in recorded order.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        return [json.loads(line) for line in archive]
+
+
+def record(archive, url, body):
+    """
+    Archive chart response with given json body.
+    """
+    archive.record(url, {'timespan': 'all'}, 200, {'Content-Type': 'application/json'},
+                   json.dumps(body).encode('utf-8'), 0.01)
+
+
+def fetch(session, url):
+    """
+    Fetch chart through session, keyed as a client would.
+    """
+    params = {'timespan': 'all', 'api_code': 'secret'}
+    return BlockchainAPIHttpRequest(url, params, session).fetch_json_response()
+
+
+@pytest.fixture
+def session():
+    """
+    Get session retrying broken bodies without delay.
+    """
+    retry = RetryPolicy(retries=2, backoff_factor=0.0, jitter=False)
+    http_session = BlockchainAPISession(read_timeout=2.0, retry=retry)
+    yield http_session
+    http_session.close()
+
+
+def test_record_archives_responses_without_secrets(stub, session, tmp_path):
+    path = str(tmp_path / 'replay.ndjson.gz')
+    archive = ReplayArchive(path, mode='record')
+    url = '{}charts/market-price'.format(stub)
+
+    _, response = fetch(archive.wrap(session), url)
+    archive.close()
+
+    entry, = archived(path)
+    assert entry['url'] == url
+    assert entry['params'] == {'timespan': 'all'}
+    assert entry['status'] == 200
+    assert json.loads(entry['body']) == response
+    assert 'secret' not in json.dumps(entry)
+
+
+def test_record_retries_body_broken_off(stub, session, tmp_path):
+    path = str(tmp_path / 'replay.ndjson.gz')
+    archive = ReplayArchive(path, mode='record')
+    FaultInjectingHandler.inject('truncate')
+
+    _, response = fetch(archive.wrap(session), '{}charts/market-price'.format(stub))
+    archive.close()
+
+    assert response['status'] == 'ok'
+    assert [json.loads(entry['body']) for entry in archived(path)] == [response]
+
+
+def test_replay_serves_archived_responses_without_network(stub, session, tmp_path):
+    path = str(tmp_path / 'replay.ndjson.gz')
+    archive = ReplayArchive(path, mode='record')
+    url = '{}charts/market-price'.format(stub)
+    _, recorded = fetch(archive.wrap(session), url)
+    archive.close()
+    FaultInjectingHandler.inject(500, 500, 500, 500)
+
+    request_url, replayed = fetch(ReplayArchive(path, mode='replay').wrap(), url)
+
+    assert replayed == recorded
+    assert request_url.startswith(url)
+    assert FaultInjectingHandler.faults == [500, 500, 500, 500]
+
+
+def test_replay_cycles_through_repeated_responses(tmp_path):
+    path = str(tmp_path / 'replay.ndjson.gz')
+    url = 'http://localhost/charts/market-price'
+    archive = ReplayArchive(path, mode='record')
+    record(archive, url, {'status': 'ok', 'round': 1})
+    record(archive, url, {'status': 'ok', 'round': 2})
+    archive.close()
+
+    session = ReplayArchive(path, mode='replay').wrap()
+
+    assert [fetch(session, url)[1]['round'] for _ in range(5)] == [1, 2, 1, 2, 1]
+    with pytest.raises(BlockchainAPIReplayError) as error:
+        fetch(session, 'http://localhost/charts/hash-rate')
+    assert error.value.code == 404
+
+
+def test_replaying_client_bypasses_response_cache(tmp_path, monkeypatch):
+    path = str(tmp_path / 'replay.ndjson.gz')
+    archive = ReplayArchive(path, mode='record')
+    url = 'http://localhost/charts/market-price'
+    for position in range(2):
+        data = chart_document('market-price', points=position + 1)
+        record(archive, url, {key: value for key, value in data.items()
+                              if not key.startswith('_')})
+    archive.close()
+
+    parser = configparser.ConfigParser()
+    parser.read('blockchain.cfg')
+    parser.set('api', 'base_url', 'http://localhost/')
+    parser.set('cache', 'enabled', 'true')
+    parser.set('replay', 'mode', 'replay')
+    parser.set('replay', 'path', path)
+    filename = str(tmp_path / 'blockchain.cfg')
+    with open(filename, 'w') as file:
+        parser.write(file)
+    for shared in (ReplayArchive, ResponseCache, BlockchainAPISession):
+        monkeypatch.setattr(shared, '_shared', None)
+
+    client = BlockchainAPIClient.config('charts', filename)
+    lengths = [len(client.call(chart='market-price', timespan='all').response['values'])
+               for _ in range(3)]
+
+    assert lengths == [1, 2, 1]
+    assert ResponseCache._shared is None
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import pytest
+
+from blockchain.api import RESOURCE_CLASSES, BlockchainAPIHttpResponse
+from blockchain.resources.charts import BlockchainAPIChart, ChartColumns
+from blockchain.resources.pools import BlockchainAPIPool
+from blockchain.resources.stats import BlockchainAPIStatistics
+
+from conftest import START
+
+URL = 'http://localhost/charts/market-price'
+
+PAYLOAD = {'status': 'ok', 'name': 'Market Price (USD)', 'unit': 'USD', 'period': 'day',
+           'description': 'Price', 'values': [{'x': START, 'y': 6500.0}]}
+
+
+def test_resource_classes_are_resolved_once():
+    assert RESOURCE_CLASSES == {'charts': BlockchainAPIChart, 'stats': BlockchainAPIStatistics,
+                                'pools': BlockchainAPIPool}
+
+
+def test_resource_is_built_on_first_access_only(monkeypatch):
+    built = []
+    start = BlockchainAPIChart.start.__func__
+
+    def counted_start(cls, *args):
+        built.append(args)
+        return start(cls, *args)
+
+    monkeypatch.setattr(BlockchainAPIChart, 'start', classmethod(counted_start))
+    http_response = BlockchainAPIHttpResponse('charts', URL, PAYLOAD)
+
+    assert http_response.response['_chart'] == 'market-price'
+    assert 'charts' not in vars(http_response)
+    assert built == []
+
+    chart = http_response.charts
+
+    assert http_response.charts is chart
+    assert vars(http_response)['charts'] is chart
+    assert chart.name == 'Market Price (USD)'
+    assert len(built) == 1
+
+
+def test_only_resource_named_after_data_is_built():
+    http_response = BlockchainAPIHttpResponse('stats', 'http://localhost/stats', {'n_tx': 1})
+
+    with pytest.raises(AttributeError):
+        http_response.charts
+    with pytest.raises(AttributeError):
+        BlockchainAPIHttpResponse('blocks', 'http://localhost/blocks', {}).blocks
+    assert http_response.stats.__class__ is BlockchainAPIStatistics
+
+
+def test_columnar_response_builds_resource_from_columns():
+    header = {key: value for key, value in PAYLOAD.items() if key != 'values'}
+    columns = ChartColumns.from_values(PAYLOAD['values'])
+    http_response = BlockchainAPIHttpResponse('charts', URL, header, columns)
+
+    assert http_response.charts.columns is columns
+    assert http_response.response['values'] == PAYLOAD['values']
+
+
+def test_response_document_leaves_parsed_response_untouched():
+    payload = dict(PAYLOAD)
+    http_response = BlockchainAPIHttpResponse('charts', URL, payload)
+
+    document = http_response.response
+
+    assert document['_slug'] == 'market-price-usd'
+    assert 'status' not in document
+    assert payload == PAYLOAD
+    assert BlockchainAPIHttpResponse('pools', 'http://localhost/pools', {'AntPool': 10}) \
+        .response == {'_name': 'Pools', '_values': {'AntPool': 10}, '_slug': 'pools'}
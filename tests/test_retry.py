@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import time
+
+import pytest
+
+from blockchain.api import BlockchainAPIHttpRequest
+from blockchain.exceptions import (BlockchainAPICircuitOpenError,
+                                   BlockchainAPIHttpRequestError,
+                                   BlockchainAPIStreamError)
+from blockchain.retry import CircuitBreaker, RetryAttempts, RetryPolicy
+from blockchain.session import BlockchainAPISession
+
+from conftest import FaultInjectingHandler
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """
+    Record backoff delays instead of sleeping them.
+    """
+    waited = []
+    monkeypatch.setattr(time, 'sleep', waited.append)
+    return waited
+
+
+def session(retries=3, breaker=None):
+    """
+    Get session retrying without jitter, so delays are predictable.
+    """
+    retry = RetryPolicy(retries=retries, backoff_factor=0.1, max_backoff=5.0, jitter=False)
+    return BlockchainAPISession(read_timeout=2.0, retry=retry, breaker=breaker)
+
+
+def fetch(stub, http_session):
+    """
+    Fetch stub chart through session.
+    """
+    url = '{}charts/market-price'.format(stub)
+    return BlockchainAPIHttpRequest(url, {'timespan': 'all'}, http_session).fetch_json_response()
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert RetryPolicy.parse_retry_after('3') == 3.0
+    assert RetryPolicy.parse_retry_after('-1') == 0.0
+    assert RetryPolicy.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert RetryPolicy.parse_retry_after('soon') is None
+    assert RetryPolicy.parse_retry_after(None) is None
+
+
+def test_backoff_honors_retry_after_up_to_max_backoff():
+    retry = RetryPolicy(backoff_factor=0.5, max_backoff=4.0, jitter=False)
+
+    assert [retry.backoff(attempt) for attempt in range(5)] == [0.5, 1.0, 2.0, 4.0, 4.0]
+    assert retry.backoff(0, '2') == 2.0
+    assert retry.backoff(0, '120') == 4.0
+
+
+def test_retryable_statuses_are_retried_until_success(stub, delays):
+    FaultInjectingHandler.inject(503, 503)
+
+    _, response = fetch(stub, session())
+
+    assert response['status'] == 'ok'
+    assert delays == [0.1, 0.2]
+    assert FaultInjectingHandler.faults == []
+
+
+def test_retry_after_header_sets_delay(stub, delays):
+    FaultInjectingHandler.inject(429, retry_after='2')
+
+    _, response = fetch(stub, session())
+
+    assert response['status'] == 'ok'
+    assert delays == [2.0]
+
+
+def test_retry_budget_is_bounded(stub, delays):
+    FaultInjectingHandler.inject(503, 503, 503, 503, 503)
+
+    with pytest.raises(BlockchainAPIHttpRequestError) as error:
+        fetch(stub, session(retries=3))
+
+    assert error.value.code == 503
+    assert delays == [0.1, 0.2, 0.4]
+    assert FaultInjectingHandler.faults == [503]
+
+
+def test_client_errors_are_not_retried(stub, delays):
+    FaultInjectingHandler.inject(404, 404)
+
+    with pytest.raises(BlockchainAPIHttpRequestError) as error:
+        fetch(stub, session())
+
+    assert error.value.code == 404
+    assert delays == []
+
+
+def test_connection_reset_is_retried(stub, delays):
+    FaultInjectingHandler.inject('reset')
+
+    _, response = fetch(stub, session())
+
+    assert response['status'] == 'ok'
+    assert delays == [0.1]
+
+
+def test_body_broken_off_while_streaming_is_retried(stub, delays):
+    FaultInjectingHandler.inject('truncate')
+
+    _, response = fetch(stub, session())
+
+    assert response['status'] == 'ok'
+    assert delays == [0.1]
+
+
+def test_body_broken_off_past_retry_budget_is_wrapped(stub, delays):
+    FaultInjectingHandler.inject('truncate', 'truncate', 'truncate')
+
+    with pytest.raises(BlockchainAPIStreamError):
+        fetch(stub, session(retries=2))
+
+    assert delays == [0.1, 0.2]
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.allow() == (True, False)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() == (False, False)
+
+    breaker._opened_at -= 60.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() == (True, True)
+    assert breaker.allow() == (False, False)
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() == (True, False)
+
+
+def test_breaker_failed_trial_opens_circuit_again():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60.0)
+    breaker.record_failure()
+    breaker._opened_at -= 60.0
+    assert breaker.allow() == (True, True)
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() == (False, False)
+
+
+def test_only_trial_holder_releases_trial_call():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60.0)
+    breaker.record_failure()
+    breaker._opened_at -= 60.0
+
+    with RetryAttempts('trial', breaker=breaker):
+        with pytest.raises(BlockchainAPICircuitOpenError):
+            with RetryAttempts('rejected', breaker=breaker):
+                pass
+        assert breaker.allow() == (False, False)
+    assert breaker.allow() == (True, True)
+
+
+def test_recorded_trial_is_not_released():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60.0)
+    breaker.record_failure()
+    breaker._opened_at -= 60.0
+
+    with RetryAttempts('trial', breaker=breaker) as attempts:
+        attempts.record(False)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() == (False, False)
+
+
+def test_session_short_circuits_once_upstream_keeps_failing(stub, delays):
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60.0)
+    FaultInjectingHandler.inject(500, 500, 500, 500)
+
+    with pytest.raises(BlockchainAPICircuitOpenError):
+        fetch(stub, session(retries=3, breaker=breaker))
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert FaultInjectingHandler.faults == [500, 500]
+
+
+def test_trial_call_is_released_on_unexpected_error(stub, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60.0)
+    breaker.record_failure()
+    breaker._opened_at -= 60.0
+    http_session = session(breaker=breaker)
+
+    def broken_get(*args, **kwargs):
+        raise RuntimeError('unexpected')
+
+    monkeypatch.setattr(http_session._session, 'get', broken_get)
+    with pytest.raises(RuntimeError):
+        fetch(stub, http_session)
+    monkeypatch.undo()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    _, response = fetch(stub, http_session)
+    assert response['status'] == 'ok'
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+
+def test_unexpected_error_of_other_caller_keeps_trial_reserved():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60.0)
+
+    # Slow call let through while closed ends after circuit half-opened
+    with pytest.raises(RuntimeError):
+        with RetryAttempts('slow', breaker=breaker):
+            breaker.record_failure()
+            breaker._opened_at -= 60.0
+            assert breaker.allow() == (True, True)
+            raise RuntimeError('unexpected')
+
+    assert breaker.allow() == (False, False)
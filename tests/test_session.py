@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import time
+
+import pytest
+
+from blockchain.api import BlockchainAPIHttpRequest
+from blockchain.exceptions import BlockchainAPIHttpRequestError
+from blockchain.session import BlockchainAPISession
+
+from conftest import FaultInjectingHandler
+from stub_server import StubHandler, start_server
+
+
+class ConnectionRecordingHandler(StubHandler):
+    """
+    Serve stub responses recording client port of every request.
+    """
+    ports = []
+
+    def do_GET(self):
+        self.ports.append(self.client_address[1])
+        return super().do_GET()
+
+
+@pytest.fixture
+def recording():
+    """
+    Get base url of a stub server recording client connections.
+    """
+    ConnectionRecordingHandler.ports = []
+    server, base_url = start_server(handler=ConnectionRecordingHandler)
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(base_url, session, data='stats'):
+    """
+    Fetch stub data through session.
+    """
+    return BlockchainAPIHttpRequest(base_url + data, {}, session).fetch_json_response()
+
+
+def test_keep_alive_requests_reuse_pooled_connection(recording):
+    session = BlockchainAPISession()
+    try:
+        for data in ('stats', 'pools', 'charts/market-price'):
+            fetch(recording, session, data)
+    finally:
+        session.close()
+
+    assert len(ConnectionRecordingHandler.ports) == 3
+    assert len(set(ConnectionRecordingHandler.ports)) == 1
+
+
+def test_requests_without_keep_alive_open_new_connections(recording):
+    session = BlockchainAPISession(keep_alive=False)
+    try:
+        for _ in range(3):
+            fetch(recording, session)
+    finally:
+        session.close()
+
+    assert len(set(ConnectionRecordingHandler.ports)) == 3
+
+
+def test_pool_size_is_applied_to_mounted_adapters():
+    session = BlockchainAPISession(pool_connections=2, pool_maxsize=24, pool_block=True)
+
+    for prefix in ('http://', 'https://'):
+        adapter = session._session.get_adapter(prefix)
+        assert adapter._pool_connections == 2
+        assert adapter._pool_maxsize == 24
+        assert adapter._pool_block is True
+
+
+def test_read_timeout_bounds_hung_request(stub, monkeypatch):
+    monkeypatch.setattr(FaultInjectingHandler, 'hang', 2.0)
+    FaultInjectingHandler.inject('hang')
+    session = BlockchainAPISession(connect_timeout=1.0, read_timeout=0.2)
+
+    started = time.perf_counter()
+    with pytest.raises(BlockchainAPIHttpRequestError):
+        fetch(stub, session)
+
+    assert time.perf_counter() - started < 1.5
+    session.close()
+
+
+def test_configured_session_is_shared_until_closed(monkeypatch):
+    monkeypatch.setattr(BlockchainAPISession, '_shared', None)
+
+    session = BlockchainAPISession.shared()
+
+    assert BlockchainAPISession.shared() is session
+    assert session._timeout == (5.0, 30.0)
+    BlockchainAPISession.close_shared()
+    assert BlockchainAPISession._shared is None
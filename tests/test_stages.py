@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import copy
+
+from pymongo.errors import PyMongoError
+
+from blockchain.stages import IncrementalSink, StagedPipeline
+
+from conftest import chart_document, stats_document
+
+
+class FakeResponse(object):
+    """
+    Fetched response holding an already normalized document.
+    """
+
+    def __init__(self, document):
+        self.response = document
+
+
+class FakeSink(object):
+    """
+    Sink recording persisted batches and returning a fixed summary.
+    """
+
+    def __init__(self, summary=True):
+        self.summary = summary
+        self.batches = []
+
+    def persist_many(self, documents):
+        self.batches.append(documents)
+        if self.summary is True:
+            return {'persisted': len(documents)}
+        return self.summary
+
+
+def run(sink, documents, batch_size=8):
+    """
+    Run staged pipeline over documents, one spec each, in a single batch.
+    """
+    specs = [('charts', {'position': position}) for position in range(len(documents))]
+
+    def fetcher(data, position):
+        return FakeResponse(copy.deepcopy(documents[position]))
+
+    pipeline = StagedPipeline(sink, fetcher, fetchers=1, batch_size=batch_size,
+                              flush_interval=60)
+    return pipeline.run(specs)
+
+
+def test_invalid_document_does_not_drop_its_batch():
+    invalid = chart_document('market-cap')
+    invalid['unit'] = ''
+    documents = [chart_document('market-price'), invalid, stats_document()]
+    sink = FakeSink()
+
+    summary = run(sink, documents)
+
+    assert [data['_slug'] for batch in sink.batches for data in batch] == \
+        [documents[0]['_slug'], documents[2]['_slug']]
+    assert summary['normalized'] == 2
+    assert summary['persisted'] == 2
+    assert summary['failed'] == 1
+
+
+def test_failed_batch_is_not_counted_as_persisted():
+    summary = run(FakeSink(summary=None), [chart_document('market-price'), stats_document()])
+
+    assert summary['persisted'] == 0
+    assert summary['failed'] == 2
+    assert summary['batches'] == 1
+
+
+def test_partially_persisted_batch_counts_the_rest_as_failed():
+    documents = [chart_document('market-price'), chart_document('market-cap'), stats_document()]
+
+    summary = run(FakeSink(summary={'persisted': 1}), documents)
+
+    assert summary['persisted'] == 1
+    assert summary['failed'] == 2
+
+
+def test_mongodb_sink_summary_counts_every_document(mongo):
+    invalid = chart_document('hash-rate')
+    invalid['name'] = ''
+    documents = [chart_document('market-price'), chart_document('market-cap'), invalid]
+
+    summary = run(mongo, documents, batch_size=2)
+
+    assert summary['persisted'] == 2
+    assert summary['failed'] == 1
+    assert summary['batches'] == 1
+    assert mongo.collection.count_documents({}) == 2
+
+
+def test_mongodb_sink_failure_counts_batch_as_failed(mongo, monkeypatch):
+    def bulk_write(*args, **kwargs):
+        raise PyMongoError('connection lost')
+
+    monkeypatch.setattr(mongo.collection, 'bulk_write', bulk_write)
+    summary = run(mongo, [chart_document('market-price'), stats_document()])
+
+    assert summary['persisted'] == 0
+    assert summary['failed'] == 2
+
+
+def test_incremental_sink_merges_stored_charts_and_persists_new_ones(mongo):
+    mongo.persist_data(chart_document('market-price', points=5))
+    since = {'market-price': mongo.last_timestamp('market-price'), 'market-cap': None}
+    documents = [chart_document('market-price', points=8), chart_document('market-cap')]
+
+    summary = run(IncrementalSink(mongo, since), documents)
+
+    assert summary['persisted'] == 2
+    assert summary['failed'] == 0
+    stored = mongo.collection.find_one({'_slug': 'market-price'})
+    assert [value['x'] for value in stored['values']] == \
+        [value['x'] for value in documents[0]['values']]
+    assert mongo.last_timestamp('market-cap') == documents[1]['values'][-1]['x']
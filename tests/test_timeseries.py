@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import copy
+
+from pymongo.errors import PyMongoError
+
+from blockchain.digest import DIGEST_FIELD, digest
+
+from conftest import START, chart_document as document
+
+# Ten daily values per bucket, charts start on a bucket boundary
+SPAN = 864000
+FIRST = START - START % SPAN
+
+
+def chart_document(chart, points):
+    """
+    Get chart document starting on a bucket boundary.
+    """
+    return document(chart, points=points, start=FIRST)
+
+
+def buckets(timeseries, slug):
+    """
+    Get stored buckets by start timestamp without MongoDB id.
+    """
+    return {bucket['_bucket']: bucket
+            for bucket in timeseries.points.find({'_slug': slug}, {'_id': 0})}
+
+
+def test_persist_data_splits_values_on_bucket_boundaries(timeseries):
+    data = chart_document('market-price', points=25)
+
+    assert timeseries.persist_data(copy.deepcopy(data)) is not None
+
+    stored = buckets(timeseries, 'market-price')
+    assert sorted(stored) == [FIRST, FIRST + SPAN, FIRST + 2 * SPAN]
+    assert [len(bucket['points']) for _, bucket in sorted(stored.items())] == [10, 10, 5]
+    assert stored[FIRST + SPAN]['first'] == FIRST + SPAN
+    assert stored[FIRST + SPAN]['last'] == FIRST + SPAN + 9 * 86400
+    metadata = timeseries.collection.find_one({'_slug': 'market-price'}, {'_id': 0})
+    assert 'values' not in metadata
+    assert metadata['_last'] == data['values'][-1]['x']
+    assert metadata[DIGEST_FIELD] == digest(data)
+
+
+def tamper(timeseries, bucket):
+    """
+    Change first stored point of bucket behind the pipeline back.
+    """
+    timeseries.points.update_one({'_slug': 'market-price', '_bucket': bucket},
+                                 {'$set': {'points.{}'.format(bucket): -1.0}})
+
+
+def test_persist_data_skips_unchanged_chart(timeseries):
+    data = chart_document('market-price', points=25)
+    timeseries.persist_data(copy.deepcopy(data))
+    tamper(timeseries, FIRST)
+    first = buckets(timeseries, 'market-price')
+
+    assert timeseries.persist_data(copy.deepcopy(data)) is not None
+
+    assert buckets(timeseries, 'market-price') == first
+
+
+def test_persist_data_writes_changed_buckets_only(timeseries):
+    data = chart_document('market-price', points=25)
+    timeseries.persist_data(copy.deepcopy(data))
+    for bucket in (FIRST, FIRST + SPAN):
+        tamper(timeseries, bucket)
+
+    changed = copy.deepcopy(data)
+    changed['values'][12]['y'] = 42.0
+    changed['values'].append({'x': FIRST + 25 * 86400, 'y': 25.0})
+    timeseries.persist_data(copy.deepcopy(changed))
+
+    stored = buckets(timeseries, 'market-price')
+    assert stored[FIRST]['points'][str(FIRST)] == -1.0
+    assert stored[FIRST + SPAN]['points'][str(FIRST + SPAN)] == changed['values'][10]['y']
+    assert stored[FIRST + SPAN]['points'][str(FIRST + 12 * 86400)] == 42.0
+    assert stored[FIRST + 2 * SPAN]['last'] == FIRST + 25 * 86400
+    stored[FIRST]['points'][str(FIRST)] = data['values'][0]['y']
+    values = [{'x': int(x), 'y': y} for _, bucket in sorted(stored.items())
+              for x, y in bucket['points'].items()]
+    assert sorted(values, key=lambda value: value['x']) == changed['values']
+
+
+def test_merge_data_drops_touched_digests(timeseries):
+    data = chart_document('market-price', points=25)
+    timeseries.persist_data(copy.deepcopy(data))
+    since = timeseries.last_timestamp('market-price')
+
+    newer = chart_document('market-price', points=27)
+    timeseries.merge_data(copy.deepcopy(newer), since)
+
+    stored = buckets(timeseries, 'market-price')
+    assert DIGEST_FIELD in stored[FIRST]
+    assert DIGEST_FIELD not in stored[FIRST + 2 * SPAN]
+    metadata = timeseries.collection.find_one({'_slug': 'market-price'})
+    assert DIGEST_FIELD not in metadata
+    assert metadata['_last'] == newer['values'][-1]['x']
+
+    # Whole chart written again once merged buckets lost their digest
+    timeseries.persist_data(copy.deepcopy(newer))
+    assert DIGEST_FIELD in buckets(timeseries, 'market-price')[FIRST + 2 * SPAN]
+    assert timeseries.find_range('market-price') == newer['values']
+
+
+def test_failed_merge_is_retried_on_next_run(timeseries, monkeypatch):
+    data = chart_document('market-price', points=25)
+    timeseries.persist_data(copy.deepcopy(data))
+    since = timeseries.last_timestamp('market-price')
+    newer = chart_document('market-price', points=27)
+
+    def bulk_write(*args, **kwargs):
+        raise PyMongoError('connection lost')
+
+    monkeypatch.setattr(timeseries.points, 'bulk_write', bulk_write)
+    assert timeseries.merge_data(copy.deepcopy(newer), since) is None
+    monkeypatch.undo()
+
+    assert timeseries.last_timestamp('market-price') == since
+    timeseries.merge_data(copy.deepcopy(newer), timeseries.last_timestamp('market-price'))
+    assert timeseries.find_range('market-price') == newer['values']
+
+
+def test_find_range_includes_boundaries(timeseries):
+    data = chart_document('market-price', points=25)
+    timeseries.persist_data(copy.deepcopy(data))
+
+    start, end = FIRST + SPAN - 86400, FIRST + 2 * SPAN
+    values = timeseries.find_range('market-price', start, end)
+
+    assert values == [value for value in data['values'] if start <= value['x'] <= end]
+    assert values[0]['x'] == start
+    assert values[-1]['x'] == end
+    assert len(values) == 12
+
+
+def test_find_range_within_single_bucket_and_outside_values(timeseries):
+    data = chart_document('market-price', points=25)
+    timeseries.persist_data(copy.deepcopy(data))
+
+    values = timeseries.find_range('market-price', FIRST + SPAN + 86400, FIRST + SPAN + 86400)
+
+    assert values == [data['values'][11]]
+    assert timeseries.find_range('market-price', start=FIRST + 3 * SPAN) == []
+    assert timeseries.find_range('market-price', end=FIRST - 1) == []
+    assert timeseries.find_range('other-chart') == []